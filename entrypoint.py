@@ -1,3 +1,4 @@
+import multiprocessing
 import sys
 from pathlib import Path
 
@@ -15,6 +16,8 @@ def resolve_path(path: str) -> str:
 
 
 if __name__ == "__main__":
+    # 打包后的程序中，批量导入的解析子进程需要从这里进入
+    multiprocessing.freeze_support()
     config = StreamlitConfig()
     sys.argv = [
         "streamlit",
@@ -0,0 +1,23 @@
+"""测试公用夹具：每个测试使用临时目录中的独立数据库"""
+
+import pytest
+from webapp.database import DatabaseManager
+from webapp.analyzer import ScoreAnalyzer
+from webapp.parse_cache import parse_cache
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    """解析缓存写到临时目录，不污染 webapp/parse_cache"""
+    monkeypatch.setattr(parse_cache, 'directory', str(tmp_path / "cache"))
+    return tmp_path / "cache"
+
+
+@pytest.fixture
+def db(tmp_path):
+    return DatabaseManager(str(tmp_path / "scores.db"))
+
+
+@pytest.fixture
+def analyzer(db):
+    return ScoreAnalyzer(db)
@@ -0,0 +1,113 @@
+"""运行聚合测试：增量维护的聚合与按成绩表重新计算的结果一致"""
+
+import sqlite3
+import pandas as pd
+import pytest
+from webapp import aggregates
+from webapp.exam_stats import STATS_COLUMNS, compute_exam_stats
+
+
+def _rebuilt(db):
+    """在独立连接中按成绩表重建全部聚合，读出后回滚"""
+    conn = sqlite3.connect(db.db_path)
+    try:
+        cursor = conn.cursor()
+        cursor.execute('DELETE FROM score_aggregates')
+        for scope, table in (('exam', 'exams'), ('student', 'students'),
+                             ('class', 'classes')):
+            aggregates.rebuild_aggregates(cursor, scope, [
+                row[0] for row in cursor.execute(f'SELECT id FROM {table}')])
+        return {
+            scope: pd.read_sql_query(
+                'SELECT scope_id, score_count, mean, m2 FROM score_aggregates '
+                'WHERE scope = ? ORDER BY scope_id', conn, params=[scope])
+            for scope in aggregates.SCOPES
+        }
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+def _assert_matches_rebuild(db):
+    expected = _rebuilt(db)
+    for scope in aggregates.SCOPES:
+        actual = db.execute_query(
+            'SELECT scope_id, score_count, mean, m2 FROM score_aggregates '
+            'WHERE scope = ? ORDER BY scope_id', [scope])
+        pd.testing.assert_frame_equal(
+            actual, expected[scope], check_exact=False, rtol=1e-9, atol=1e-9,
+            obj=scope)
+
+
+def _assert_exam_stats_current(db, exam_id):
+    """exam_stats 已在写入事务中刷新（不依赖读取时补算）"""
+    row = db.execute_query(
+        f"SELECT {', '.join(STATS_COLUMNS)} FROM exam_stats WHERE exam_id = ?",
+        [exam_id]).iloc[0]
+    scores = db.execute_query(
+        'SELECT score FROM scores WHERE exam_id = ?', [exam_id])['score']
+    expected = compute_exam_stats(scores.tolist())
+    for column in STATS_COLUMNS:
+        if isinstance(expected[column], float):
+            assert row[column] == pytest.approx(expected[column]), column
+        else:
+            assert row[column] == expected[column], column
+
+
+def test_incremental_aggregates_match_rebuild(db):
+    classes = [db.create_class(name) for name in ('一班', '二班', '三班')]
+    students = [
+        db.create_student_full(f"20240{i:02d}", f"学生{i}", classes[i % 2])
+        for i in range(6)
+    ]
+    exams = [db.create_exam_manual(name) for name in ('期中', '期末')]
+
+    # 批量写入（含无法解析的文本成绩）
+    db.bulk_upsert_scores(
+        [(student, exams[0], 60 + 7 * i) for i, student in enumerate(students)]
+        + [(students[0], exams[1], '缺考'), (students[1], exams[1], 88)])
+    _assert_matches_rebuild(db)
+
+    # 单条新增、修改、删除（Welford 增量）
+    db.upsert_score(students[2], exams[1], 91.5)
+    db.upsert_score(students[3], exams[0], 45)
+    db.delete_score(student_pk_id=students[4], exam_id=exams[0])
+    _assert_matches_rebuild(db)
+    _assert_exam_stats_current(db, exams[0])
+    _assert_exam_stats_current(db, exams[1])
+
+    # 增量导入的批量修改与删除
+    db.apply_score_changes(
+        upserts=[(students[5], exams[1], 77), (students[0], exams[0], 99)],
+        deletes=[(students[1], exams[1])])
+    _assert_matches_rebuild(db)
+
+    # 换班：单个学生移动、批量设置班级、移出班级
+    db.update_student_info(students[0], '2024000', '学生0', classes[2])
+    db.assign_student_classes([(classes[2], students[1]),
+                               (classes[0], students[2])])
+    db.update_student_info(students[3], '2024003', '学生3', None)
+    _assert_matches_rebuild(db)
+
+    # 删除学生与班级
+    db.delete_student(students[5])
+    db.delete_class(classes[2])
+    _assert_matches_rebuild(db)
+
+
+def test_reading_exam_stats_does_not_write(db):
+    student = db.create_student_full('2024001', '张三')
+    exam = db.create_exam_manual('期中')
+    db.upsert_score(student, exam, 90)
+    db.upsert_score(student, exam, 80)
+    _assert_exam_stats_current(db, exam)
+
+    version = db.get_data_version()
+    conn = sqlite3.connect(db.db_path)
+    changes = conn.execute('PRAGMA data_version').fetchone()[0]
+    stats = db.get_exam_stats(['期中'])
+    assert stats.iloc[0]['median'] == 80
+    assert db.get_data_version() == version
+    # 其他连接的提交会改变 PRAGMA data_version：读取统计没有提交任何修改
+    assert conn.execute('PRAGMA data_version').fetchone()[0] == changes
+    conn.close()
@@ -0,0 +1,69 @@
+"""异常检测测试：成绩骤降、等级下滑与标记随成绩修改更新"""
+
+import numpy as np
+import pytest
+from webapp.anomalies import detect_anomalies
+
+STEADY = [80, 82, 78, 81]
+
+
+def _flags(values, **kwargs):
+    flags = detect_anomalies(np.array(values, dtype=float), **kwargs)
+    return flags.sort_values(['row', 'col', 'kind'], ignore_index=True)
+
+
+def test_k_sigma_drop():
+    flags = _flags([STEADY + [72]])
+    # 良好 → 中等只降一档，只标记骤降
+    assert flags['kind'].tolist() == ['drop']
+    flag = flags.iloc[0]
+    assert (flag['row'], flag['col']) == (0, 4)
+    assert flag['expected'] == pytest.approx(80.25)
+    std = np.std(STEADY, ddof=1)
+    assert flag['z_score'] == pytest.approx((72 - 80.25) / std)
+    assert flag['severity'] == pytest.approx((80.25 - 72) / std)
+    assert flag['previous_score'] == 81
+
+
+def test_small_drop_and_rise_are_not_flagged():
+    # 低于历史平均但不足 K 个标准差；以及比历史平均高出很多
+    assert _flags([[80, 88, 80, 88, 79], STEADY + [99]]).empty
+
+
+def test_band_fall_of_two_or_more():
+    flags = _flags([[95, 75, np.nan], [95, 85, np.nan], [85, np.nan, 65]])
+    assert flags[['row', 'col']].values.tolist() == [[0, 1], [2, 2]]
+    assert flags['kind'].tolist() == ['band', 'band']
+    assert flags['band_from'].tolist() == ['优秀', '良好']
+    assert flags['band_to'].tolist() == ['中等', '及格']
+    assert flags['severity'].tolist() == [2.0, 2.0]
+    # 缺考不打断比较：与上一次有效成绩比较
+    assert flags['previous_score'].tolist() == [95, 85]
+
+
+def test_min_history():
+    values = [[80, 82, 72]]
+    # 只有两次历史成绩，默认（至少三次）不判断骤降
+    assert _flags(values).empty
+    flags = _flags(values, min_history=2)
+    assert flags['kind'].tolist() == ['drop']
+    assert flags.iloc[0]['expected'] == pytest.approx(81)
+
+
+def test_flag_cleared_after_score_correction(db):
+    student = db.create_student_full('2024001', '张三')
+    # 考试按上传时间、考试名称排列
+    exams = [db.create_exam_manual(f"考试{i}") for i in range(1, 6)]
+    db.bulk_upsert_scores(
+        [(student, exam, score) for exam, score in zip(exams, STEADY + [60])])
+
+    flags = db.get_anomaly_flags()
+    assert sorted(flags['kind']) == ['band', 'drop']
+    assert set(flags['exam_name']) == {'考试5'}
+
+    # 录入错误更正后，提交时只重新扫描该学生，标记消失
+    db.upsert_score(student, exams[-1], 80)
+    assert db.get_anomaly_flags().empty
+
+    db.upsert_score(student, exams[-1], 72)
+    assert db.get_anomaly_flags()['kind'].tolist() == ['drop']
@@ -0,0 +1,116 @@
+"""批量导入测试：大文件流式读取不进入进程池，磁盘文件按路径解析，
+流式读取的数据块逐块写入解析缓存"""
+
+from concurrent.futures import Future
+from functools import partial
+import pandas as pd
+import pytest
+import webapp.analyzer as analyzer_module
+import webapp.batch_import as batch_import
+import webapp.excel_reader as excel_reader
+from webapp.analyzer import read_score_file
+from webapp.batch_import import DiskFile, import_excel_files
+from webapp.excel_reader import ExcelChunkReader
+from webapp.parse_cache import ParseCache, parse_cache
+
+
+class _InlinePool:
+    """在当前进程中同步执行的进程池替身，记录提交的参数"""
+
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, fn, *args):
+        self.submitted.append(args)
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+    def shutdown(self, cancel_futures=False):
+        pass
+
+
+def _write_exam(path, n_students, offset=0):
+    pd.DataFrame({
+        '学号': [2024001 + i for i in range(n_students)],
+        '姓名': [f"学生{i}" for i in range(n_students)],
+        '成绩': [60 + (i + offset) % 40 for i in range(n_students)],
+    }).to_excel(path, index=False)
+
+
+@pytest.fixture
+def exam_files(tmp_path, monkeypatch):
+    """两个小文件、一个超过流式读取阈值的大文件"""
+    small, large = tmp_path / "小测.xlsx", tmp_path / "期末.xlsx"
+    quiz = tmp_path / "周测.xlsx"
+    _write_exam(small, 5)
+    _write_exam(large, 3000, offset=7)
+    _write_exam(quiz, 6, offset=3)
+    threshold = (small.stat().st_size + large.stat().st_size) // 2
+    monkeypatch.setattr(excel_reader, 'STREAMING_THRESHOLD', threshold)
+    return [DiskFile(str(small)), DiskFile(str(large)), DiskFile(str(quiz))]
+
+
+def _scores(db, exam_name):
+    scores = db.get_exam_scores(exam_name)
+    return scores.sort_values('student_id', ignore_index=True)[
+        ['student_id', 'score']]
+
+
+def test_large_files_are_streamed_in_writer(analyzer, exam_files, cache_dir,
+                                           monkeypatch):
+    pool = _InlinePool()
+    monkeypatch.setattr(batch_import, '_create_pool', lambda workers: pool)
+
+    results = import_excel_files(analyzer, exam_files, max_workers=2)
+    assert [status for _, status, _ in results] == ['success'] * 3
+
+    # 只有小文件进入进程池，并且传的是路径而不是文件内容
+    assert [args[0] for args in pool.submitted] == ['小测.xlsx', '周测.xlsx']
+    assert [args[1] for args in pool.submitted] == [
+        exam_files[0].path, exam_files[2].path]
+
+    large = _scores(analyzer.db, '期末')
+    assert len(large) == 3000
+    assert large['score'].tolist()[:3] == [67.0, 68.0, 69.0]
+
+    # 内容哈希按块从磁盘计算，重复导入时识别为相同内容
+    results = import_excel_files(analyzer, exam_files, max_workers=2)
+    assert [status for _, status, _ in results] == ['skipped'] * 3
+
+
+def test_streamed_import_then_cache_hit(analyzer, exam_files, cache_dir,
+                                        monkeypatch, capsys):
+    monkeypatch.setattr(analyzer_module, 'ExcelChunkReader',
+                        partial(ExcelChunkReader, chunk_size=1000))
+    large = exam_files[1]
+
+    import_excel_files(analyzer, [large])
+    first = _scores(analyzer.db, '期末')
+    assert [path.suffix for path in cache_dir.iterdir()] == ['.pkl']
+    assert '使用解析缓存' not in capsys.readouterr().out
+
+    # 命中缓存时逐块读出，与首次流式读取的结果相同
+    analyzer.db.delete_exam('期末')
+    results = import_excel_files(analyzer, [large])
+    assert results[0][1] == 'success'
+    assert '使用解析缓存' in capsys.readouterr().out
+    pd.testing.assert_frame_equal(_scores(analyzer.db, '期末'), first)
+
+    entry = parse_cache.get(batch_import._content_hash(large))
+    assert entry['student_count'] is None
+    assert [len(chunk) for chunk in entry['frames']] == [1000, 1000, 1000]
+
+
+def test_abandoned_stream_is_not_cached(tmp_path, exam_files):
+    cache = ParseCache(str(tmp_path / "cache"))
+    with open(exam_files[1].path, 'rb') as f:
+        success, parsed = read_score_file(
+            f, '期末.xlsx', streaming=True, cache=cache)
+        assert success
+        next(parsed['frames'])
+        parsed['frames'].close()
+
+    # 没有读完的文件不留下缓存条目或临时文件
+    assert list((tmp_path / "cache").iterdir()) == []
+    assert cache.get(parsed['content_hash']) is None
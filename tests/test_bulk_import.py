@@ -0,0 +1,90 @@
+"""批量导入与逐行导入（旧实现）的一致性"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from webapp.database import DatabaseManager
+
+
+def _row_by_row_import(db, exam_name, df):
+    """按旧实现逐行导入：逐个查询 / 插入学生，再逐条插入成绩"""
+    exam_id = db.insert_new_exam(exam_name, f"{exam_name}.xlsx", len(df))
+    id_map = {}
+    for _, row in df.iterrows():
+        student_id = str(row["学号"])
+        name = row.get("姓名", f"学生{student_id}")
+        existing = db.get_student_id_by_student_id(student_id)
+        if existing:
+            id_map[student_id] = existing
+        else:
+            new_id = db.insert_student_with_id(name, student_id)
+            if new_id:
+                id_map[student_id] = new_id
+    for _, row in df.iterrows():
+        student_id = id_map.get(str(row["学号"]))
+        if student_id is not None:
+            db.insert_score(int(student_id), exam_id, row["成绩"])
+
+
+def _bulk_import(analyzer, exam_name, df):
+    return analyzer._import_exam_frames(
+        exam_name, f"{exam_name}.xlsx", [df], len(df),
+        require_student_id=True, auto_generate_id=False)
+
+
+def _snapshot(db):
+    students = db.execute_query(
+        'SELECT student_id, name FROM students ORDER BY student_id')
+    scores = db.execute_query(
+        'SELECT st.student_id, e.exam_name, sc.score, typeof(sc.score) AS kind '
+        'FROM scores sc JOIN students st ON st.id = sc.student_id '
+        'JOIN exams e ON e.id = sc.exam_id '
+        'ORDER BY e.exam_name, st.student_id')
+    exams = db.execute_query(
+        'SELECT exam_name, student_count FROM exams ORDER BY exam_name')
+    return students, scores, exams
+
+
+FIRST = pd.DataFrame({
+    '学号': [2024001, 2024002, np.nan, 2024004, 2024002],
+    '姓名': ['张三', '李四', '王五', '赵六', '李四'],
+    '成绩': [95, '缺考', 78, '88', 90],
+})
+
+SECOND = pd.DataFrame({
+    '学号': [2024001, 2024005, np.nan],
+    '姓名': ['张三', '孙七', '周八'],
+    '成绩': [85.5, 'A', 60],
+})
+
+
+def test_bulk_import_matches_row_by_row(tmp_path, analyzer):
+    reference = DatabaseManager(str(tmp_path / "reference.db"))
+    for exam_name, df in (('期中', FIRST), ('期末', SECOND)):
+        _row_by_row_import(reference, exam_name, df)
+        success, _ = _bulk_import(analyzer, exam_name, df)
+        assert success
+
+    for expected, actual in zip(_snapshot(reference), _snapshot(analyzer.db)):
+        pd.testing.assert_frame_equal(actual, expected)
+
+
+def test_bulk_import_message_counts(analyzer):
+    _, message = _bulk_import(analyzer, '期中', FIRST)
+    assert "现有学生：1人，新增学生：4人" in message
+    _, message = _bulk_import(analyzer, '期末', SECOND)
+    assert "现有学生：2人，新增学生：1人" in message
+
+
+def test_failed_chunk_rolls_back_whole_exam(analyzer, monkeypatch):
+    def fail(rows):
+        raise RuntimeError("磁盘已满")
+
+    monkeypatch.setattr(analyzer.db, 'bulk_upsert_scores', fail)
+    success, message = analyzer.import_parsed_file({
+        'exam_name': '期中', 'file_name': '期中.xlsx', 'frames': [FIRST],
+        'student_count': len(FIRST)})
+    assert not success
+    assert "磁盘已满" in message
+    students, scores, exams = _snapshot(analyzer.db)
+    assert students.empty and scores.empty and exams.empty
@@ -0,0 +1,71 @@
+"""班级汇总测试：向量化的 班级×考试 汇总与按长表分组的结果一致"""
+
+import numpy as np
+import pandas as pd
+from webapp.class_rollups import (
+    EXCELLENT_SCORE,
+    PASS_SCORE,
+    ROLLUP_COLUMNS,
+    compute_class_rollups
+)
+
+
+def _groupby_rollups(values, class_ids, exam_names, class_names):
+    """逐组计算的对照结果"""
+    long = pd.DataFrame(values, columns=exam_names).assign(
+        class_id=class_ids).melt(
+        id_vars='class_id', var_name='exam_name', value_name='score')
+    long = long.dropna(subset=['class_id', 'score'])
+    long['class_id'] = long['class_id'].astype(int)
+    grouped = long.groupby(['class_id', 'exam_name'])['score']
+    rollups = pd.DataFrame({
+        '人数': grouped.count(),
+        '平均分': grouped.mean(),
+        '中位数': grouped.median(),
+        '及格率': grouped.apply(lambda s: (s >= PASS_SCORE).mean() * 100),
+        '优秀率': grouped.apply(lambda s: (s >= EXCELLENT_SCORE).mean() * 100),
+    }).reset_index()
+    rollups['班级排名'] = rollups.groupby('exam_name')['平均分'].rank(
+        ascending=False, method='min').astype(int)
+    rollups['class_name'] = rollups['class_id'].map(class_names)
+    columns = ['平均分', '中位数', '及格率', '优秀率']
+    rollups[columns] = rollups[columns].round(1)
+    return rollups[ROLLUP_COLUMNS]
+
+
+def _sorted(frame):
+    return frame.sort_values(
+        ['class_id', 'exam_name'], ignore_index=True).astype(
+        {'class_id': int, '人数': int, '班级排名': int})
+
+
+def test_rollups_match_groupby():
+    rng = np.random.default_rng(7)
+    n_students, exam_names = 200, ['期中', '期末', '月考', '补考']
+    values = rng.integers(30, 101, size=(n_students, len(exam_names))).astype(float)
+    values[rng.random(values.shape) < 0.2] = np.nan
+    # 补考只有一个班有人参加
+    class_ids = rng.choice([1.0, 2.0, 3.0, np.nan], size=n_students)
+    values[class_ids != 2, 3] = np.nan
+    class_names = {1: '一班', 2: '二班', 3: '三班'}
+
+    actual = compute_class_rollups(values, class_ids, exam_names, class_names)
+    expected = _groupby_rollups(values, class_ids, exam_names, class_names)
+    pd.testing.assert_frame_equal(_sorted(actual), _sorted(expected))
+    assert len(actual[actual['exam_name'] == '补考']) == 1
+
+
+def test_tied_class_means_share_rank():
+    values = np.array([[80.0], [90.0], [85.0], [85.0], [70.0]])
+    class_ids = [1, 1, 2, 2, 3]
+    rollups = compute_class_rollups(
+        values, class_ids, ['期中'], {1: '一班', 2: '二班', 3: '三班'})
+    assert dict(zip(rollups['class_name'], rollups['班级排名'])) == {
+        '一班': 1, '二班': 1, '三班': 3}
+
+
+def test_no_classes():
+    rollups = compute_class_rollups(
+        np.array([[80.0]]), [None], ['期中'], {})
+    assert rollups.empty
+    assert list(rollups.columns) == ROLLUP_COLUMNS
@@ -0,0 +1,92 @@
+"""增量导入测试：只写入与已存成绩不同的行"""
+
+import io
+import pandas as pd
+import pytest
+
+
+def _excel(name, scores):
+    """内存中的成绩文件，scores 为 {学号: 成绩}"""
+    buffer = io.BytesIO()
+    pd.DataFrame({
+        '学号': list(scores),
+        '姓名': [f"学生{student_id}" for student_id in scores],
+        '成绩': list(scores.values()),
+    }).to_excel(buffer, index=False)
+    buffer.name = name
+    buffer.seek(0)
+    return buffer
+
+
+def _stored(db, exam_name='期中'):
+    scores = db.get_exam_scores(exam_name)
+    return dict(zip(scores['student_id'], scores['score']))
+
+
+BASE = {2024001: 90, 2024002: 80, 2024003: 70}
+
+
+@pytest.fixture
+def writes(analyzer, monkeypatch):
+    """记录增量导入实际写入（apply_score_changes）的成绩"""
+    calls = {'upserts': [], 'deletes': []}
+    apply = analyzer.db.apply_score_changes
+
+    def spy(upserts=(), deletes=()):
+        calls['upserts'].extend(upserts)
+        calls['deletes'].extend(deletes)
+        return apply(upserts, deletes)
+
+    monkeypatch.setattr(analyzer.db, 'apply_score_changes', spy)
+    analyzer.process_excel_file(_excel('期中.xlsx', BASE), delta=True)
+    calls['upserts'].clear()
+    return calls
+
+
+def test_unchanged_file_writes_nothing(analyzer, writes):
+    success, message = analyzer.process_excel_file(
+        _excel('期中.xlsx', BASE), delta=True)
+    assert success
+    assert '未变化 3 条' in message
+    assert writes == {'upserts': [], 'deletes': []}
+    assert _stored(analyzer.db) == {'2024001': 90, '2024002': 80, '2024003': 70}
+
+
+def test_changed_score_writes_one_row(analyzer, writes):
+    success, message = analyzer.process_excel_file(
+        _excel('期中.xlsx', {**BASE, 2024002: 85}), delta=True)
+    assert success
+    assert '修改 1 条' in message
+    assert len(writes['upserts']) == 1
+    assert writes['upserts'][0][2] == 85
+    assert _stored(analyzer.db)['2024002'] == 85
+
+
+def test_remove_missing_deletes_only_missing(analyzer, writes):
+    # 不勾选 remove_missing 时文件中没有的成绩保留
+    analyzer.process_excel_file(
+        _excel('期中.xlsx', {2024001: 90, 2024003: 70}), delta=True)
+    assert writes['deletes'] == []
+    assert len(_stored(analyzer.db)) == 3
+
+    success, message = analyzer.process_excel_file(
+        _excel('期中.xlsx', {2024001: 90, 2024003: 70}),
+        delta=True, remove_missing=True)
+    assert success
+    assert '删除 1 条' in message
+    assert len(writes['deletes']) == 1
+    assert writes['upserts'] == []
+    assert _stored(analyzer.db) == {'2024001': 90, '2024003': 70}
+
+
+def test_dry_run_leaves_database_untouched(analyzer, writes):
+    version = analyzer.db.get_data_version()
+    success, message = analyzer.process_excel_file(
+        _excel('期中.xlsx', {2024001: 95, 2024004: 60}),
+        delta=True, remove_missing=True, dry_run=True)
+    assert success
+    assert message.startswith('预览（未写入）')
+    assert '新增 1 条，修改 1 条，删除 2 条' in message
+    assert analyzer.db.get_data_version() == version
+    assert _stored(analyzer.db) == {'2024001': 90, '2024002': 80, '2024003': 70}
+    assert analyzer.db.get_student_id_by_student_id('2024004') is None
@@ -0,0 +1,119 @@
+"""数据库迁移测试：旧版（无 user_version）数据库升级到最新结构"""
+
+import sqlite3
+from webapp.database import DatabaseManager, SCHEMA_MIGRATIONS
+
+# 引入版本化迁移之前 init_database 建立的表结构
+BASELINE_SCHEMA = '''
+    CREATE TABLE classes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        class_name TEXT UNIQUE NOT NULL,
+        created_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE exams (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        exam_name TEXT UNIQUE NOT NULL,
+        file_path TEXT NOT NULL,
+        upload_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        student_count INTEGER DEFAULT 0
+    );
+    CREATE TABLE students (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        student_id TEXT UNIQUE NOT NULL,
+        name TEXT NOT NULL,
+        class_id INTEGER,
+        created_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE scores (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        student_id INTEGER,
+        exam_id INTEGER,
+        score REAL NOT NULL,
+        record_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (student_id) REFERENCES students (id),
+        FOREIGN KEY (exam_id) REFERENCES exams (id),
+        UNIQUE(student_id, exam_id)
+    );
+'''
+
+
+def _baseline_db(path):
+    """建立旧版结构的数据库并写入少量数据"""
+    conn = sqlite3.connect(path)
+    conn.executescript(BASELINE_SCHEMA)
+    conn.execute("INSERT INTO classes (id, class_name) VALUES (1, '一班')")
+    conn.executemany(
+        "INSERT INTO exams (id, exam_name, file_path, student_count) "
+        "VALUES (?, ?, ?, ?)",
+        [(1, '期中', 'mid.xlsx', 2), (2, '期末', 'final.xlsx', 2)])
+    conn.executemany(
+        "INSERT INTO students (id, student_id, name, class_id) "
+        "VALUES (?, ?, ?, ?)",
+        [(1, '2024001.0', '张三', 1), (2, '2024002', '李四', 1)])
+    conn.executemany(
+        "INSERT INTO scores (student_id, exam_id, score) VALUES (?, ?, ?)",
+        [(1, 1, 90), (1, 2, 85), (2, 1, 70), (2, 2, 75)])
+    conn.commit()
+    conn.close()
+
+
+def test_baseline_database_is_migrated(tmp_path, capsys):
+    path = str(tmp_path / "old.db")
+    _baseline_db(path)
+
+    db = DatabaseManager(path)
+    assert db.get_schema_version() == len(SCHEMA_MIGRATIONS)
+    assert capsys.readouterr().out.count('执行数据库迁移') == len(
+        SCHEMA_MIGRATIONS)
+
+    # 原有数据保留，数值学号被规范化
+    students = db.get_all_students()
+    assert sorted(students['student_id']) == ['2024001', '2024002']
+    scores = db.get_scores()
+    assert len(scores) == 4
+    assert sorted(scores['score']) == [70, 75, 85, 90]
+
+    # 派生表由迁移补齐
+    conn = sqlite3.connect(path)
+    stats = conn.execute('SELECT COUNT(*) FROM exam_stats').fetchone()[0]
+    conn.close()
+    assert stats == 2
+    exam_means = db.get_score_aggregates('exam').set_index('scope_id')['mean']
+    assert exam_means.to_dict() == {1: 80.0, 2: 80.0}
+    assert len(db.get_score_aggregates('student')) == 2
+    assert len(db.get_score_aggregates('class')) == 1
+
+    # 再次打开不执行任何迁移，数据版本号不变
+    version = db.get_data_version()
+    reopened = DatabaseManager(path)
+    assert capsys.readouterr().out == ''
+    assert reopened.get_schema_version() == len(SCHEMA_MIGRATIONS)
+    assert reopened.get_data_version() == version
+    assert len(reopened.get_scores()) == 4
+
+
+def test_numeric_id_collision_is_merged(tmp_path, capsys):
+    path = str(tmp_path / "old.db")
+    _baseline_db(path)
+    conn = sqlite3.connect(path)
+    conn.execute("INSERT INTO exams (id, exam_name, file_path) "
+                 "VALUES (3, '月考', 'monthly.xlsx')")
+    # 同一学生以 2024002.0 再次导入：期末与已有成绩重复，月考只在旧学号下
+    conn.execute("INSERT INTO students (id, student_id, name, class_id) "
+                 "VALUES (3, '2024002.0', '李四', NULL)")
+    conn.executemany(
+        "INSERT INTO scores (student_id, exam_id, score) VALUES (?, ?, ?)",
+        [(3, 2, 60), (3, 3, 88)])
+    conn.commit()
+    conn.close()
+
+    db = DatabaseManager(path)
+    assert '合并重复学号 2024002.0 → 2024002' in capsys.readouterr().out
+
+    students = db.get_all_students()
+    assert sorted(students['student_id']) == ['2024001', '2024002']
+    scores = db.get_scores()
+    li_si = scores[scores['student_id'] == '2024002']
+    assert dict(zip(li_si['exam_name'], li_si['score'])) == {
+        '期中': 70, '期末': 75, '月考': 88}
+    assert len(scores) == 5
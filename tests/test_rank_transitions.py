@@ -0,0 +1,91 @@
+"""名次变化测试：三场考试（其中一人缺考一场）的名次变化与等级转移"""
+
+import numpy as np
+import pandas as pd
+from webapp.rank_transitions import (
+    TOTAL_DELTA_COLUMN,
+    compute_rank_transitions,
+    delta_column,
+    transition_matrix
+)
+
+# 学生×考试 成绩，乙缺考第二场
+VALUES = np.array([
+    [95, 85, 75],       # 甲
+    [85, np.nan, 95],   # 乙
+    [75, 95, 85],       # 丙
+    [65, 75, 65],       # 丁
+], dtype=float)
+
+# 各场考试按成绩从高到低的名次
+RANKS = np.array([
+    [1, 2, 3],
+    [2, np.nan, 1],
+    [3, 1, 2],
+    [4, 3, 4],
+], dtype=float)
+
+
+def test_transition_matrix_counts():
+    matrix = transition_matrix([0, 1, 1, 2, -1], [1, 1, 1, -1, 0], 3)
+    assert matrix.tolist() == [
+        [0, 1, 0],
+        [0, 2, 0],
+        [0, 0, 0],
+    ]
+
+
+def test_deltas_positive_means_improved():
+    result = compute_rank_transitions(VALUES, RANKS)
+    deltas = result['deltas']
+    # 甲连续退步，丙先进步后退步，丁先进步后退步
+    assert deltas[[0, 2, 3]].tolist() == [[-1, -1], [2, -1], [1, -1]]
+    # 缺考的两段没有名次变化，首尾两场仍可比较
+    assert np.isnan(deltas[1]).all()
+    assert result['total'].tolist() == [-2, 1, 1, 0]
+
+
+def test_band_transitions_skip_missed_exam():
+    result = compute_rank_transitions(VALUES, RANKS)
+    # 分数段从低到高：不及格、及格、中等、良好、优秀
+    assert result['bands'].tolist() == [
+        [4, 3, 2],
+        [3, -1, 4],
+        [2, 4, 3],
+        [1, 2, 1],
+    ]
+    first, second = result['matrices']
+    # 第一段：甲 优秀→良好，丙 中等→优秀，丁 及格→中等（乙缺考不计）
+    assert first.sum() == 3
+    assert (first[4, 3], first[2, 4], first[1, 2]) == (1, 1, 1)
+    # 第二段：甲 良好→中等，丙 优秀→良好，丁 中等→及格
+    assert second.sum() == 3
+    assert (second[3, 2], second[4, 3], second[2, 1]) == (1, 1, 1)
+
+
+def test_rank_transitions_from_database(db):
+    students = [
+        db.create_student_full(f"202400{i}", name)
+        for i, name in enumerate(['甲', '乙', '丙', '丁'])
+    ]
+    exams = [db.create_exam_manual(name) for name in ('第一次', '第二次', '第三次')]
+    db.bulk_upsert_scores([
+        (student, exam, VALUES[i, j])
+        for i, student in enumerate(students)
+        for j, exam in enumerate(exams)
+        if not np.isnan(VALUES[i, j])
+    ])
+
+    result = db.rank_transitions.get(['第一次', '第二次', '第三次'])
+    table = result['students'].set_index('name')
+    assert table.loc['丙', delta_column('第一次', '第二次')] == 2
+    assert table.loc['甲', delta_column('第二次', '第三次')] == -1
+    assert pd.isna(table.loc['乙', delta_column('第一次', '第二次')])
+    assert table[TOTAL_DELTA_COLUMN].to_dict() == {
+        '甲': -2, '乙': 1, '丙': 1, '丁': 0}
+
+    # 转移矩阵按等级从高到低排列，行为前一场等级
+    first = result['matrices'][0]
+    assert first.loc['优秀', '良好'] == 1
+    assert first.loc['中等', '优秀'] == 1
+    assert first.to_numpy().sum() == 3
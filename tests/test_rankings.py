@@ -0,0 +1,65 @@
+"""考试排名测试：密集排名、百分位与标准分（手工计算的小样本）"""
+
+import math
+import pytest
+
+
+@pytest.fixture
+def ranked(db):
+    """期中 4 人有数值成绩（两人并列）、1 人缺考；补考只有 1 人"""
+    students = {
+        student_id: db.create_student_full(student_id, f"学生{student_id}")
+        for student_id in ('A', 'B', 'C', 'D', 'E')
+    }
+    midterm = db.create_exam_manual('期中')
+    makeup = db.create_exam_manual('补考')
+    db.bulk_upsert_scores([
+        (students['A'], midterm, 90), (students['B'], midterm, 90),
+        (students['C'], midterm, 80), (students['D'], midterm, 70),
+        (students['E'], midterm, '缺考'), (students['E'], makeup, 50),
+    ])
+    return db
+
+
+def _by_student(rankings, exam_name):
+    rows = rankings[rankings['exam_name'] == exam_name]
+    return rows.set_index('student_id')
+
+
+def test_dense_rank_and_percentile(ranked):
+    midterm = _by_student(ranked.rankings.get(['期中', '补考']), '期中')
+
+    # 文本成绩不参与排名
+    assert sorted(midterm.index) == ['A', 'B', 'C', 'D']
+    # 并列同名次，下一名次不跳号
+    assert midterm['rank'].to_dict() == {'A': 1, 'B': 1, 'C': 2, 'D': 3}
+    # PERCENT_RANK：低于该生的人数 / (4 - 1)
+    assert midterm['percentile'].to_dict() == {
+        'A': 66.7, 'B': 66.7, 'C': 33.3, 'D': 0.0}
+
+
+def test_single_student_exam(ranked):
+    makeup = _by_student(ranked.rankings.get(['补考']), '补考')
+    assert makeup.loc['E', 'rank'] == 1
+    assert makeup.loc['E', 'percentile'] == 0.0
+    assert makeup.loc['E', 'z_score'] == 0.0
+
+
+def test_z_scores(ranked):
+    midterm = _by_student(ranked.rankings.get(['期中']), '期中')
+    mean = (90 + 90 + 80 + 70) / 4
+    std = math.sqrt(((90 - mean) ** 2 * 2 + (80 - mean) ** 2
+                     + (70 - mean) ** 2) / 3)
+    for student_id, score in (('A', 90), ('C', 80), ('D', 70)):
+        assert midterm.loc[student_id, 'z_score'] == pytest.approx(
+            (score - mean) / std)
+
+
+def test_wide_columns(ranked):
+    wide = ranked.rankings.wide(['期中', '补考'])
+    assert list(wide.columns) == [
+        '期中_名次', '期中_百分位', '期中_Z分',
+        '补考_名次', '补考_百分位', '补考_Z分']
+    assert wide.loc['C', '期中_名次'] == 2
+    assert math.isnan(wide.loc['E', '期中_名次'])
+    assert wide.loc['E', '补考_名次'] == 1
@@ -0,0 +1,61 @@
+"""屏幕着色与导出条件格式的一致性"""
+
+import re
+import pytest
+from webapp.exporter import _band_rules
+from webapp.grading import get_score_colors
+from webapp.config import DEFAULT_COLOR_SETTINGS
+
+SCORES = [-5, 0, 45, 50, 55, 59.5, 60, 65, 70, 79, 85, 89.5, 90, 100, 120, 150,
+          160]
+
+COLOR_SETTINGS = [
+    DEFAULT_COLOR_SETTINGS,
+    # 重叠、嵌套的区间：先配置的区间优先
+    {
+        'A': {'min_score': 0, 'max_score': 100, 'color': '#AAAAAA'},
+        'B': {'min_score': 50, 'max_score': 60, 'color': '#BBBBBB'},
+    },
+    {
+        'B': {'min_score': 50, 'max_score': 60, 'color': '#BBBBBB'},
+        'A': {'min_score': 0, 'max_score': 100, 'color': '#AAAAAA'},
+    },
+    # 有空隙的区间：空隙中的分数使用默认颜色
+    {
+        '高': {'min_score': 85, 'max_score': 100, 'color': '#111111'},
+        '低': {'min_score': 0, 'max_score': 40, 'color': '#222222'},
+    },
+]
+
+
+def _export_color(rules, score):
+    """按 stopIfTrue 顺序求值导出的条件格式规则"""
+    for rule in rules:
+        formula = rule.formula[0]
+        lower = re.search(r'>=(-?[\d.]+)', formula)
+        upper = re.search(r'<=(-?[\d.]+)', formula)
+        if lower and score < float(lower.group(1)):
+            continue
+        if upper and score > float(upper.group(1)):
+            continue
+        return '#' + rule.dxf.fill.fgColor.rgb[-6:]
+    return None
+
+
+@pytest.mark.parametrize('color_settings', COLOR_SETTINGS)
+def test_screen_and_export_colors_agree(color_settings):
+    screen = get_score_colors(SCORES, color_settings)
+    rules = _band_rules(color_settings, 'A1')
+    export = [_export_color(rules, score) for score in SCORES]
+    assert [color.upper() for color in screen] == export
+
+
+def test_overlapping_ranges_use_first_match():
+    settings = COLOR_SETTINGS[1]
+    assert list(get_score_colors([70, 55], settings)) == ['#AAAAAA', '#AAAAAA']
+    assert list(get_score_colors([55], COLOR_SETTINGS[2])) == ['#BBBBBB']
+
+
+def test_empty_settings_use_default_colors():
+    assert list(get_score_colors([95, 65, 'x'], {})) == [
+        '#90EE90', '#FFB6C1', '#F0F0F0']
@@ -0,0 +1,87 @@
+"""成绩矩阵测试：增量更新的结果与整体重建一致"""
+
+import pandas as pd
+from webapp.matrix import ScoreMatrix
+
+EXAMS = ['期中', '期末', '月考']
+
+
+def _seed(db):
+    """两个班、三名学生、两场考试"""
+    classes = [db.create_class(name) for name in ('一班', '二班')]
+    students = [
+        db.create_student_full('2024001', '张三', classes[0]),
+        db.create_student_full('2024002', '李四', classes[0]),
+        db.create_student_full('2024003', '王五', classes[1]),
+    ]
+    exams = [db.create_exam_manual(name) for name in EXAMS[:2]]
+    db.bulk_upsert_scores([
+        (students[0], exams[0], 90), (students[1], exams[0], 80),
+        (students[2], exams[0], 70), (students[0], exams[1], 85),
+        (students[1], exams[1], 75),
+    ])
+    return classes, students, exams
+
+
+def _assert_matches_rebuild(db, class_ids=None):
+    """矩阵仍处于当前数据版本（走的是增量路径），且切片与重建结果一致"""
+    assert db.score_matrix.version == db.get_data_version()
+    fresh = ScoreMatrix(db)
+    fresh.rebuild()
+    pd.testing.assert_frame_equal(
+        db.score_matrix.select(EXAMS, class_ids),
+        fresh.select(EXAMS, class_ids))
+
+
+def test_apply_changes_matches_rebuild(db):
+    classes, students, exams = _seed(db)
+    db.score_matrix.select(EXAMS)
+
+    # 修改与删除已有成绩
+    db.upsert_score(students[2], exams[1], 95)
+    _assert_matches_rebuild(db)
+    db.apply_score_changes(
+        upserts=[(students[0], exams[0], 60)],
+        deletes=[(students[1], exams[1])])
+    _assert_matches_rebuild(db)
+    db.delete_score(student_pk_id=students[1], exam_id=exams[0])
+    _assert_matches_rebuild(db)
+
+    # 同一事务中新建学生与考试并写入成绩：矩阵补充新行、新列
+    with db.transaction():
+        new_student = db.create_student_full('2024004', '赵六', classes[1])
+        new_exam = db.create_exam_manual(EXAMS[2])
+        db.bulk_upsert_scores([
+            (new_student, exams[0], 88), (new_student, new_exam, 66),
+            (students[0], new_exam, 77),
+        ])
+    _assert_matches_rebuild(db)
+    _assert_matches_rebuild(db, class_ids=[classes[1]])
+
+    matrix = db.score_matrix.select(EXAMS)
+    assert list(matrix.columns) == ['student_id', 'name'] + sorted(EXAMS)
+    row = matrix.set_index('student_id').loc['2024004']
+    assert (row['期中'], row['月考']) == (88, 66)
+    assert pd.isna(row['期末'])
+
+
+def test_version_mismatch_invalidates(db):
+    _, students, exams = _seed(db)
+    db.score_matrix.select(EXAMS)
+    version = db.score_matrix.version
+
+    # 回调的版本号与矩阵不衔接（期间有其他写入）时只标记失效
+    db.score_matrix.apply_changes(
+        version + 1, version + 2, upserts=[(students[0], exams[0], 1)])
+    assert db.score_matrix.version is None
+
+    # 下次读取时整体重建，不会带入未提交的增量
+    matrix = db.score_matrix.select(EXAMS)
+    assert db.score_matrix.version == db.get_data_version()
+    assert matrix.set_index('student_id').loc['2024001', '期中'] == 90
+
+    # 非成绩写入使版本号失配，读取时按新数据重建
+    db.rename_exam(exams[0], '期中考试')
+    assert db.score_matrix.version != db.get_data_version()
+    matrix = db.score_matrix.select(['期中考试', '期末'])
+    assert '期中考试' in matrix.columns
@@ -0,0 +1,88 @@
+"""成绩轨迹测试：批量拟合与逐行 np.polyfit 的结果一致"""
+
+import numpy as np
+import pytest
+from webapp.trajectories import fit_trajectories
+
+# 95% 双侧 t 临界值（自由度 1-4）
+T_95 = {1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776}
+
+
+def _row_fit(xs, ys, next_position):
+    """逐行计算的对照结果"""
+    n = len(ys)
+    if n < 2:
+        return dict.fromkeys(
+            ('slope', 'intercept', 'r2', 'volatility', 'forecast', 'lower',
+             'upper'), np.nan)
+    slope, intercept = np.polyfit(xs, ys, 1)
+    residuals = ys - (intercept + slope * xs)
+    sse = (residuals ** 2).sum()
+    sst = ((ys - ys.mean()) ** 2).sum()
+    forecast = intercept + slope * next_position
+    result = {
+        'slope': slope,
+        'intercept': intercept,
+        'r2': 1 - sse / sst if sst > 0 else np.nan,
+        'volatility': np.nan,
+        'forecast': forecast,
+        'lower': np.nan,
+        'upper': np.nan,
+    }
+    if n >= 3:
+        volatility = np.sqrt(sse / (n - 2))
+        margin = T_95[n - 2] * volatility * np.sqrt(
+            1 + 1 / n + (next_position - xs.mean()) ** 2
+            / ((xs - xs.mean()) ** 2).sum())
+        result.update(volatility=volatility, lower=forecast - margin,
+                      upper=forecast + margin)
+    return result
+
+
+@pytest.mark.parametrize('positions', [None, [0, 1, 3, 4, 7, 8]])
+def test_fit_matches_polyfit(positions):
+    rng = np.random.default_rng(23)
+    values = rng.normal(75, 10, size=(300, 6)).round(1)
+    values[rng.random(values.shape) < 0.35] = np.nan
+    # 平稳成绩（R² 无定义）、只有两次成绩、只有一次成绩、全部缺考
+    values[0] = [80, np.nan, 80, 80, np.nan, 80]
+    values[1] = [np.nan, 70, np.nan, np.nan, 90, np.nan]
+    values[2] = [np.nan, np.nan, 65, np.nan, np.nan, np.nan]
+    values[3] = np.nan
+
+    fits = fit_trajectories(values, positions)
+    xs_all = np.arange(6.0) if positions is None else np.asarray(
+        positions, dtype=float)
+    next_position = xs_all[-1] + 1
+
+    for i, row in enumerate(values):
+        mask = ~np.isnan(row)
+        expected = _row_fit(xs_all[mask], row[mask], next_position)
+        assert fits['count'][i] == mask.sum()
+        for key, value in expected.items():
+            assert fits[key][i] == pytest.approx(
+                value, rel=1e-6, abs=1e-6, nan_ok=True), (i, key)
+
+
+def test_short_histories():
+    fits = fit_trajectories(np.array([
+        [60, 70, np.nan],
+        [np.nan, 50, np.nan],
+        [80, 80, 80],
+    ]))
+    # 两次成绩：可以拟合与预测，但没有波动与预测区间
+    assert fits['slope'][0] == pytest.approx(10)
+    assert fits['forecast'][0] == pytest.approx(90)
+    assert fits['r2'][0] == pytest.approx(1)
+    for key in ('volatility', 'lower', 'upper'):
+        assert np.isnan(fits[key][0])
+    # 一次成绩：只有最近成绩
+    assert fits['last'][1] == 50
+    for key in ('slope', 'intercept', 'r2', 'volatility', 'forecast'):
+        assert np.isnan(fits[key][1])
+    # 平稳成绩：斜率为 0，R² 无定义，预测区间宽度为 0
+    assert fits['slope'][2] == pytest.approx(0)
+    assert np.isnan(fits['r2'][2])
+    assert fits['volatility'][2] == pytest.approx(0)
+    assert fits['lower'][2] == pytest.approx(80)
+    assert fits['upper'][2] == pytest.approx(80)
@@ -0,0 +1,75 @@
+"""成绩趋势测试：向量化的 classify_trends 与原逐行规则一致"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from webapp.trends import classify_trends
+
+
+def _row_trend(row, score_columns):
+    """原 ScoreAnalyzer.calculate_trend 的逐行实现（作为对照）"""
+    scores = [row[col] for col in score_columns if pd.notna(row[col])]
+    if len(scores) < 2:
+        return "数据不足"
+
+    if len(scores) == 2:
+        if scores[1] > scores[0]:
+            return "上升"
+        elif scores[1] < scores[0]:
+            return "下降"
+        else:
+            return "持平"
+    else:
+        first_half = scores[:len(scores)//2]
+        second_half = scores[len(scores)//2:]
+
+        first_avg = np.mean(first_half)
+        second_avg = np.mean(second_half)
+
+        if second_avg > first_avg + 2:
+            return "总体上升"
+        elif second_avg < first_avg - 2:
+            return "总体下降"
+        else:
+            return "波动"
+
+
+CASES = [
+    [np.nan, np.nan, np.nan, np.nan],   # 全部缺考
+    [80, np.nan, np.nan, np.nan],       # 只有一次成绩
+    [np.nan, 70, np.nan, 75],           # 两次，中间有缺考
+    [90, np.nan, 85, np.nan],           # 两次，下降
+    [80, 80, np.nan, np.nan],           # 两次，持平
+    [80, 80, 80, 80],                   # 平稳
+    [60, np.nan, 70, 80],               # 三次，总体上升
+    [90, 80, np.nan, 70],               # 三次，总体下降
+    [80, 81, 82, 81],                   # 差距未超过阈值
+    [80, 82, 82, 82],                   # 恰好等于阈值
+    [70, 90, 60, 80],                   # 波动
+]
+
+
+def _compare(values, analyzer=None):
+    columns = [f"考试{i}" for i in range(values.shape[1])]
+    frame = pd.DataFrame(values, columns=columns)
+    expected = [_row_trend(row, columns) for _, row in frame.iterrows()]
+    assert list(classify_trends(values)) == expected
+    if analyzer is not None:
+        assert [analyzer.calculate_trend(row, columns)
+                for _, row in frame.iterrows()] == expected
+
+
+def test_classify_trends_matches_row_rule(analyzer):
+    _compare(np.array(CASES, dtype=float), analyzer)
+
+
+@pytest.mark.parametrize('n_exams', [1, 2, 3, 6])
+def test_classify_trends_random(n_exams):
+    rng = np.random.default_rng(n_exams)
+    values = rng.integers(50, 100, size=(300, n_exams)).astype(float)
+    values[rng.random(values.shape) < 0.3] = np.nan
+    _compare(values)
+
+
+def test_classify_trends_no_exams():
+    assert list(classify_trends(np.empty((2, 0)))) == ['数据不足'] * 2
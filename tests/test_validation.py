@@ -0,0 +1,112 @@
+"""导入校验测试：成绩解析、分数范围、重复学号与拒绝报告"""
+
+import io
+import numpy as np
+import pandas as pd
+from webapp.validation import (
+    REJECT_REASONS,
+    ScoreValidator,
+    canonical_ids,
+    rejection_report,
+    report_csv_bytes
+)
+
+
+def _reasons(validator):
+    rejects = validator.rejects
+    return dict(zip(rejects['学号'], rejects['原因']))
+
+
+def test_canonical_ids():
+    ids = canonical_ids(pd.Series(
+        [2024001.0, '2024001.0', ' 007 ', '', None, np.nan, 'A12.0', '2024.5'],
+        dtype=object))
+    assert ids.tolist()[:3] == ['2024001', '2024001', '007']
+    assert ids[3:6].isna().all()
+    assert ids.tolist()[6:] == ['A12.0', '2024.5']
+
+
+def test_missing_and_invalid_scores():
+    validator = ScoreValidator()
+    clean = validator.validate(pd.DataFrame({
+        '学号': ['1', '2', '3', '4', None],
+        '姓名': ['甲', '乙', '丙', '丁', '戊'],
+        '成绩': [90, np.nan, '  ', '缺考', 80],
+    }))
+    assert clean['学号'].tolist() == ['1']
+    assert clean['成绩'].tolist() == [90.0]
+    assert validator.rejects['原因'].tolist() == [
+        REJECT_REASONS['MISSING_SCORE'],
+        REJECT_REASONS['MISSING_SCORE'],
+        REJECT_REASONS['INVALID_SCORE'],
+        REJECT_REASONS['MISSING_ID'],
+    ]
+    assert validator.rejects['行号'].tolist() == [3, 4, 5, 6]
+
+
+def test_out_of_range_default_full_mark():
+    validator = ScoreValidator()
+    clean = validator.validate(pd.DataFrame({
+        '学号': ['1', '2', '3', '4'],
+        '成绩': [0, 150, 150.5, -1],
+    }))
+    assert clean['学号'].tolist() == ['1', '2']
+    assert _reasons(validator) == {
+        '3': REJECT_REASONS['OUT_OF_RANGE'],
+        '4': REJECT_REASONS['OUT_OF_RANGE'],
+    }
+
+
+def test_out_of_range_full_mark_column():
+    validator = ScoreValidator()
+    clean = validator.validate(pd.DataFrame({
+        '学号': ['1', '2', '3', '4'],
+        '成绩': [100, 101, 140, 120],
+        # 满分为空时使用默认满分 150
+        '满分': [100, 100, np.nan, '120'],
+    }))
+    assert clean['学号'].tolist() == ['1', '3', '4']
+    assert _reasons(validator) == {'2': REJECT_REASONS['OUT_OF_RANGE']}
+
+
+def test_duplicate_ids_across_chunks():
+    validator = ScoreValidator()
+    first = validator.validate(pd.DataFrame(
+        {'学号': [2024001, 2024002], '成绩': [90, 80]}, index=[0, 1]))
+    # 第二块中的 2024001 与第一块重复；同块内第二次出现的 2024003 也重复
+    second = validator.validate(pd.DataFrame(
+        {'学号': ['2024001.0', 2024003, 2024003], '成绩': [70, 60, 50]},
+        index=[2, 3, 4]))
+    assert first['学号'].tolist() == ['2024001', '2024002']
+    assert second['学号'].tolist() == ['2024003']
+    assert second['成绩'].tolist() == [60.0]
+    assert validator.rejects['原因'].tolist() == [
+        REJECT_REASONS['DUPLICATE_ID'] + "（与第 2 行相同）",
+        REJECT_REASONS['DUPLICATE_ID'] + "（与第 5 行相同）",
+    ]
+
+
+def test_chunk_with_every_row_rejected():
+    validator = ScoreValidator()
+    clean = validator.validate(pd.DataFrame(
+        {'学号': ['1', '2'], '成绩': [np.nan, '缺考']}))
+    assert clean.empty
+    assert validator.reject_count == 2
+
+
+def test_report_csv_bytes():
+    validator = ScoreValidator()
+    validator.validate(pd.DataFrame({
+        '学号': ['1', '2'], '姓名': ['甲', '乙'], '成绩': ['缺考', 200]}))
+    report = rejection_report([{
+        'file_name': '期中.xlsx', 'exam_name': '期中', 'validator': validator}])
+    data = report_csv_bytes(report)
+
+    # 带 BOM，Excel 可直接识别 UTF-8
+    assert data.startswith(b'\xef\xbb\xbf')
+    parsed = pd.read_csv(io.BytesIO(data), encoding='utf-8-sig', dtype=str)
+    assert list(parsed.columns) == ['文件', '考试', '行号', '学号', '姓名', '成绩', '原因']
+    assert parsed.values.tolist() == [
+        ['期中.xlsx', '期中', '2', '1', '甲', '缺考', REJECT_REASONS['INVALID_SCORE']],
+        ['期中.xlsx', '期中', '3', '2', '乙', '200', REJECT_REASONS['OUT_OF_RANGE']],
+    ]
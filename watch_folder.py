@@ -0,0 +1,43 @@
+import multiprocessing
+import sys
+
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+from webapp.cli import main
+
+
+class WatcherConfig(BaseSettings):
+    model_config = SettingsConfigDict(env_prefix="SCORE_WATCH_")
+
+    directory: str = "score_inbox"
+    db_path: str = ""
+    recursive: bool = False
+    workbook: bool = False
+    delta: bool = True
+    debounce_seconds: float = 2.0
+    poll_interval: float = 1.0
+    use_polling: bool = False
+
+
+if __name__ == "__main__":
+    # 批量导入的解析子进程需要从这里进入
+    multiprocessing.freeze_support()
+    config = WatcherConfig()
+    argv = []
+    if config.db_path:
+        argv += ["--db", config.db_path]
+    argv += [
+        "watch",
+        config.directory,
+        f"--debounce={config.debounce_seconds}",
+        f"--interval={config.poll_interval}",
+    ]
+    if config.recursive:
+        argv.append("--recursive")
+    if config.workbook:
+        argv.append("--workbook")
+    if config.delta:
+        argv.append("--delta")
+    if config.use_polling:
+        argv.append("--polling")
+    sys.exit(main(argv))
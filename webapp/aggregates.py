@@ -0,0 +1,186 @@
+"""
+运行聚合模块
+按考试、班级、学生维护成绩的 人数 / 平均分 / M2（离差平方和），
+单条成绩修改时用 Welford 算法 O(1) 增减，批量写入时按组重新计算
+"""
+
+import math
+import pandas as pd
+
+# 聚合范围
+SCOPES = ('exam', 'class', 'student')
+
+# 每次查询的ID数（避免超过 SQLite 参数上限）
+AGGREGATE_CHUNK_SIZE = 500
+
+EMPTY = (0, 0.0, 0.0)
+
+
+def welford_add(state, value):
+    """加入一个成绩，state 为 (人数, 平均分, M2)"""
+    count, mean, m2 = state
+    count += 1
+    delta = value - mean
+    mean += delta / count
+    m2 += delta * (value - mean)
+    return count, mean, m2
+
+
+def welford_remove(state, value):
+    """移除一个成绩（welford_add 的逆运算）"""
+    count, mean, m2 = state
+    if count <= 1:
+        return EMPTY
+    new_mean = (count * mean - value) / (count - 1)
+    m2 -= (value - mean) * (value - new_mean)
+    return count - 1, new_mean, max(m2, 0.0)
+
+
+def welford_merge(a, b):
+    """合并两组聚合（Chan 并行算法）"""
+    count = a[0] + b[0]
+    if count == 0:
+        return EMPTY
+    delta = b[1] - a[1]
+    mean = a[1] + delta * b[0] / count
+    m2 = a[2] + b[2] + delta * delta * a[0] * b[0] / count
+    return count, mean, m2
+
+
+def welford_subtract(total, part):
+    """从合并结果中去掉一组聚合（welford_merge 的逆运算）"""
+    count = total[0] - part[0]
+    if count <= 0:
+        return EMPTY
+    mean = (total[0] * total[1] - part[0] * part[1]) / count
+    delta = part[1] - mean
+    m2 = total[2] - part[2] - delta * delta * count * part[0] / total[0]
+    return count, mean, max(m2, 0.0)
+
+
+def sample_std(state):
+    """样本标准差（人数不足2人时为 0）"""
+    count, _, m2 = state
+    return math.sqrt(m2 / (count - 1)) if count > 1 else 0.0
+
+
+def _numeric(score):
+    try:
+        value = float(score)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(value) else value
+
+
+def get_state(cursor, scope, scope_id):
+    row = cursor.execute(
+        'SELECT score_count, mean, m2 FROM score_aggregates '
+        'WHERE scope = ? AND scope_id = ?',
+        (scope, int(scope_id))
+    ).fetchone()
+    return tuple(row) if row else EMPTY
+
+
+def put_state(cursor, scope, scope_id, state):
+    if state[0] <= 0:
+        cursor.execute(
+            'DELETE FROM score_aggregates WHERE scope = ? AND scope_id = ?',
+            (scope, int(scope_id))
+        )
+        return
+    cursor.execute(
+        'INSERT OR REPLACE INTO score_aggregates '
+        '(scope, scope_id, score_count, mean, m2) VALUES (?, ?, ?, ?, ?)',
+        (scope, int(scope_id), int(state[0]), float(state[1]), float(state[2]))
+    )
+
+
+def apply_score_change(cursor, student_id, exam_id, old_score, new_score):
+    """单条成绩变化后增量更新考试、学生及其班级的聚合（在调用方事务中）
+
+    old_score 为 None 表示新增，new_score 为 None 表示删除。返回考试的
+    新聚合 (人数, 平均分, M2)。
+    """
+    old_value = _numeric(old_score)
+    new_value = _numeric(new_score)
+    row = cursor.execute(
+        'SELECT class_id FROM students WHERE id = ?', (int(student_id),)
+    ).fetchone()
+    class_id = row[0] if row else None
+
+    scopes = [('exam', exam_id), ('student', student_id)]
+    if class_id is not None:
+        scopes.append(('class', class_id))
+
+    exam_state = None
+    for scope, scope_id in scopes:
+        state = get_state(cursor, scope, scope_id)
+        if old_value is not None:
+            state = welford_remove(state, old_value)
+        if new_value is not None:
+            state = welford_add(state, new_value)
+        put_state(cursor, scope, scope_id, state)
+        if scope == 'exam':
+            exam_state = state
+    return exam_state
+
+
+def move_student(cursor, student_id, old_class_id, new_class_id):
+    """学生换班：把该学生的聚合从原班级移到新班级"""
+    if old_class_id == new_class_id:
+        return
+    student_state = get_state(cursor, 'student', student_id)
+    if student_state[0] == 0:
+        return
+    if old_class_id is not None:
+        put_state(cursor, 'class', old_class_id, welford_subtract(
+            get_state(cursor, 'class', old_class_id), student_state))
+    if new_class_id is not None:
+        put_state(cursor, 'class', new_class_id, welford_merge(
+            get_state(cursor, 'class', new_class_id), student_state))
+
+
+_SCOPE_QUERIES = {
+    'exam': 'SELECT exam_id AS scope_id, score FROM scores '
+            'WHERE exam_id IN ({placeholders})',
+    'student': 'SELECT student_id AS scope_id, score FROM scores '
+               'WHERE student_id IN ({placeholders})',
+    'class': 'SELECT st.class_id AS scope_id, sc.score FROM scores sc '
+             'JOIN students st ON st.id = sc.student_id '
+             'WHERE st.class_id IN ({placeholders})',
+}
+
+
+def rebuild_aggregates(cursor, scope, scope_ids):
+    """按成绩表重新计算指定范围的聚合（批量写入后调用，在调用方事务中）"""
+    scope_ids = sorted({int(scope_id) for scope_id in scope_ids})
+    for start in range(0, len(scope_ids), AGGREGATE_CHUNK_SIZE):
+        chunk = scope_ids[start:start + AGGREGATE_CHUNK_SIZE]
+        placeholders = ','.join('?' for _ in chunk)
+        rows = cursor.execute(
+            _SCOPE_QUERIES[scope].format(placeholders=placeholders), chunk
+        ).fetchall()
+        cursor.executemany(
+            'DELETE FROM score_aggregates WHERE scope = ? AND scope_id = ?',
+            [(scope, scope_id) for scope_id in chunk]
+        )
+        if not rows:
+            continue
+
+        frame = pd.DataFrame(rows, columns=['scope_id', 'score'])
+        frame['score'] = pd.to_numeric(frame['score'], errors='coerce')
+        grouped = frame.dropna(subset=['score']).groupby('scope_id')['score']
+        summary = pd.DataFrame({
+            'score_count': grouped.count(),
+            'mean': grouped.mean(),
+            'm2': grouped.var(ddof=0) * grouped.count(),
+        })
+        cursor.executemany(
+            'INSERT INTO score_aggregates '
+            '(scope, scope_id, score_count, mean, m2) VALUES (?, ?, ?, ?, ?)',
+            [
+                (scope, int(row.Index), int(row.score_count), float(row.mean),
+                 float(row.m2))
+                for row in summary.itertuples()
+            ]
+        )
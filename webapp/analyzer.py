@@ -6,6 +6,198 @@
 import pandas as pd
 import numpy as np
 import os
+from webapp.trends import classify_trends, trend_slopes
+from webapp.grading import grade_band_table
+from webapp.excel_reader import (
+    IMPORT_COLUMNS,
+    ExcelChunkReader,
+    should_stream,
+    workbook_long_rows
+)
+from webapp.parse_cache import file_content_hash, parse_cache
+from webapp.validation import ScoreValidator, summarize_rejects
+from webapp.exam_stats import parse_stats_json
+from webapp.rank_transitions import BAND_SUFFIX, transition_matrix
+from webapp.rankings import (
+    RANK_SUFFIX,
+    Z_SCORE_SUFFIX,
+    is_ranking_column
+)
+
+# get_student_scores 结果中除考试成绩列以外的列
+SUMMARY_COLUMNS = ['student_id', 'name', '平均分', '趋势', '趋势斜率', '等级']
+
+
+def read_score_file(source, file_name, require_student_id=True, streaming=None,
+                    content_hash=None, cache=parse_cache):
+    """读取并检查成绩文件，不访问数据库（可在子进程中执行）
+
+    返回 (是否成功, 结果)：成功时结果为包含 file_name、exam_name、frames、
+    student_count、content_hash、validator 的字典，失败时为错误信息。frames
+    为校验后的数据（被拒绝的行记录在 validator 中）；流式读取时 frames 为
+    惰性迭代器，逐块校验，student_count 为 None。相同内容的文件直接使用
+    解析缓存。
+    """
+    if content_hash is None:
+        content_hash = file_content_hash(source)
+    entry = cache.get(content_hash) if cache is not None else None
+
+    # 读取Excel文件
+    reader = None
+    if entry is not None:
+        print(f"使用解析缓存: {content_hash[:12]}")
+        columns = entry['columns']
+        frames = entry['frames']
+        student_count = entry['student_count']
+    else:
+        if streaming is None:
+            streaming = should_stream(source)
+        if streaming:
+            reader = ExcelChunkReader(source)
+            columns = reader.columns
+            frames = _cached_chunks(reader, content_hash, cache)
+            student_count = None
+            print(f"使用流式读取，每块 {reader.chunk_size} 行")
+        else:
+            df = pd.read_excel(source)
+            columns = df.columns
+            frames = [df]
+            student_count = len(df)
+            if cache is not None:
+                # 只缓存导入用到的列
+                import_columns = [col for col in IMPORT_COLUMNS if col in columns]
+                cache.put(content_hash, {
+                    'columns': import_columns,
+                    'frames': [df[import_columns]],
+                    'student_count': student_count
+                })
+
+    # 检查必需列
+    required_columns = ["成绩"]
+    if require_student_id:
+        required_columns.append("学号")
+    else:
+        required_columns.append("姓名")
+
+    missing_columns = [
+        col for col in required_columns if col not in columns]
+    if missing_columns:
+        if reader is not None:
+            reader.close()
+        return False, f"Excel文件缺少必需列：{', '.join(missing_columns)}"
+
+    # 提取考试名称
+    exam_name = os.path.splitext(os.path.basename(file_name))[0]
+    print(f"考试名称: {exam_name}")
+
+    # 写入前校验：规范学号、解析成绩、检查范围与重复学号
+    validator = ScoreValidator(require_student_id)
+    if student_count is None:
+        frames = _validated_chunks(frames, validator)
+    else:
+        frames = [validator.validate(df) for df in frames]
+        student_count = sum(len(df) for df in frames)
+
+    return True, {
+        'file_name': file_name,
+        'exam_name': exam_name,
+        'frames': frames,
+        'student_count': student_count,
+        'content_hash': content_hash,
+        'validator': validator
+    }
+
+
+def _validated_chunks(frames, validator):
+    """逐块校验流式读取的数据块"""
+    for chunk in frames:
+        yield validator.validate(chunk)
+
+
+def _cached_chunks(reader, content_hash, cache):
+    """逐块产出流式读取结果，同时逐块写入解析缓存（全部读完后才生效）"""
+    if cache is None:
+        yield from reader
+        return
+    writer = cache.chunk_writer(
+        content_hash, {'columns': reader.columns, 'student_count': None})
+    complete = False
+    try:
+        for chunk in reader:
+            writer.append(chunk)
+            yield chunk
+        complete = True
+    finally:
+        if complete:
+            writer.commit()
+        else:
+            writer.abort()
+
+
+def read_workbook(source, file_name, require_student_id=True, content_hash=None,
+                  cache=parse_cache):
+    """一次读取工作簿的所有工作表，按科目拆分为多场考试（不访问数据库）
+
+    支持每个班级一个工作表、以及 语文/数学/英语… 多科目宽表两种格式。
+    考试名称为“文件名_科目”，只有成绩列时为文件名。返回 (是否成功, 结果)：
+    成功时结果为包含 file_name、content_hash 与 exams（每项同
+    read_score_file 的结果）的字典，失败时为错误信息。
+    """
+    if content_hash is None:
+        content_hash = file_content_hash(source)
+    cache_key = f"{content_hash}-workbook"
+    long_rows = cache.get(cache_key) if cache is not None else None
+
+    if long_rows is not None:
+        print(f"使用解析缓存: {content_hash[:12]}")
+    else:
+        sheets = pd.read_excel(source, sheet_name=None)
+        id_column = "学号" if require_student_id else "姓名"
+        long_rows = workbook_long_rows(sheets)
+        if long_rows is None or id_column not in long_rows.columns:
+            return False, f"工作簿中没有同时包含{id_column}和成绩列的工作表"
+        if cache is not None:
+            cache.put(cache_key, long_rows)
+
+    stem = os.path.splitext(os.path.basename(file_name))[0]
+    exams = []
+    for subject, rows in long_rows.groupby('科目', sort=False):
+        exam_name = f"{stem}_{subject}" if subject else stem
+        validator = ScoreValidator(require_student_id)
+        frame = validator.validate(rows.drop(columns=['科目']))
+        exams.append({
+            'file_name': file_name,
+            'exam_name': exam_name,
+            'frames': [frame],
+            'student_count': len(frame),
+            'content_hash': content_hash,
+            'validator': validator
+        })
+    print(f"工作簿 {stem}：{len(exams)} 场考试（{', '.join(exam['exam_name'] for exam in exams)}）")
+
+    return True, {
+        'file_name': file_name,
+        'content_hash': content_hash,
+        'exams': exams
+    }
+
+
+def _offset_progress(progress, offset):
+    """把单场考试的进度回调换算为整个工作簿的累计行数"""
+    if progress is None:
+        return None
+
+    def report(stage, rows):
+        progress(stage, offset + rows)
+    return report
+
+
+class _DryRunRollback(Exception):
+    """预览模式下用于回滚事务，携带本应返回的结果"""
+
+    def __init__(self, result):
+        super().__init__("dry run")
+        self.result = result
 
 
 class ScoreAnalyzer:
@@ -14,42 +206,203 @@ class ScoreAnalyzer:
     def __init__(self, db_manager):
         self.db = db_manager
 
-    def process_excel_file(self, uploaded_file, require_student_id=True, auto_generate_id=False):
-        """处理Excel文件"""
+    def process_excel_file(self, uploaded_file, require_student_id=True, auto_generate_id=False,
+                           streaming=None, delta=False, remove_missing=False, dry_run=False):
+        """处理Excel文件
+
+        streaming 为 None 时按文件大小自动选择：大型 xlsx 以只读模式分块读取，
+        每读完一块立即批量写入，内存占用与文件大小无关。delta=True 时只写入
+        与已存成绩不同的行（remove_missing 同时删除文件中没有的成绩），
+        dry_run=True 时只返回差异摘要，不写入任何数据。
+        """
         try:
             print(f"开始处理文件: {uploaded_file.name}")
+            success, parsed = read_score_file(
+                uploaded_file, uploaded_file.name, require_student_id, streaming)
+            if not success:
+                return False, parsed
+            return self.import_parsed_file(
+                parsed, require_student_id, auto_generate_id,
+                delta=delta, remove_missing=remove_missing, dry_run=dry_run)
 
-            # 读取Excel文件
-            df = pd.read_excel(uploaded_file)
+        except Exception as e:
+            print(f"处理文件时出现错误: {str(e)}")
+            return False, f"处理文件时出现错误：{str(e)}"
 
-            # 检查必需列
-            required_columns = ["成绩"]
-            if require_student_id:
-                required_columns.append("学号")
-            else:
-                required_columns.append("姓名")
+    def process_workbook(self, uploaded_file, require_student_id=True, auto_generate_id=False,
+                         delta=False, remove_missing=False, dry_run=False):
+        """处理多工作表 / 多科目工作簿（整个工作簿一个事务）
 
-            missing_columns = [
-                col for col in required_columns if col not in df.columns]
-            if missing_columns:
-                return False, f"Excel文件缺少必需列：{', '.join(missing_columns)}"
+        各工作表一次读入，科目列融合为长表后按科目拆分为多场考试；有班级列
+        或每个班级一个工作表时同时设置学生班级。其余参数同 process_excel_file。
+        """
+        try:
+            print(f"开始处理工作簿: {uploaded_file.name}")
+            success, parsed = read_workbook(
+                uploaded_file, uploaded_file.name, require_student_id)
+            if not success:
+                return False, parsed
+            return self.import_parsed_file(
+                parsed, require_student_id, auto_generate_id,
+                delta=delta, remove_missing=remove_missing, dry_run=dry_run)
+
+        except Exception as e:
+            print(f"处理文件时出现错误: {str(e)}")
+            return False, f"处理文件时出现错误：{str(e)}"
 
-            # 提取考试名称
-            exam_name = os.path.splitext(uploaded_file.name)[0]
-            print(f"考试名称: {exam_name}")
+    def import_parsed_file(self, parsed, require_student_id=True, auto_generate_id=False,
+                           progress=None, delta=False, remove_missing=False, dry_run=False):
+        """将 read_score_file / read_workbook 的解析结果写入数据库（一个文件一个事务）
 
-            # 第一步：处理考试信息
-            print("=== 第一步：处理考试信息 ===")
-            exam_result = self._handle_exam_info(
-                exam_name, uploaded_file.name, len(df))
-            if not exam_result['success']:
-                return False, exam_result['message']
+        progress(阶段, 已写入行数) 在每个数据块的学生、成绩阶段开始及写完后
+        调用，阶段为 'students' 或 'scores'；回调抛出异常时本文件整体回滚。
+        delta、remove_missing、dry_run 含义同 process_excel_file。
+        """
+        try:
+            if 'exams' in parsed:
+                return self._import_workbook(
+                    parsed, require_student_id, auto_generate_id, progress,
+                    delta, remove_missing, dry_run)
+            return self._import_exam_frames(
+                parsed['exam_name'], parsed['file_name'], parsed['frames'],
+                parsed['student_count'], require_student_id, auto_generate_id,
+                progress, parsed.get('content_hash'), delta, remove_missing,
+                dry_run, parsed.get('validator'))
+        except Exception as e:
+            print(f"处理文件时出现错误: {str(e)}")
+            return False, f"处理文件时出现错误：{str(e)}"
 
-            exam_id = exam_result['exam_id']
-            print(f"考试处理完成，ID: {exam_id}")
+    def _import_exam_frames(self, exam_name, file_path, frames, student_count,
+                            require_student_id, auto_generate_id, progress=None,
+                            content_hash=None, delta=False, remove_missing=False,
+                            dry_run=False, validator=None):
+        """将一场考试的一个或多个数据块写入数据库
+
+        考试、学生、成绩在同一个事务中写入，只提交一次；student_count 为
+        None 时（流式读取）在全部数据块写入后回填学生数量。dry_run=True 时
+        完整执行后整体回滚，只返回结果摘要。
+        """
+        return self._run_import(
+            lambda: self._write_exam_frames(
+                exam_name, file_path, frames, student_count,
+                require_student_id, auto_generate_id, progress,
+                content_hash, delta, remove_missing, validator),
+            dry_run
+        )
 
+    def _import_workbook(self, parsed, require_student_id, auto_generate_id,
+                         progress=None, delta=False, remove_missing=False,
+                         dry_run=False):
+        """在一个事务中写入工作簿拆分出的所有考试，并设置学生班级"""
+        def write():
+            messages = []
+            all_success = True
+            rows_before = 0
+            for exam in parsed['exams']:
+                success, message = self._write_exam_frames(
+                    exam['exam_name'], parsed['file_name'], exam['frames'],
+                    exam['student_count'], require_student_id, auto_generate_id,
+                    _offset_progress(progress, rows_before),
+                    parsed['content_hash'], delta, remove_missing,
+                    exam.get('validator'))
+                all_success = all_success and success
+                messages.append(f"{exam['exam_name']}：{message}")
+                rows_before += exam['student_count']
+
+            frames = [frame for exam in parsed['exams'] for frame in exam['frames']]
+            class_count = self._assign_classes(
+                frames, require_student_id, auto_generate_id)
+            summary = f"工作簿导入 {len(parsed['exams'])} 场考试"
+            if class_count:
+                summary += f"，设置 {class_count} 名学生的班级"
+            return all_success, f"{summary}。" + "；".join(messages)
+
+        return self._run_import(write, dry_run)
+
+    def _run_import(self, write, dry_run=False):
+        """在一个事务中执行 write()；dry_run=True 时执行完整体回滚，只返回摘要"""
+        try:
+            with self.db.transaction():
+                result = write()
+                if dry_run:
+                    raise _DryRunRollback(result)
+        except _DryRunRollback as rollback:
+            print("预览模式：已回滚，未写入任何数据")
+            success, message = rollback.result
+            return success, f"预览（未写入）：{message}"
+        return result
+
+    def _assign_classes(self, frames, require_student_id, auto_generate_id):
+        """按班级列设置学生班级（班级不存在时创建），返回设置的学生数"""
+        pairs = []
+        for df in frames:
+            if '班级' not in df.columns:
+                continue
+            students = self._student_frame(
+                df, require_student_id, auto_generate_id)
+            pairs.append(pd.DataFrame({
+                'key': students['key'],
+                'class_name': df['班级']
+            }))
+        if not pairs:
+            return 0
+
+        pairs = pd.concat(pairs)
+        pairs = pairs[pairs['key'].notna() & pairs['class_name'].notna()]
+        pairs['class_name'] = pairs['class_name'].astype(str).str.strip()
+        pairs = pairs[pairs['class_name'] != ''].drop_duplicates(
+            'key', keep='last')
+        if pairs.empty:
+            return 0
+
+        class_names = pairs['class_name'].unique().tolist()
+        self.db.bulk_create_classes(class_names)
+        class_map = self.db.get_class_id_map(class_names)
+        student_map = self.db.get_student_id_map(pairs['key'].tolist())
+
+        student_ids = pairs['key'].map(student_map)
+        class_ids = pairs['class_name'].map(class_map)
+        valid = student_ids.notna() & class_ids.notna()
+        assignments = list(zip(
+            class_ids[valid].astype(int).tolist(),
+            student_ids[valid].astype(int).tolist()
+        ))
+        self.db.assign_student_classes(assignments)
+        print(f"设置学生班级：{len(assignments)} 人，{len(class_names)} 个班级")
+        return len(assignments)
+
+    def _write_exam_frames(self, exam_name, file_path, frames, student_count,
+                           require_student_id, auto_generate_id, progress,
+                           content_hash, delta, remove_missing, validator=None):
+        """在当前事务中写入考试、学生与成绩，返回 (是否成功, 信息)
+
+        validator 为解析时的 ScoreValidator，未通过校验的行计为失败。
+        """
+        # 第一步：处理考试信息
+        print("=== 第一步：处理考试信息 ===")
+        exam_result = self._handle_exam_info(
+            exam_name, file_path, student_count or 0, content_hash)
+        if not exam_result['success']:
+            return False, exam_result['message']
+
+        exam_id = exam_result['exam_id']
+        print(f"考试处理完成，ID: {exam_id}")
+
+        totals = {
+            'existing_count': 0,
+            'new_count': 0,
+            'success_count': 0,
+            'error_count': 0
+        }
+        all_success = True
+        row_count = 0
+        # 增量模式下先收集全部成绩，最后与已存成绩比对
+        delta_rows = [] if delta else None
+        for df in frames:
             # 第二步：预处理学生信息
             print("=== 第二步：预处理学生信息 ===")
+            if progress is not None:
+                progress('students', row_count)
             student_result = self._preprocess_students(
                 df, require_student_id, auto_generate_id)
             if not student_result['success']:
@@ -60,20 +413,102 @@ class ScoreAnalyzer:
 
             # 第三步：处理成绩数据
             print("=== 第三步：处理成绩数据 ===")
+            if progress is not None:
+                progress('scores', row_count)
             score_result = self._process_scores(
-                df, student_id_map, exam_id, require_student_id, auto_generate_id)
-
-            # 返回最终结果
-            if score_result['success']:
-                return True, f"成功导入 {score_result['success_count']} 名学生成绩（现有学生：{student_result['existing_count']}人，新增学生：{student_result['new_count']}人）"
-            else:
-                return False, f"导入完成，成功: {score_result['success_count']} 人，失败: {score_result['error_count']} 人（现有学生：{student_result['existing_count']}人，新增学生：{student_result['new_count']}人）"
+                df, student_id_map, exam_id, require_student_id, auto_generate_id,
+                collect=delta_rows)
+
+            all_success = all_success and score_result['success']
+            for key in ('existing_count', 'new_count'):
+                totals[key] += student_result[key]
+            for key in ('success_count', 'error_count'):
+                totals[key] += score_result[key]
+
+            row_count += len(df)
+            if progress is not None:
+                progress('scores', row_count)
+
+        if student_count is None:
+            self.db.update_exam_info(exam_id, file_path, row_count)
+
+        # 流式读取时全部数据块读完后才能得到完整的校验结果
+        rejects_text = ""
+        if validator is not None and validator.reject_count:
+            totals['error_count'] += validator.reject_count
+            all_success = False
+            rejects_text = f"（{summarize_rejects(validator.rejects)}）"
+
+        students_text = f"（现有学生：{totals['existing_count']}人，新增学生：{totals['new_count']}人）"
+        if delta:
+            # 第四步：比对并写入成绩差异
+            print("=== 第四步：比对成绩差异 ===")
+            diff = self._apply_score_delta(exam_id, delta_rows, remove_missing)
+            diff_text = (
+                f"新增 {diff['inserted']} 条，修改 {diff['changed']} 条，"
+                f"删除 {diff['removed']} 条，未变化 {diff['unchanged']} 条"
+            )
+            if all_success:
+                return True, f"增量导入 {totals['success_count']} 名学生成绩：{diff_text}{students_text}"
+            return False, f"导入完成，成功: {totals['success_count']} 人，失败: {totals['error_count']} 人{rejects_text}；{diff_text}{students_text}"
+
+        # 返回最终结果
+        if all_success:
+            return True, f"成功导入 {totals['success_count']} 名学生成绩{students_text}"
+        else:
+            return False, f"导入完成，成功: {totals['success_count']} 人，失败: {totals['error_count']} 人{rejects_text}{students_text}"
+
+    def _apply_score_delta(self, exam_id, rows, remove_missing=False):
+        """与已存成绩按学生比对，只写入新增、修改（以及可选的删除）的成绩
+
+        学生ID与学号一一对应，比对即按学号进行；重复学号已由 ScoreValidator
+        剔除（以第一次出现的行为准），rows 中每个学生只有一行。返回各类差异
+        的数量。
+        """
+        incoming = pd.DataFrame(
+            rows, columns=['student_id', 'exam_id', 'score'])
+        stored = self.db.get_exam_score_rows(exam_id)
+        merged = incoming.merge(
+            stored, on='student_id', how='outer',
+            suffixes=('', '_stored'), indicator=True
+        )
 
-        except Exception as e:
-            print(f"处理文件时出现错误: {str(e)}")
-            return False, f"处理文件时出现错误：{str(e)}"
+        new_scores = pd.to_numeric(merged['score'], errors='coerce')
+        old_scores = pd.to_numeric(merged['score_stored'], errors='coerce')
+        inserted = merged['_merge'] == 'left_only'
+        both = merged['_merge'] == 'both'
+        changed = both & ~(new_scores == old_scores)
+        missing = merged['_merge'] == 'right_only'
+
+        to_write = merged[inserted | changed]
+        upserts = list(zip(
+            to_write['student_id'].astype(int).tolist(),
+            [int(exam_id)] * len(to_write),
+            to_write['score'].tolist()
+        ))
+        deletes = []
+        if remove_missing:
+            deletes = [
+                (student_id, int(exam_id))
+                for student_id in merged.loc[missing, 'student_id'].astype(int).tolist()
+            ]
+        if upserts or deletes:
+            self.db.apply_score_changes(upserts, deletes)
+
+        diff = {
+            'inserted': int(inserted.sum()),
+            'changed': int(changed.sum()),
+            'removed': len(deletes),
+            'unchanged': int((both & ~changed).sum()),
+        }
+        print(
+            f"成绩差异：新增 {diff['inserted']} 条，修改 {diff['changed']} 条，"
+            f"删除 {diff['removed']} 条，未变化 {diff['unchanged']} 条"
+            f"（文件中不存在的已有成绩 {int(missing.sum())} 条）"
+        )
+        return diff
 
-    def _handle_exam_info(self, exam_name, file_path, student_count):
+    def _handle_exam_info(self, exam_name, file_path, student_count, content_hash=None):
         """处理考试信息"""
         try:
             # 检查考试是否已存在
@@ -81,12 +516,12 @@ class ScoreAnalyzer:
 
             if not existing_exam.empty:
                 # 考试已存在，更新信息
-                exam_id = existing_exam.iloc[0]['id']
+                exam_id = int(existing_exam.iloc[0]['id'])
                 print(f"考试 '{exam_name}' 已存在，ID: {exam_id}，将更新信息")
 
                 # 更新考试信息
                 success = self.db.update_exam_info(
-                    exam_id, file_path, student_count)
+                    exam_id, file_path, student_count, content_hash)
                 if success:
                     return {'success': True, 'exam_id': exam_id, 'message': "考试信息更新成功"}
                 else:
@@ -95,7 +530,7 @@ class ScoreAnalyzer:
                 # 考试不存在，插入新记录
                 print(f"考试 '{exam_name}' 不存在，将创建新记录")
                 exam_id = self.db.insert_new_exam(
-                    exam_name, file_path, student_count)
+                    exam_name, file_path, student_count, content_hash)
 
                 if exam_id:
                     return {'success': True, 'exam_id': exam_id, 'message': "考试创建成功"}
@@ -106,226 +541,217 @@ class ScoreAnalyzer:
             print(f"处理考试信息时出错: {e}")
             return {'success': False, 'message': f"处理考试信息时出错: {str(e)}"}
 
-    def _preprocess_students(self, df, require_student_id, auto_generate_id):
-        """预处理学生信息"""
-        try:
-            student_id_map = {}
-            new_students = []
-            existing_students = []
-
-            print("正在预处理学生信息...")
-
-            for index, row in df.iterrows():
-                # 处理学生标识
-                if require_student_id and "学号" in df.columns:
-                    student_id_value = str(row["学号"])
-                    name = row.get("姓名", f"学生{student_id_value}")
-                elif auto_generate_id and "姓名" in df.columns:
-                    name = row["姓名"]
-                    student_id_value = f"ST{index+1:03d}"
-                else:
-                    name = row["姓名"]
-                    student_id_value = name
-
-                # 检查学生是否已存在
-                existing_student_id = self.db.get_student_id_by_student_id(
-                    student_id_value)
-
-                if existing_student_id:
-                    # 学生已存在，使用现有ID
-                    student_id_map[student_id_value] = existing_student_id
-                    existing_students.append(name)
-                    print(
-                        f"学生已存在：{name} (学号: {student_id_value}) -> ID: {existing_student_id}")
-                else:
-                    # 学生不存在，插入新记录
-                    new_student_id = self.db.insert_student_with_id(
-                        name, student_id_value)
-                    if new_student_id:
-                        student_id_map[student_id_value] = new_student_id
-                        new_students.append(name)
-                        print(
-                            f"新学生插入成功：{name} (学号: {student_id_value}) -> ID: {new_student_id}")
-                    else:
-                        print(f"警告：学生信息插入失败，学号: {student_id_value}，姓名: {name}")
-
-            # 打印学生统计信息
-            print("本次考试学生统计：")
-            print(
-                f"  - 现有学生：{len(existing_students)} 人 ({', '.join(existing_students[:5])}{'...' if len(existing_students) > 5 else ''})")
-            print(
-                f"  - 新增学生：{len(new_students)} 人 ({', '.join(new_students[:5])}{'...' if len(new_students) > 5 else ''})")
-            print(f"  - 总学生数：{len(student_id_map)} 人")
-
-            return {
-                'success': True,
-                'student_id_map': student_id_map,
-                'existing_count': len(existing_students),
-                'new_count': len(new_students)
-            }
-
-        except Exception as e:
-            print(f"预处理学生信息时出错: {e}")
-            return {'success': False, 'message': f"预处理学生信息时出错: {str(e)}"}
-
-    def _process_scores(self, df, student_id_map, exam_id, require_student_id, auto_generate_id):
-        """处理成绩数据"""
-        try:
-            success_count = 0
-            error_count = 0
-
-            print("正在处理成绩数据...")
-
-            for index, row in df.iterrows():
-                try:
-                    score = row["成绩"]
-
-                    # 处理学生标识
-                    if require_student_id and "学号" in df.columns:
-                        student_id_value = str(row["学号"])
-                        name = row.get("姓名", f"学生{student_id_value}")
-                    elif auto_generate_id and "姓名" in df.columns:
-                        name = row["姓名"]
-                        student_id_value = f"ST{index+1:03d}"
-                    else:
-                        name = row["姓名"]
-                        student_id_value = name
-
-                    # 从映射表获取学生ID
-                    student_id = student_id_map.get(student_id_value)
-
-                    if student_id is None:
-                        print(f"错误：无法获取学生ID，学号: {student_id_value}，姓名: {name}")
-                        print(f"当前映射表: {student_id_map}")
-                        error_count += 1
-                        continue
-
-                    # 确保student_id是Python原生int类型（修复numpy.int64兼容性问题）
-                    student_id = int(student_id)
-
-                    # 插入成绩
-                    result = self.db.insert_score(student_id, exam_id, score)
-                    if result:
-                        success_count += 1
-                        print(f"成绩插入成功：{name} -> {score}分")
-                    else:
-                        error_count += 1
-                        print(f"成绩插入失败：{name} -> {score}分")
-
-                except Exception as e:
-                    print(f"处理第 {index+1} 行数据时出错: {e}")
-                    error_count += 1
-
-            return {
-                'success': error_count == 0,
-                'success_count': success_count,
-                'error_count': error_count
-            }
+    def _student_frame(self, df, require_student_id, auto_generate_id):
+        """按导入选项生成每行的学号与姓名"""
+        if require_student_id and "学号" in df.columns:
+            keys = df["学号"].map(str)
+            if "姓名" in df.columns:
+                names = df["姓名"]
+            else:
+                names = "学生" + keys
+        elif auto_generate_id and "姓名" in df.columns:
+            names = df["姓名"]
+            keys = pd.Series(
+                "ST" + pd.Series(df.index + 1).astype(str).str.zfill(3).values,
+                index=df.index
+            )
+        else:
+            names = df["姓名"]
+            keys = names
 
-        except Exception as e:
-            print(f"处理成绩数据时出错: {e}")
-            return {'success': False, 'success_count': 0, 'error_count': 0}
+        return pd.DataFrame({'key': keys, 'name': names}, index=df.index)
 
-    def get_student_scores(self, selected_exams):
-        """获取学生成绩数据"""
+    def _preprocess_students(self, df, require_student_id, auto_generate_id):
+        """预处理学生信息（集合化查询与批量插入）
+
+        在调用方的事务中执行，出错时异常直接抛出，由 transaction() 回滚整个文件。
+        """
+        print("正在预处理学生信息...")
+
+        students = self._student_frame(
+            df, require_student_id, auto_generate_id)
+        students = students[students['key'].notna()]
+
+        # 一次查询解析所有已存在的学号
+        unique_students = students.drop_duplicates('key')
+        existing_map = self.db.get_student_id_map(
+            unique_students['key'].tolist())
+
+        # 批量插入新学生（姓名为空的记录无法插入）
+        new_students = unique_students[
+            ~unique_students['key'].isin(list(existing_map))
+            & unique_students['name'].notna()
+        ]
+        created_map = {}
+        if not new_students.empty:
+            self.db.bulk_insert_students(
+                zip(new_students['key'].tolist(),
+                    new_students['name'].tolist())
+            )
+            created_map = self.db.get_student_id_map(
+                new_students['key'].tolist())
+
+        student_id_map = {**existing_map, **created_map}
+
+        # 与逐行处理保持一致：同一文件中重复出现的新学生，
+        # 第二次出现时按现有学生计数
+        existing_rows = students['key'].isin(list(existing_map))
+        created_rows = students['key'].isin(list(created_map))
+        existing_count = int(existing_rows.sum()) + \
+            int(created_rows.sum()) - len(created_map)
+        new_count = len(created_map)
+
+        existing_names = students.loc[existing_rows, 'name'].astype(
+            str).tolist()
+        new_names = new_students.loc[
+            new_students['key'].isin(list(created_map)), 'name'
+        ].astype(str).tolist()
+        failed = len(new_students) - len(created_map)
+        if failed:
+            print(f"警告：{failed} 名学生信息插入失败")
+
+        # 打印学生统计信息
+        print("本次考试学生统计：")
+        print(
+            f"  - 现有学生：{existing_count} 人 ({', '.join(existing_names[:5])}{'...' if existing_count > 5 else ''})")
+        print(
+            f"  - 新增学生：{new_count} 人 ({', '.join(new_names[:5])}{'...' if new_count > 5 else ''})")
+        print(f"  - 总学生数：{len(student_id_map)} 人")
+
+        return {
+            'success': True,
+            'student_id_map': student_id_map,
+            'existing_count': existing_count,
+            'new_count': new_count
+        }
+
+    def _process_scores(self, df, student_id_map, exam_id, require_student_id, auto_generate_id,
+                        collect=None):
+        """处理成绩数据（批量写入；collect 为列表时只收集成绩行，不写入）
+
+        出错时异常直接抛出，由 transaction() 回滚整个文件。
+        """
+        print("正在处理成绩数据...")
+
+        students = self._student_frame(
+            df, require_student_id, auto_generate_id)
+        student_ids = students['key'].map(student_id_map)
+        scores = df["成绩"]
+
+        valid = student_ids.notna() & scores.notna()
+        missing_students = int(student_ids.isna().sum())
+        if missing_students:
+            print(f"错误：{missing_students} 行无法获取学生ID")
+
+        rows = list(zip(
+            student_ids[valid].astype(int).tolist(),
+            [int(exam_id)] * int(valid.sum()),
+            scores[valid].tolist()
+        ))
+        if collect is not None:
+            collect.extend(rows)
+        elif rows:
+            self.db.bulk_upsert_scores(rows)
+
+        success_count = len(rows)
+        error_count = len(df) - success_count
+        print(f"成绩写入完成：成功 {success_count} 行，失败 {error_count} 行")
+
+        return {
+            'success': error_count == 0,
+            'success_count': success_count,
+            'error_count': error_count
+        }
+
+    def get_student_scores(self, selected_exams, class_names=None):
+        """获取学生成绩数据（class_names 不为 None 时只含这些班级的学生）"""
         if not selected_exams:
             return pd.DataFrame()
 
-        # 获取原始数据
-        df = self.db.get_student_scores(selected_exams)
+        class_ids = None
+        if class_names is not None:
+            class_ids = list(self.db.get_class_id_map(class_names).values())
 
-        if df.empty:
-            return df
+        # 从物化的成绩矩阵中按列切片（无需重新透视）
+        df_pivot = self.db.score_matrix.select(selected_exams, class_ids)
 
-        # 重塑数据
-        df_pivot = df.pivot(index=['student_id', 'name'],
-                            columns='exam_name', values='score')
-        df_pivot = df_pivot.reset_index()
+        if df_pivot.empty:
+            return df_pivot
 
         # 计算统计信息
         score_columns = [
             col for col in df_pivot.columns if col not in ['student_id', 'name']]
 
         # 对所有成绩列保留1位小数
-        for col in score_columns:
-            df_pivot[col] = df_pivot[col].round(1)
+        df_pivot[score_columns] = df_pivot[score_columns].round(1)
 
         df_pivot['平均分'] = df_pivot[score_columns].mean(axis=1).round(1)
-        df_pivot['趋势'] = df_pivot.apply(
-            lambda row: self.calculate_trend(row, score_columns), axis=1
-        )
-        df_pivot['等级'] = df_pivot['平均分'].apply(self.calculate_level)
+        # 对整个矩阵一次性计算趋势与斜率
+        score_values = df_pivot[score_columns].to_numpy(dtype=float)
+        df_pivot['趋势'] = classify_trends(score_values)
+        df_pivot['趋势斜率'] = trend_slopes(score_values).round(2)
+        df_pivot['等级'] = grade_band_table().levels(df_pivot['平均分'])
+
+        # 每场考试的名次、百分位、Z分（在整场考试中计算，按考试缓存）
+        rankings = self.db.rankings.wide(score_columns).reindex(
+            df_pivot['student_id'])
+        for col in rankings.columns:
+            values = rankings[col].to_numpy()
+            if col.endswith(RANK_SUFFIX):
+                df_pivot[col] = pd.array(values, dtype='Int64')
+            elif col.endswith(Z_SCORE_SUFFIX):
+                df_pivot[col] = np.round(values.astype(float), 2)
+            else:
+                df_pivot[col] = values.astype(float)
 
         return df_pivot
 
-    def calculate_trend(self, row, score_columns):
-        """计算成绩趋势"""
-        scores = [row[col] for col in score_columns if pd.notna(row[col])]
-        if len(scores) < 2:
-            return "数据不足"
-
-        if len(scores) == 2:
-            if scores[1] > scores[0]:
-                return "上升"
-            elif scores[1] < scores[0]:
-                return "下降"
-            else:
-                return "持平"
-        else:
-            first_half = scores[:len(scores)//2]
-            second_half = scores[len(scores)//2:]
-
-            first_avg = np.mean(first_half)
-            second_avg = np.mean(second_half)
+    def get_exam_columns(self, student_scores):
+        """获取 get_student_scores 结果中的考试成绩列"""
+        return [
+            col for col in student_scores.columns
+            if col not in SUMMARY_COLUMNS
+            and not is_ranking_column(col, student_scores.columns)
+        ]
 
-            if second_avg > first_avg + 2:
-                return "总体上升"
-            elif second_avg < first_avg - 2:
-                return "总体下降"
-            else:
-                return "波动"
+    def calculate_trend(self, row, score_columns):
+        """计算单个学生的成绩趋势（按 score_columns 顺序）"""
+        values = pd.to_numeric(row[list(score_columns)], errors='coerce')
+        return classify_trends(values.to_numpy(dtype=float))[0]
 
     def calculate_level(self, score):
         """计算成绩等级"""
-        if pd.isna(score):
-            return "未知"
-
-        if score >= 90:
-            return "优秀"
-        elif score >= 80:
-            return "良好"
-        elif score >= 70:
-            return "中等"
-        elif score >= 60:
-            return "及格"
-        else:
-            return "不及格"
+        return grade_band_table().levels([score])[0]
+
+    def get_exam_stats(self, exam_names=None):
+        """获取考试统计（读取 exam_stats，每场考试一行，不扫描成绩）
+
+        histogram 为 {段起始分: 人数}，bands 为 {分数段标签: 人数}。
+        """
+        stats = self.db.get_exam_stats(exam_names)
+        if stats.empty:
+            return stats
+        return parse_stats_json(stats)
 
     def get_exam_detail(self, exam_name):
-        """获取指定考试的详细信息"""
-        try:
-            # 获取考试基本信息
-            exam_info = self.db.get_exam_by_name(exam_name)
+        """获取指定考试的详细信息
 
-            if exam_info.empty:
+        返回 {'stats': 统计（Series）, 'scores': 成绩 DataFrame（按成绩降序，
+        列为 student_id、student_name、score、record_time）}，考试不存在时
+        返回 None。
+        """
+        try:
+            stats = self.get_exam_stats([exam_name])
+            if stats.empty:
                 return None
 
-            # 获取该考试的所有学生成绩
-            scores_df = self.db.get_exam_scores(exam_name)
-
-            # 转换为字典格式
-            scores_list = []
-            for _, row in scores_df.iterrows():
-                scores_list.append({
-                    'student_id': row['student_id'],
-                    'student_name': row['student_name'],
-                    'score': row['score'],
-                    'record_time': row['record_time']
-                })
-
-            return scores_list
+            return {
+                'stats': stats.iloc[0],
+                'scores': self.db.get_exam_scores(exam_name)
+            }
 
-        except Exception:
+        except Exception as e:
+            print(f"获取考试详情失败: {e}")
             return None
 
     def delete_exam(self, exam_name):
@@ -340,6 +766,90 @@ class ScoreAnalyzer:
         """清理孤立的记录"""
         return self.db.cleanup_orphaned_records()
 
+    def get_class_rollups(self, selected_exams, class_names=None):
+        """获取所选考试的 班级×考试 汇总（平均分、中位数、及格率、优秀率、
+        班级排名），class_names 不为 None 时只含这些班级
+
+        班级排名在全部班级中计算，不受班级筛选影响。
+        """
+        class_ids = None
+        if class_names is not None:
+            class_ids = list(self.db.get_class_id_map(class_names).values())
+        return self.db.class_rollups.get(selected_exams, class_ids)
+
+    def get_student_trajectories(self, class_names=None, min_exams=2):
+        """获取学生成绩轨迹（全部考试按时间顺序的线性拟合与下次预测）
+
+        只返回至少有 min_exams 次成绩的学生，class_names 不为 None 时只含
+        这些班级的学生。斜率为每场考试的平均变化分数。
+        """
+        trajectories = self.db.trajectories.get()
+        trajectories = trajectories[trajectories['考试次数'] >= min_exams]
+        if class_names is not None:
+            trajectories = trajectories[
+                trajectories['class_name'].isin(list(class_names))]
+        return trajectories.reset_index(drop=True)
+
+    def get_rank_transitions(self, exam_names, class_names=None):
+        """获取考试链（按给定顺序）的名次变化与等级转移矩阵
+
+        返回字典：exams、students（各场成绩、名次、等级与名次变化，正数为
+        进步）、matrices（相邻两场的等级转移人数）。名次在全年级计算；
+        class_names 不为 None 时只统计这些班级的学生。
+        """
+        result = self.db.rank_transitions.get(exam_names)
+        if class_names is None:
+            return result
+        students = result['students']
+        students = students[
+            students['class_name'].isin(list(class_names))
+        ].reset_index(drop=True)
+        return {
+            'exams': result['exams'],
+            'students': students,
+            'matrices': [
+                self._band_crosstab(students, before, after)
+                for before, after in zip(result['exams'], result['exams'][1:])
+            ],
+        }
+
+    @staticmethod
+    def _band_crosstab(students, before, after):
+        """按等级列重新统计转移人数（行列与全年级矩阵一致，从高到低）"""
+        names = pd.Index(grade_band_table().names[::-1])
+        matrix = transition_matrix(
+            names.get_indexer(students[f"{before}{BAND_SUFFIX}"]),
+            names.get_indexer(students[f"{after}{BAND_SUFFIX}"]),
+            len(names)
+        )
+        return pd.DataFrame(matrix, index=list(names), columns=list(names))
+
+    def get_attention_list(self, latest_only=True, class_names=None,
+                           kinds=None):
+        """获取需要关注的学生（异常标记），按严重程度降序
+
+        latest_only=True 时只看每个学生最近一场考试；kinds 为 ANOMALY_KINDS
+        中的类型列表，为 None 时不筛选。
+        """
+        flags = self.db.get_anomaly_flags(latest_only)
+        if class_names is not None:
+            flags = flags[flags['class_name'].isin(list(class_names))]
+        if kinds is not None:
+            flags = flags[flags['kind'].isin(list(kinds))]
+        return flags.reset_index(drop=True)
+
+    def rescan_anomalies(self):
+        """全量重新扫描异常，返回标记数"""
+        return self.db.rescan_anomalies()
+
+    def get_all_classes(self):
+        """获取所有班级"""
+        return self.db.get_all_classes()
+
     def get_all_exams(self):
         """获取所有考试"""
         return self.db.get_all_exams()
+
+    def get_data_version(self):
+        """获取数据版本号，用于缓存失效判断"""
+        return self.db.get_data_version()
@@ -0,0 +1,166 @@
+"""
+异常检测模块
+对 学生×考试 成绩矩阵（按考试时间排列）做向量化扫描，标记两类需要关注的
+情况：成绩比本人历史平均低出 K 个标准差以上的骤降，以及比上一场考试下降
+多个等级的等级下滑。标记存入 anomaly_flags 表，成绩写入时只重新扫描
+成绩有变化的学生
+"""
+
+import numpy as np
+import pandas as pd
+from webapp.config import ANOMALY_CONFIG
+from webapp.grading import grade_band_table
+
+# 标记类型
+ANOMALY_KINDS = {
+    'drop': '成绩骤降',
+    'band': '等级下滑',
+}
+
+FLAG_COLUMNS = [
+    'student_id', 'exam_id', 'kind', 'score', 'previous_score', 'expected',
+    'z_score', 'band_from', 'band_to', 'severity'
+]
+
+# 每次查询的学生数（避免超过 SQLite 参数上限）
+SCAN_CHUNK_SIZE = 500
+
+
+def detect_anomalies(values, k_sigma=None, min_history=None, band_drop=None):
+    """扫描 学生×考试 成绩数组（列按考试时间排列，缺考为 NaN）
+
+    返回标记 DataFrame：row、col 为数组中的位置，其余列同 FLAG_COLUMNS
+    （不含 student_id、exam_id）。骤降的 severity 为低于历史平均的标准差
+    倍数，等级下滑的 severity 为下降的档数。
+    """
+    k_sigma = ANOMALY_CONFIG['K_SIGMA'] if k_sigma is None else k_sigma
+    if min_history is None:
+        min_history = ANOMALY_CONFIG['MIN_HISTORY']
+    band_drop = ANOMALY_CONFIG['BAND_DROP'] if band_drop is None else band_drop
+
+    values = np.asarray(values, dtype=float)
+    if values.ndim == 1:
+        values = values.reshape(1, -1)
+    n_rows, n_cols = values.shape
+    if n_rows == 0 or n_cols == 0:
+        return pd.DataFrame(columns=['row', 'col'] + FLAG_COLUMNS[2:])
+    mask = ~np.isnan(values)
+    filled = np.where(mask, values, 0.0)
+
+    # 每场考试之前的历史成绩：人数、和、平方和（不含本场）
+    history = np.cumsum(mask, axis=1) - mask
+    total = np.cumsum(filled, axis=1) - filled
+    total_sq = np.cumsum(filled * filled, axis=1) - filled * filled
+
+    # 上一次有效成绩
+    positions = np.where(mask, np.arange(n_cols), -1)
+    last_seen = np.maximum.accumulate(positions, axis=1)
+    previous_idx = np.hstack([np.full((n_rows, 1), -1), last_seen[:, :-1]])
+    has_previous = previous_idx >= 0
+    previous = np.where(
+        has_previous,
+        values[np.arange(n_rows)[:, None], np.clip(previous_idx, 0, None)],
+        np.nan
+    )
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        expected = total / history
+        variance = (total_sq - history * expected ** 2) / (history - 1)
+        std = np.sqrt(np.clip(variance, 0, None))
+        z_scores = (values - expected) / std
+
+    drops = (mask & (history >= min_history) & (std > 0)
+             & (z_scores < -k_sigma) & (values < previous))
+
+    table = grade_band_table()
+    bands = table.index_of(values.ravel()).reshape(values.shape)
+    previous_bands = table.index_of(previous.ravel()).reshape(values.shape)
+    falls = (mask & has_previous & (bands >= 0)
+             & (previous_bands - bands >= band_drop))
+
+    frames = []
+    for kind, flagged in (('drop', drops), ('band', falls)):
+        rows, cols = np.nonzero(flagged)
+        if kind == 'drop':
+            severity = -z_scores[rows, cols]
+        else:
+            severity = (previous_bands - bands)[rows, cols].astype(float)
+        frames.append(pd.DataFrame({
+            'row': rows,
+            'col': cols,
+            'kind': kind,
+            'score': values[rows, cols],
+            'previous_score': previous[rows, cols],
+            'expected': expected[rows, cols],
+            'z_score': z_scores[rows, cols],
+            'band_from': table.names[previous_bands[rows, cols]],
+            'band_to': table.names[bands[rows, cols]],
+            'severity': severity,
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def _chronological_exam_ids(cursor):
+    return [row[0] for row in cursor.execute(
+        'SELECT id FROM exams ORDER BY upload_time, exam_name')]
+
+
+def refresh_anomaly_flags(cursor, student_ids=None):
+    """重新扫描学生并替换其在 anomaly_flags 中的标记（在调用方事务中）
+
+    student_ids 为 None 时扫描全部学生。已删除或没有成绩的学生的标记
+    一并删除。返回写入的标记数。
+    """
+    exam_ids = _chronological_exam_ids(cursor)
+    if student_ids is None:
+        cursor.execute('DELETE FROM anomaly_flags')
+        rows = cursor.execute(
+            'SELECT student_id, exam_id, score FROM scores').fetchall()
+        return _write_flags(cursor, rows, exam_ids)
+
+    student_ids = sorted({int(i) for i in student_ids})
+    written = 0
+    for start in range(0, len(student_ids), SCAN_CHUNK_SIZE):
+        chunk = student_ids[start:start + SCAN_CHUNK_SIZE]
+        placeholders = ','.join('?' for _ in chunk)
+        cursor.execute(
+            f'DELETE FROM anomaly_flags WHERE student_id IN ({placeholders})',
+            chunk)
+        rows = cursor.execute(
+            'SELECT student_id, exam_id, score FROM scores '
+            f'WHERE student_id IN ({placeholders})', chunk).fetchall()
+        written += _write_flags(cursor, rows, exam_ids)
+    return written
+
+
+def _write_flags(cursor, rows, exam_ids):
+    """由 (学生ID, 考试ID, 成绩) 行构建成绩数组，扫描并写入标记"""
+    if not rows or not exam_ids:
+        return 0
+    scores = pd.DataFrame(rows, columns=['student_id', 'exam_id', 'score'])
+    students = pd.Index(scores['student_id'].unique())
+    exams = pd.Index(exam_ids)
+    values = np.full((len(students), len(exams)), np.nan)
+    row_idx = students.get_indexer(scores['student_id'])
+    col_idx = exams.get_indexer(scores['exam_id'])
+    # 孤立成绩（考试已不存在）不参与扫描
+    valid = col_idx >= 0
+    values[row_idx[valid], col_idx[valid]] = pd.to_numeric(
+        scores['score'], errors='coerce').to_numpy()[valid]
+
+    flags = detect_anomalies(values)
+    if flags.empty:
+        return 0
+    flags['student_id'] = students.to_numpy()[flags['row'].to_numpy(int)]
+    flags['exam_id'] = exams.to_numpy()[flags['col'].to_numpy(int)]
+    # 转为 Python 值（NaN 写为 NULL）
+    flags = flags[FLAG_COLUMNS]
+    records = flags.astype(object).where(flags.notna(), None)
+    columns = ', '.join(FLAG_COLUMNS)
+    placeholders = ', '.join('?' for _ in FLAG_COLUMNS)
+    cursor.executemany(
+        f'INSERT OR REPLACE INTO anomaly_flags ({columns}) '
+        f'VALUES ({placeholders})',
+        records.to_numpy().tolist()
+    )
+    return len(flags)
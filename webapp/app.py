@@ -5,6 +5,7 @@
 import streamlit as st
 from webapp.database import DatabaseManager
 from webapp.analyzer import ScoreAnalyzer
+from webapp.jobs import ImportJobManager
 from webapp.pages import (
     show_data_import_page,
     show_exam_analysis_page,
@@ -15,6 +16,30 @@ from webapp.config import PAGE_CONFIG
 from webapp.styles import apply_custom_styles, configure_page
 
 
+@st.cache_resource
+def get_db_manager():
+    """进程内共享的数据库管理器（只初始化一次）"""
+    return DatabaseManager()
+
+
+@st.cache_resource
+def get_analyzer():
+    """进程内共享的成绩分析器"""
+    return ScoreAnalyzer(get_db_manager())
+
+
+@st.cache_resource
+def get_job_manager():
+    """进程内共享的导入任务管理器（启动时恢复未完成的任务）"""
+    return ImportJobManager(get_analyzer())
+
+
+@st.cache_data(show_spinner=False)
+def load_exams(data_version):
+    """按数据版本缓存考试列表，只有导入/删除/重命名/清空后才重新查询"""
+    return get_analyzer().get_all_exams()
+
+
 def main():
     """主函数"""
     # 配置页面
@@ -29,12 +54,8 @@ def main():
         unsafe_allow_html=True
     )
 
-    # 创建数据库管理器和分析器
-    db_manager = DatabaseManager()
-    analyzer = ScoreAnalyzer(db_manager)
-
-    # 获取所有考试数据
-    exams_df = analyzer.get_all_exams()
+    # 获取共享的分析器（数据库管理器随之缓存）
+    analyzer = get_analyzer()
 
     # 左侧页面菜单
     st.sidebar.title("🎯 页面菜单")
@@ -61,10 +82,12 @@ def main():
     # 主界面内容
     current_page = st.session_state['current_page']
     if current_page == "📁 数据导入":
-        show_data_import_page(analyzer)
+        show_data_import_page(analyzer, get_job_manager())
     elif current_page == "📝 考试分析":
+        exams_df = load_exams(analyzer.get_data_version())
         show_exam_analysis_page(analyzer, exams_df)
     elif current_page == "📚 数据历史":
+        exams_df = load_exams(analyzer.get_data_version())
         show_data_history_page(analyzer, exams_df)
     elif current_page == "🎨 颜色设置":
         show_color_settings_page()
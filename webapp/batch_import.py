@@ -0,0 +1,230 @@
+"""
+批量导入模块
+多个Excel文件在进程池中并行解析，由调用线程按文件顺序逐个写入数据库
+"""
+
+import io
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from webapp.analyzer import read_score_file, read_workbook
+from webapp.excel_reader import should_stream
+from webapp.parse_cache import file_content_hash
+
+# 并行解析的最大进程数
+MAX_IMPORT_WORKERS = os.cpu_count() or 1
+
+
+class DiskFile:
+    """磁盘上的Excel文件，name 为导入时使用的文件名（决定考试名称）"""
+
+    def __init__(self, path, name=None):
+        self.path = path
+        self.name = name or os.path.basename(path)
+
+    @property
+    def size(self):
+        return os.path.getsize(self.path)
+
+    def getvalue(self):
+        with open(self.path, 'rb') as f:
+            return f.read()
+
+
+class ImportCancelled(Exception):
+    """导入被取消（在写入阶段抛出，使当前文件的事务回滚）"""
+
+
+def parse_score_source(file_name, source, require_student_id=True,
+                       content_hash=None, workbook=False, streaming=False):
+    """解析一个文件（模块级函数，可被 pickle，可在子进程中执行）
+
+    source 为文件路径、文件内容 bytes 或文件对象。返回值同 read_score_file
+    （workbook=True 时同 read_workbook）；streaming=True 时 frames 为边读边
+    校验的惰性迭代器，只能在当前进程中消费。
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    try:
+        if workbook:
+            return read_workbook(
+                source, file_name, require_student_id,
+                content_hash=content_hash)
+        return read_score_file(
+            source, file_name, require_student_id, streaming=streaming,
+            content_hash=content_hash)
+    except Exception as e:
+        print(f"处理文件时出现错误: {str(e)}")
+        return False, f"处理文件时出现错误：{str(e)}"
+
+
+def _file_bytes(uploaded_file):
+    if hasattr(uploaded_file, 'getvalue'):
+        return uploaded_file.getvalue()
+    uploaded_file.seek(0)
+    return uploaded_file.read()
+
+
+def _content_hash(uploaded_file):
+    """计算文件内容哈希；磁盘文件按块读取，不整体读入内存"""
+    if isinstance(uploaded_file, DiskFile):
+        with open(uploaded_file.path, 'rb') as f:
+            return file_content_hash(f)
+    return file_content_hash(uploaded_file)
+
+
+def _parse_source(uploaded_file, for_pool):
+    """解析用的数据来源：磁盘文件传路径（由解析方自行读取），上传文件在
+    当前进程中直接使用，交给子进程时传内容"""
+    if isinstance(uploaded_file, DiskFile):
+        return uploaded_file.path
+    if for_pool:
+        return _file_bytes(uploaded_file)
+    return uploaded_file
+
+
+def _future_result(future):
+    try:
+        return future.result()
+    except Exception as e:
+        # 子进程异常退出等情况，按单个文件失败处理
+        print(f"解析进程出现错误: {str(e)}")
+        return False, f"处理文件时出现错误：{str(e)}"
+
+
+def _create_pool(workers):
+    """创建解析进程池，失败时返回 None（退回到当前进程解析）"""
+    try:
+        # spawn 方式不复制 Streamlit 进程中的线程与数据库连接
+        context = multiprocessing.get_context('spawn')
+        return ProcessPoolExecutor(max_workers=workers, mp_context=context)
+    except (OSError, ValueError, NotImplementedError) as e:
+        print(f"无法创建解析进程池，将逐个解析: {e}")
+        return None
+
+
+def import_excel_files(analyzer, uploaded_files, require_student_id=True,
+                       auto_generate_id=False, skip_existing=True,
+                       max_workers=None, on_result=None, progress=None,
+                       cancel_event=None, delta=False, remove_missing=False,
+                       workbook=False):
+    """批量导入多个Excel文件
+
+    解析在进程池中并行进行，写入由当前线程串行完成（每个文件一个事务），
+    先提交的文件先写入，写入时后续文件仍在解析。超过流式读取阈值的文件
+    不进入进程池，轮到它时由当前线程边读边写，数据块不经过进程间传递。返回与 uploaded_files
+    顺序一致的 (文件名, 状态, 信息) 列表，状态为 'success'、'skipped'
+    或 'error'。
+
+    on_result(序号, 结果) 在每个文件处理完（事务已提交）后调用；
+    progress(序号, 阶段, 已写入行数) 报告当前文件的 'parse'、'students'、
+    'scores' 阶段。cancel_event 被设置后当前文件回滚并停止导入，
+    未完成文件的结果为 None。delta、remove_missing 含义同
+    ScoreAnalyzer.process_excel_file；workbook=True 时按多工作表 / 多科目
+    工作簿解析（见 ScoreAnalyzer.process_workbook）。
+    """
+    results = [None] * len(uploaded_files)
+
+    def record(index, status, message):
+        results[index] = (uploaded_files[index].name, status, message)
+        if on_result is not None:
+            on_result(index, results[index])
+
+    def cancelled():
+        return cancel_event is not None and cancel_event.is_set()
+
+    # 预检查：内容与已有考试（或本批次中前面的文件）相同则跳过，无需解析；
+    # 同名但内容不同的文件照常导入，更新该考试
+    pending = []
+    hashes = {}
+    seen = {}
+    for index, file in enumerate(uploaded_files):
+        content_hash = _content_hash(file)
+        hashes[index] = content_hash
+        if skip_existing:
+            if content_hash in seen:
+                record(index, 'skipped', f"与 {seen[content_hash]} 内容相同")
+                continue
+            try:
+                existing_exam = analyzer.db.get_exam_by_content_hash(
+                    content_hash)
+                if existing_exam is not None and not existing_exam.empty:
+                    record(index, 'skipped',
+                           f"内容与已有考试 '{existing_exam.iloc[0]['exam_name']}' 相同")
+                    continue
+            except Exception:
+                # 若检查失败，谨慎起见仍加入导入列表
+                pass
+            seen[content_hash] = file.name
+        pending.append(index)
+
+    # 大文件流式读取，只有小文件（及工作簿）交给进程池并行解析
+    streamed = {
+        index for index in pending
+        if not workbook and should_stream(uploaded_files[index])
+    }
+    pooled = [index for index in pending if index not in streamed]
+    workers = min(max_workers or MAX_IMPORT_WORKERS, len(pooled))
+    pool = _create_pool(workers) if workers > 1 else None
+
+    def parse(index):
+        return parse_score_source(
+            uploaded_files[index].name,
+            _parse_source(uploaded_files[index], for_pool=False),
+            require_student_id,
+            hashes[index],
+            workbook,
+            streaming=index in streamed
+        )
+
+    try:
+        futures = {}
+        if pool is not None:
+            futures = {
+                index: pool.submit(
+                    parse_score_source,
+                    uploaded_files[index].name,
+                    _parse_source(uploaded_files[index], for_pool=True),
+                    require_student_id,
+                    hashes[index],
+                    workbook
+                )
+                for index in pooled
+            }
+
+        # 单一写入者：按提交顺序逐个写入
+        for index in pending:
+            if cancelled():
+                break
+            if progress is not None:
+                progress(index, 'parse', 0)
+            if index in futures:
+                success, parsed = _future_result(futures[index])
+            else:
+                success, parsed = parse(index)
+            if cancelled():
+                break
+
+            def file_progress(stage, rows, index=index):
+                if cancelled():
+                    raise ImportCancelled("导入已取消")
+                if progress is not None:
+                    progress(index, stage, rows)
+
+            print(f"开始写入文件: {uploaded_files[index].name}")
+            if success:
+                success, message = analyzer.import_parsed_file(
+                    parsed, require_student_id, auto_generate_id,
+                    progress=file_progress, delta=delta,
+                    remove_missing=remove_missing)
+            else:
+                message = parsed
+            if not success and cancelled():
+                # 本文件已回滚，保持未完成状态
+                break
+            record(index, 'success' if success else 'error', message)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    return results
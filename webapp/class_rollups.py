@@ -0,0 +1,119 @@
+"""
+班级汇总模块
+基于物化的 学生×考试 成绩矩阵，按 班级×考试 计算平均分、中位数、
+及格率、优秀率与班级排名，结果按数据版本号缓存
+"""
+
+import threading
+import pandas as pd
+from webapp.config import GRADE_CONFIG
+
+# 及格线与优秀线（与等级配置一致）
+PASS_SCORE = GRADE_CONFIG['PASS']['min']
+EXCELLENT_SCORE = GRADE_CONFIG['EXCELLENT']['min']
+
+ROLLUP_COLUMNS = [
+    'class_id', 'class_name', 'exam_name',
+    '人数', '平均分', '中位数', '及格率', '优秀率', '班级排名'
+]
+
+
+def compute_class_rollups(values, class_ids, exam_names, class_names):
+    """计算 班级×考试 汇总（每个有成绩的 班级×考试 一行）
+
+    values 为 学生×考试 成绩数组（缺考为 NaN），class_ids 为每个学生的
+    班级ID（未分班为空，不参与汇总），exam_names 为各列的考试名称，
+    class_names 为 {班级ID: 班级名称}。及格率、优秀率为百分比；班级排名
+    按平均分从高到低，同分并列。
+    """
+    class_ids = pd.to_numeric(pd.Series(class_ids), errors='coerce')
+    has_class = class_ids.notna().to_numpy()
+    if not has_class.any() or len(exam_names) == 0:
+        return pd.DataFrame(columns=ROLLUP_COLUMNS)
+
+    scores = pd.DataFrame(values[has_class], columns=list(exam_names))
+    present = scores.notna()
+    groups = class_ids[has_class].astype(int).to_numpy()
+
+    counts = present.groupby(groups).sum()
+    means = scores.groupby(groups).mean()
+    stats = {
+        '人数': counts,
+        '平均分': means,
+        '中位数': scores.groupby(groups).median(),
+        '及格率': (scores >= PASS_SCORE).astype(float).where(present)
+        .groupby(groups).mean() * 100,
+        '优秀率': (scores >= EXCELLENT_SCORE).astype(float).where(present)
+        .groupby(groups).mean() * 100,
+        '班级排名': means.rank(ascending=False, method='min'),
+    }
+
+    # 各统计表的行（班级）与列（考试）顺序相同，按行展开为长表
+    index = pd.MultiIndex.from_product(
+        [counts.index, counts.columns], names=['class_id', 'exam_name'])
+    rollups = pd.DataFrame(
+        {name: frame.to_numpy(dtype=float).ravel()
+         for name, frame in stats.items()},
+        index=index
+    )
+    rollups = rollups[rollups['人数'] > 0].reset_index()
+    rollups['人数'] = rollups['人数'].astype(int)
+    rollups['班级排名'] = rollups['班级排名'].astype(int)
+    rollups['class_name'] = rollups['class_id'].map(class_names)
+    rollups[['平均分', '中位数', '及格率', '优秀率']] = rollups[
+        ['平均分', '中位数', '及格率', '优秀率']].round(1)
+    return rollups[ROLLUP_COLUMNS]
+
+
+class ClassRollups:
+    """班级汇总缓存
+
+    每个数据版本整体计算一次（全部班级×全部考试，一次分组），之后按
+    考试、班级筛选。
+    """
+
+    def __init__(self, db_manager):
+        self.db = db_manager
+        self._lock = threading.Lock()
+        self._version = None
+        self._rollups = None
+
+    def invalidate(self):
+        with self._lock:
+            self._version = None
+            self._rollups = None
+
+    def _compute(self):
+        version, values, students, exams = self.db.score_matrix.snapshot()
+        classes = self.db.get_all_classes()
+        rollups = compute_class_rollups(
+            values,
+            students['class_id'].to_numpy(),
+            exams['exam_name'].to_numpy(),
+            dict(zip(classes['id'], classes['class_name']))
+        )
+        return version, rollups
+
+    def get(self, exam_names=None, class_ids=None):
+        """获取班级汇总（ROLLUP_COLUMNS），按班级名称、考试顺序排列"""
+        version = self.db.get_data_version()
+        with self._lock:
+            rollups = self._rollups if self._version == version else None
+        if rollups is None:
+            computed_version, rollups = self._compute()
+            with self._lock:
+                self._version = computed_version
+                self._rollups = rollups
+
+        if exam_names is not None:
+            rollups = rollups[rollups['exam_name'].isin(list(exam_names))]
+            order = {name: i for i, name in enumerate(exam_names)}
+        else:
+            order = {}
+        if class_ids is not None:
+            rollups = rollups[rollups['class_id'].isin(list(class_ids))]
+        rollups = rollups.assign(
+            _order=rollups['exam_name'].map(order).fillna(len(order)))
+        return rollups.sort_values(
+            ['class_name', '_order'], kind='mergesort', ignore_index=True
+        ).drop(columns='_order')
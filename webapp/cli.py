@@ -0,0 +1,253 @@
+"""
+命令行模块
+不启动 Streamlit 的批量导入 / 导出入口，供定时任务使用
+
+    python -m webapp.cli import <文件或目录>... [--db 数据库路径]
+    python -m webapp.cli export -o 成绩分析.xlsx [--exams 考试1 考试2]
+    python -m webapp.cli watch <目录> [--db 数据库路径]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+from webapp.config import UPLOAD_CONFIG
+
+
+def find_excel_files(paths, recursive=False):
+    """展开文件与目录参数，返回排序后的Excel文件路径（忽略 ~$ 临时文件）"""
+    extensions = tuple(f".{ext}" for ext in UPLOAD_CONFIG['ALLOWED_TYPES'])
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            if recursive:
+                for root, _, names in os.walk(path):
+                    found.extend(os.path.join(root, name) for name in names)
+            else:
+                found.extend(
+                    os.path.join(path, name) for name in os.listdir(path))
+        else:
+            found.append(path)
+    return sorted(
+        path for path in dict.fromkeys(found)
+        if path.lower().endswith(extensions)
+        and not os.path.basename(path).startswith('~$')
+        and os.path.isfile(path)
+    )
+
+
+def _open_analyzer(db_path):
+    # 延迟导入：--help 等不需要加载 pandas
+    from webapp.database import DatabaseManager
+    from webapp.analyzer import ScoreAnalyzer
+
+    db = DatabaseManager(db_path) if db_path else DatabaseManager()
+    return ScoreAnalyzer(db)
+
+
+def _quietly(func, *args, **kwargs):
+    """执行导入时屏蔽逐步骤的调试输出，只保留命令行汇总"""
+    import contextlib
+    import io
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args, **kwargs)
+
+
+def run_import(args):
+    """导入命令：批量导入文件与目录中的Excel文件"""
+    from webapp.batch_import import DiskFile, import_excel_files
+
+    paths = find_excel_files(args.paths, args.recursive)
+    if not paths:
+        print("没有找到Excel文件")
+        return 1
+
+    analyzer = _open_analyzer(args.db)
+    files = [DiskFile(path) for path in paths]
+    print(f"共 {len(files)} 个文件，数据库：{analyzer.db.db_path}")
+
+    # 导入过程中的调试输出被屏蔽，逐文件结果直接写到原始输出
+    out = sys.stdout
+    started = {}
+    rows = {}
+
+    def progress(index, stage, done_rows):
+        if stage == 'parse':
+            started[index] = time.perf_counter()
+        rows[index] = done_rows
+
+    def on_result(index, result):
+        name, status, message = result
+        if status == 'skipped':
+            print(f"⏭️  {paths[index]}：跳过（{message}）", file=out)
+            return
+        elapsed = time.perf_counter() - started.get(index, time.perf_counter())
+        count = rows.get(index, 0)
+        rate = count / elapsed if elapsed > 0 else 0
+        icon = "✅" if status == 'success' else "❌"
+        print(f"{icon} {paths[index]}：{count} 行，用时 {elapsed:.2f} 秒，"
+              f"{rate:,.0f} 行/秒", file=out)
+        if status != 'success' or args.verbose:
+            print(f"   {message}", file=out)
+
+    options = dict(
+        require_student_id=not args.no_student_id,
+        auto_generate_id=args.auto_id,
+        skip_existing=not args.no_skip,
+        max_workers=args.workers,
+        on_result=on_result,
+        progress=progress,
+        delta=args.delta,
+        remove_missing=args.remove_missing,
+        workbook=args.workbook
+    )
+    begin = time.perf_counter()
+    if args.verbose:
+        results = import_excel_files(analyzer, files, **options)
+    else:
+        results = _quietly(import_excel_files, analyzer, files, **options)
+    elapsed = time.perf_counter() - begin
+
+    statuses = [status for _, status, _ in results]
+    total_rows = sum(rows.values())
+    print(
+        f"完成：成功 {statuses.count('success')} 个，跳过 {statuses.count('skipped')} 个，"
+        f"失败 {statuses.count('error')} 个；共 {total_rows} 行，用时 {elapsed:.2f} 秒，"
+        f"{(total_rows / elapsed if elapsed > 0 else 0):,.0f} 行/秒"
+    )
+    return 1 if 'error' in statuses else 0
+
+
+def run_export(args):
+    """导出命令：将考试成绩分析结果导出为带颜色的Excel"""
+    from webapp.exporter import export_student_scores
+    from webapp.grading import load_color_settings
+
+    analyzer = _open_analyzer(args.db)
+    exams = args.exams
+    if not exams:
+        exams = analyzer.get_all_exams()['exam_name'].tolist()
+    if not exams:
+        print("数据库中没有考试")
+        return 1
+
+    begin = time.perf_counter()
+    data = _quietly(
+        export_student_scores, analyzer, exams, load_color_settings())
+    with open(args.output, 'wb') as f:
+        f.write(data)
+    elapsed = time.perf_counter() - begin
+    print(f"已导出 {len(exams)} 场考试到 {args.output}"
+          f"（{len(data) / 1024:.0f} KB，用时 {elapsed:.2f} 秒）")
+    return 0
+
+
+def run_watch(args):
+    """监视命令：持续导入目录中新增或修改的Excel文件"""
+    from webapp.watcher import FolderWatcher
+
+    analyzer = _open_analyzer(args.db)
+    out = sys.stdout
+
+    def on_result(index, result):
+        name, status, message = result
+        icon = {"success": "✅", "skipped": "⏭️ "}.get(status, "❌")
+        print(f"{time.strftime('%H:%M:%S')} {icon} {name}：{message}",
+              file=out, flush=True)
+
+    watcher = FolderWatcher(
+        analyzer,
+        args.directory,
+        recursive=args.recursive,
+        debounce=args.debounce,
+        poll_interval=args.interval,
+        use_polling=args.polling,
+        import_existing=not args.new_only,
+        on_result=on_result,
+        quiet=not args.verbose,
+        require_student_id=not args.no_student_id,
+        auto_generate_id=args.auto_id,
+        delta=args.delta,
+        remove_missing=args.remove_missing,
+        workbook=args.workbook
+    )
+    print(f"监视目录：{watcher.directory}（{watcher.mode}），数据库：{analyzer.db.db_path}，"
+          f"按 Ctrl+C 退出", flush=True)
+    watcher.run_forever()
+    print("已停止监视")
+    return 0
+
+
+def _add_import_options(parser):
+    parser.add_argument(
+        "-r", "--recursive", action="store_true", help="递归查找子目录")
+    parser.add_argument(
+        "--no-student-id", action="store_true", help="不要求学号列（按姓名识别学生）")
+    parser.add_argument(
+        "--auto-id", action="store_true", help="没有学号列时自动生成学号")
+    parser.add_argument(
+        "--delta", action="store_true", help="已有考试只写入变化的成绩")
+    parser.add_argument(
+        "--remove-missing", action="store_true",
+        help="与 --delta 一起使用，删除文件中没有的成绩")
+    parser.add_argument(
+        "--workbook", action="store_true", help="按多工作表 / 多科目工作簿导入")
+    parser.add_argument(
+        "-v", "--verbose", action="store_true", help="输出详细导入信息")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m webapp.cli",
+        description="学生成绩分析器命令行工具（批量导入 / 导出）"
+    )
+    parser.add_argument(
+        "--db", help="数据库文件路径（默认使用应用自带的数据库）")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = subparsers.add_parser(
+        "import", help="导入Excel文件或目录中的所有Excel文件")
+    import_parser.add_argument("paths", nargs="+", help="Excel文件或目录")
+    _add_import_options(import_parser)
+    import_parser.add_argument(
+        "--no-skip", action="store_true", help="内容已导入过的文件也重新导入")
+    import_parser.add_argument(
+        "--workers", type=int, default=None, help="并行解析的进程数")
+    import_parser.set_defaults(func=run_import)
+
+    export_parser = subparsers.add_parser("export", help="导出成绩分析结果")
+    export_parser.add_argument(
+        "-o", "--output", required=True, help="输出的 xlsx 文件路径")
+    export_parser.add_argument(
+        "--exams", nargs="+", help="要导出的考试名称（默认全部）")
+    export_parser.set_defaults(func=run_export)
+
+    watch_parser = subparsers.add_parser(
+        "watch", help="监视目录，自动导入新增或修改的Excel文件")
+    watch_parser.add_argument("directory", help="要监视的目录")
+    _add_import_options(watch_parser)
+    watch_parser.add_argument(
+        "--debounce", type=float, default=2.0,
+        help="文件停止变化多少秒后才导入（默认 2 秒）")
+    watch_parser.add_argument(
+        "--interval", type=float, default=1.0, help="检查间隔秒数（默认 1 秒）")
+    watch_parser.add_argument(
+        "--polling", action="store_true", help="强制使用轮询（如网络共享目录）")
+    watch_parser.add_argument(
+        "--new-only", action="store_true", help="启动时不导入目录中已有的文件")
+    watch_parser.set_defaults(func=run_watch)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if getattr(args, 'remove_missing', False) and not args.delta:
+        print("--remove-missing 需要与 --delta 一起使用")
+        return 2
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -30,6 +30,24 @@ GRADE_CONFIG = {
     'FAIL': {'min': 0, 'max': 59, 'name': '不及格', 'color': '#d62728'}
 }
 
+# 默认分数区间颜色（颜色设置页面未保存配置时使用）
+DEFAULT_COLOR_SETTINGS = {
+    "优秀": {"min_score": 90, "max_score": 150, "color": "#90EE90", "description": "90分及以上"},
+    "良好": {"min_score": 80, "max_score": 89, "color": "#87CEEB", "description": "80-89分"},
+    "中等": {"min_score": 70, "max_score": 79, "color": "#F0E68C", "description": "70-79分"},
+    "及格": {"min_score": 60, "max_score": 69, "color": "#FFB6C1", "description": "60-69分"},
+    "不及格": {"min_score": 0, "max_score": 59, "color": "#FFA07A", "description": "60分以下"}
+}
+
+# 导入时成绩的默认满分（文件中有“满分”列时按该列检查）
+DEFAULT_FULL_MARK = 150
+
+# 颜色设置文件路径（相对于工作目录）
+COLOR_SETTINGS_FILE = "config/color_settings.json"
+
+# 分数无法解析时的背景颜色
+INVALID_SCORE_COLOR = "#F0F0F0"
+
 # 趋势配置
 TREND_CONFIG = {
     'IMPROVED': {'name': '进步', 'color': '#2ca02c'},
@@ -37,6 +55,13 @@ TREND_CONFIG = {
     'DECLINED': {'name': '下降', 'color': '#d62728'}
 }
 
+# 异常检测配置
+ANOMALY_CONFIG = {
+    'K_SIGMA': 2.0,       # 低于本人历史平均分超过 K 个标准差视为骤降
+    'MIN_HISTORY': 3,     # 至少有这么多次历史成绩才判断骤降
+    'BAND_DROP': 2,       # 与上一场相比等级下降这么多档视为等级下滑
+}
+
 # 页面配置
 PAGE_CONFIG = {
     'OPTIONS': ["📁 数据导入", "📝 考试分析", "📚 数据历史", "🎨 颜色设置"],
@@ -4,11 +4,386 @@
 """
 
 import sqlite3
+import threading
+from contextlib import contextmanager
 import pandas as pd
 # 将数据库文件放置在当前目录下
 import os
+from webapp.matrix import ScoreMatrix
+from webapp.rankings import ExamRankings
+from webapp.class_rollups import ClassRollups
+from webapp.trajectories import StudentTrajectories
+from webapp.rank_transitions import RankTransitions
+from webapp.exam_stats import refresh_exam_stats
+from webapp import aggregates
+from webapp.anomalies import refresh_anomaly_flags
 db_path = os.path.join(os.path.dirname(__file__), "student_scores.db")
 
+# 连接建立时执行一次的性能参数
+CONNECTION_PRAGMAS = (
+    'PRAGMA journal_mode = WAL',
+    'PRAGMA synchronous = NORMAL',
+    'PRAGMA mmap_size = 268435456',
+    'PRAGMA cache_size = -16000',
+    'PRAGMA busy_timeout = 5000',
+    'PRAGMA temp_store = MEMORY',
+)
+
+
+class ConnectionPool:
+    """线程级连接池
+
+    每个线程对每个数据库文件只持有一个长连接（Streamlit 在工作线程中
+    运行会话），连接创建时执行一次 CONNECTION_PRAGMAS。
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _connections(self):
+        connections = getattr(self._local, 'connections', None)
+        if connections is None:
+            connections = {}
+            self._local.connections = connections
+        return connections
+
+    def acquire(self, path):
+        """获取当前线程的连接，不存在时创建"""
+        connections = self._connections()
+        conn = connections.get(path)
+        if conn is not None:
+            with self._lock:
+                self.hits += 1
+            return conn
+
+        conn = sqlite3.connect(path)
+        cursor = conn.cursor()
+        for pragma in CONNECTION_PRAGMAS:
+            try:
+                cursor.execute(pragma)
+            except sqlite3.DatabaseError as e:
+                # 只读文件系统等情况下 WAL 可能不可用，不影响正常使用
+                print(f"设置数据库参数失败（{pragma}）: {e}")
+        cursor.close()
+        connections[path] = conn
+        with self._lock:
+            self.misses += 1
+        return conn
+
+    def release(self, conn):
+        """归还连接：回滚未提交的事务，保持与关闭连接一致的语义"""
+        if conn is not None and conn.in_transaction:
+            conn.rollback()
+
+    def close(self, path=None):
+        """关闭当前线程的连接（path为空时关闭全部）"""
+        connections = self._connections()
+        paths = [path] if path is not None else list(connections)
+        for key in paths:
+            conn = connections.pop(key, None)
+            if conn is not None:
+                conn.close()
+
+    def stats(self):
+        """连接池命中统计"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'thread_connections': len(self._connections())
+            }
+
+
+# 进程内共享的连接池
+connection_pool = ConnectionPool()
+
+# 各线程当前的事务嵌套深度（按数据库文件区分）
+_transaction_state = threading.local()
+
+# 单条SQL中IN列表的最大参数个数（兼容旧版SQLite的999上限）
+SQL_CHUNK_SIZE = 500
+
+
+def _existing_score(cursor, student_id, exam_id):
+    """查询已存的成绩（不存在时为 None）"""
+    row = cursor.execute(
+        'SELECT score FROM scores WHERE student_id = ? AND exam_id = ?',
+        (int(student_id), int(exam_id))
+    ).fetchone()
+    return row[0] if row else None
+
+
+def _class_ids_of(cursor, student_ids):
+    """查询学生所在的班级ID（未分班的学生忽略）"""
+    student_ids = sorted({int(i) for i in student_ids})
+    class_ids = set()
+    for start in range(0, len(student_ids), SQL_CHUNK_SIZE):
+        chunk = student_ids[start:start + SQL_CHUNK_SIZE]
+        placeholders = ','.join('?' for _ in chunk)
+        class_ids.update(row[0] for row in cursor.execute(
+            f'SELECT DISTINCT class_id FROM students '
+            f'WHERE id IN ({placeholders}) AND class_id IS NOT NULL',
+            chunk
+        ))
+    return class_ids
+
+
+def _migrate_base_schema(cursor):
+    """迁移1：基础表结构（含旧版本字段兼容）"""
+    # 创建班级信息表
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS classes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            class_name TEXT UNIQUE NOT NULL,
+            created_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # 创建考试信息表
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS exams (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            exam_name TEXT UNIQUE NOT NULL,
+            file_path TEXT NOT NULL,
+            upload_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            student_count INTEGER DEFAULT 0
+        )
+    ''')
+
+    # 创建学生信息表
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS students (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            student_id TEXT UNIQUE NOT NULL,
+            name TEXT NOT NULL,
+            class_id INTEGER,
+            created_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # 检查是否需要添加 student_id 字段（兼容旧版本）
+    try:
+        cursor.execute('SELECT student_id FROM students LIMIT 1')
+    except sqlite3.OperationalError:
+        # 如果 student_id 字段不存在，添加它
+        cursor.execute('ALTER TABLE students ADD COLUMN student_id TEXT')
+        # 为现有记录设置默认值
+        cursor.execute(
+            'UPDATE students SET student_id = name '
+            'WHERE student_id IS NULL'
+        )
+        # 添加唯一约束
+        cursor.execute(
+            'CREATE UNIQUE INDEX IF NOT EXISTS idx_student_id '
+            'ON students(student_id)'
+        )
+
+    # 兼容旧版本：如果没有 class_id 字段则添加
+    try:
+        cursor.execute('SELECT class_id FROM students LIMIT 1')
+    except sqlite3.OperationalError:
+        cursor.execute('ALTER TABLE students ADD COLUMN class_id INTEGER')
+
+    # 创建成绩表
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS scores (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            student_id INTEGER,
+            exam_id INTEGER,
+            score REAL NOT NULL,
+            record_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (student_id) REFERENCES students (id),
+            FOREIGN KEY (exam_id) REFERENCES exams (id),
+            UNIQUE(student_id, exam_id)
+        )
+    ''')
+
+
+def _migrate_canonical_ids(cursor):
+    """迁移6：早期导入把 Excel 数值学号存成了 2024001.0，统一为 2024001
+
+    规范学号已被另一名学生使用时，把该学生的成绩并入规范学号的学生（两者
+    都有成绩的考试保留规范学号学生的成绩），再删除多余的学生记录。
+    """
+    rows = cursor.execute('''
+        SELECT id, student_id, substr(student_id, 1, length(student_id) - 2)
+        FROM students
+        WHERE student_id GLOB '[0-9]*.0'
+          AND substr(student_id, 1, length(student_id) - 2) NOT GLOB '*[^0-9]*'
+    ''').fetchall()
+    for pk, raw_id, canonical_id in rows:
+        target = cursor.execute(
+            'SELECT id FROM students WHERE student_id = ?', (canonical_id,)
+        ).fetchone()
+        if target is None:
+            cursor.execute(
+                'UPDATE students SET student_id = ? WHERE id = ?',
+                (canonical_id, pk))
+            continue
+
+        target = target[0]
+        moved = cursor.execute(
+            'UPDATE scores SET student_id = ? WHERE student_id = ? '
+            'AND exam_id NOT IN (SELECT exam_id FROM scores WHERE student_id = ?)',
+            (target, pk, target)
+        ).rowcount
+        dropped = cursor.execute(
+            'DELETE FROM scores WHERE student_id = ?', (pk,)).rowcount
+        cursor.execute(
+            'UPDATE students SET class_id = '
+            '(SELECT class_id FROM students WHERE id = ?) '
+            'WHERE id = ? AND class_id IS NULL',
+            (pk, target))
+        cursor.execute('DELETE FROM students WHERE id = ?', (pk,))
+        message = f"合并重复学号 {raw_id} → {canonical_id}：并入 {moved} 条成绩"
+        if dropped:
+            message += f"，{dropped} 场考试两者都有成绩，保留 {canonical_id} 的成绩"
+        print(message)
+
+
+def _migrate_exam_stats(cursor):
+    """迁移7：考试统计表，并为已有考试计算统计"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS exam_stats (
+            exam_id INTEGER PRIMARY KEY,
+            score_count INTEGER NOT NULL DEFAULT 0,
+            mean REAL,
+            std REAL,
+            min REAL,
+            q1 REAL,
+            median REAL,
+            q3 REAL,
+            max REAL,
+            histogram TEXT,
+            bands TEXT,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (exam_id) REFERENCES exams (id)
+        )
+    ''')
+    exam_ids = [row[0] for row in cursor.execute('SELECT id FROM exams')]
+    refresh_exam_stats(cursor, exam_ids)
+
+
+def _migrate_score_aggregates(cursor):
+    """迁移8：按考试、班级、学生的运行聚合表，并为已有成绩计算聚合"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS score_aggregates (
+            scope TEXT NOT NULL,
+            scope_id INTEGER NOT NULL,
+            score_count INTEGER NOT NULL DEFAULT 0,
+            mean REAL NOT NULL DEFAULT 0,
+            m2 REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (scope, scope_id)
+        )
+    ''')
+    aggregates.rebuild_aggregates(cursor, 'exam', [
+        row[0] for row in cursor.execute('SELECT DISTINCT exam_id FROM scores')])
+    aggregates.rebuild_aggregates(cursor, 'student', [
+        row[0] for row in cursor.execute(
+            'SELECT DISTINCT student_id FROM scores')])
+    aggregates.rebuild_aggregates(cursor, 'class', [
+        row[0] for row in cursor.execute('SELECT id FROM classes')])
+
+
+def _migrate_anomaly_flags(cursor):
+    """迁移9：异常标记表，并对已有成绩做一次全量扫描"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS anomaly_flags (
+            student_id INTEGER NOT NULL,
+            exam_id INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            score REAL,
+            previous_score REAL,
+            expected REAL,
+            z_score REAL,
+            band_from TEXT,
+            band_to TEXT,
+            severity REAL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (student_id, exam_id, kind)
+        )
+    ''')
+    cursor.execute(
+        'CREATE INDEX IF NOT EXISTS idx_anomaly_flags_exam_id '
+        'ON anomaly_flags(exam_id)')
+    refresh_anomaly_flags(cursor)
+
+
+# 版本化的数据库迁移：(版本号, 说明, SQL列表或接收cursor的函数)
+# 每个迁移只执行一次，执行后记录到 PRAGMA user_version
+SCHEMA_MIGRATIONS = [
+    (1, '基础表结构', _migrate_base_schema),
+    (2, '查询性能索引', [
+        # get_exam_scores / get_scores(exam_id) / 按考试删除成绩
+        'CREATE INDEX IF NOT EXISTS idx_scores_exam_id ON scores(exam_id)',
+        # get_scores 按录入时间排序
+        'CREATE INDEX IF NOT EXISTS idx_scores_record_time '
+        'ON scores(record_time)',
+        # get_class_student_counts / get_scores(class_id)
+        'CREATE INDEX IF NOT EXISTS idx_students_class_id '
+        'ON students(class_id)',
+        # get_all_exams / get_all_exams_full 按上传时间排序
+        'CREATE INDEX IF NOT EXISTS idx_exams_upload_time '
+        'ON exams(upload_time)',
+        # get_student_scores 按考试名筛选并按上传时间排序
+        'CREATE INDEX IF NOT EXISTS idx_exams_name_upload_time '
+        'ON exams(exam_name, upload_time)',
+    ]),
+    (3, '数据版本号', [
+        '''
+        CREATE TABLE IF NOT EXISTS app_meta (
+            key TEXT PRIMARY KEY,
+            value INTEGER NOT NULL DEFAULT 0
+        )
+        ''',
+        "INSERT OR IGNORE INTO app_meta (key, value) "
+        "VALUES ('data_version', 0)",
+    ]),
+    (4, '后台导入任务', [
+        '''
+        CREATE TABLE IF NOT EXISTS import_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            status TEXT NOT NULL DEFAULT 'queued',
+            stage TEXT,
+            options TEXT,
+            total_files INTEGER NOT NULL DEFAULT 0,
+            done_files INTEGER NOT NULL DEFAULT 0,
+            current_file TEXT,
+            rows_done INTEGER NOT NULL DEFAULT 0,
+            rows_per_sec REAL NOT NULL DEFAULT 0,
+            results TEXT,
+            error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_import_jobs_status '
+        'ON import_jobs(status)',
+    ]),
+    (5, '考试文件内容哈希', [
+        'ALTER TABLE exams ADD COLUMN content_hash TEXT',
+        'CREATE INDEX IF NOT EXISTS idx_exams_content_hash '
+        'ON exams(content_hash)',
+    ]),
+    (6, '规范化数值学号', _migrate_canonical_ids),
+    (7, '考试统计表', _migrate_exam_stats),
+    (8, '成绩运行聚合', _migrate_score_aggregates),
+    (9, '异常标记', _migrate_anomaly_flags),
+]
+
+# import_jobs 中可由 update_import_job 修改的列
+IMPORT_JOB_COLUMNS = (
+    'status', 'stage', 'total_files', 'done_files', 'current_file',
+    'rows_done', 'rows_per_sec', 'results', 'error'
+)
+
+SCHEMA_VERSION = SCHEMA_MIGRATIONS[-1][0]
+
 
 class DatabaseManager:
     """数据库管理器"""
@@ -16,91 +391,218 @@ class DatabaseManager:
     def __init__(self, db_path=db_path):
         self.db_path = db_path
         self.init_database()
+        # 学生×考试成绩矩阵，随成绩写入增量维护
+        self.score_matrix = ScoreMatrix(self)
+        # 各考试的名次、百分位与标准分，按数据版本号缓存
+        self.rankings = ExamRankings(self)
+        # 班级×考试汇总，按数据版本号缓存
+        self.class_rollups = ClassRollups(self)
+        # 全体学生的成绩轨迹与预测，按数据版本号缓存
+        self.trajectories = StudentTrajectories(self)
+        # 考试链的名次变化与等级转移，按考试组合与数据版本号缓存
+        self.rank_transitions = RankTransitions(self)
 
     def init_database(self):
-        """初始化数据库"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        """初始化数据库（按 PRAGMA user_version 执行未完成的迁移）"""
+        conn = self.get_connection()
+        try:
+            version = conn.execute('PRAGMA user_version').fetchone()[0]
+            if version >= SCHEMA_VERSION:
+                return
 
-        # 创建班级信息表
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS classes (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                class_name TEXT UNIQUE NOT NULL,
-                created_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-
-        # 创建考试信息表
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS exams (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                exam_name TEXT UNIQUE NOT NULL,
-                file_path TEXT NOT NULL,
-                upload_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                student_count INTEGER DEFAULT 0
-            )
-        ''')
-
-        # 创建学生信息表
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS students (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                student_id TEXT UNIQUE NOT NULL,
-                name TEXT NOT NULL,
-                class_id INTEGER,
-                created_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
+            cursor = conn.cursor()
+            for migration_version, description, step in SCHEMA_MIGRATIONS:
+                # 获取写锁后再确认版本，避免多个线程/进程重复迁移
+                cursor.execute('BEGIN IMMEDIATE')
+                try:
+                    version = cursor.execute(
+                        'PRAGMA user_version').fetchone()[0]
+                    if migration_version <= version:
+                        conn.rollback()
+                        continue
+                    print(f"执行数据库迁移 {migration_version}：{description}")
+                    if callable(step):
+                        step(cursor)
+                    else:
+                        for statement in step:
+                            cursor.execute(statement)
+                    cursor.execute(
+                        f'PRAGMA user_version = {int(migration_version)}')
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+        finally:
+            self.close_connection(conn)
 
-        # 检查是否需要添加 student_id 字段（兼容旧版本）
+    def get_schema_version(self):
+        """获取当前数据库结构版本"""
+        conn = self.get_connection()
         try:
-            cursor.execute('SELECT student_id FROM students LIMIT 1')
-        except sqlite3.OperationalError:
-            # 如果 student_id 字段不存在，添加它
-            cursor.execute('ALTER TABLE students ADD COLUMN student_id TEXT')
-            # 为现有记录设置默认值
-            cursor.execute(
-                'UPDATE students SET student_id = name '
-                'WHERE student_id IS NULL'
-            )
-            # 添加唯一约束
-            cursor.execute(
-                'CREATE UNIQUE INDEX IF NOT EXISTS idx_student_id '
-                'ON students(student_id)'
-            )
+            return conn.execute('PRAGMA user_version').fetchone()[0]
+        finally:
+            self.close_connection(conn)
 
-        # 兼容旧版本：如果没有 class_id 字段则添加
+    def get_connection(self):
+        """获取数据库连接（来自线程级连接池）"""
+        return connection_pool.acquire(self.db_path)
+
+    def close_connection(self, conn):
+        """归还数据库连接（连接保持打开，未提交的修改被回滚）"""
+        if not self.in_transaction():
+            connection_pool.release(conn)
+
+    def _pending_callbacks(self):
+        callbacks = getattr(_transaction_state, 'callbacks', None)
+        if callbacks is None:
+            callbacks = {}
+            _transaction_state.callbacks = callbacks
+        return callbacks.setdefault(self.db_path, [])
+
+    def _after_commit(self, callback):
+        """登记提交回调 callback(旧版本号, 新版本号)，须在 transaction() 块内调用"""
+        self._pending_callbacks().append(callback)
+
+    def _dirty_ids(self):
+        """本事务中需要重新计算派生数据的ID
+
+        {'exam'|'student'|'class': 需要重新计算聚合的ID, 'exam_stats':
+        聚合已增量更新、只需重新计算 exam_stats 的考试ID, 'anomaly': 需要
+        重新扫描异常的学生ID}
+        """
+        dirty = getattr(_transaction_state, 'dirty_ids', None)
+        if dirty is None:
+            dirty = {}
+            _transaction_state.dirty_ids = dirty
+        return dirty.setdefault(
+            self.db_path,
+            {scope: set()
+             for scope in aggregates.SCOPES + ('exam_stats', 'anomaly')})
+
+    def _clear_dirty(self):
+        for ids in self._dirty_ids().values():
+            ids.clear()
+
+    def _mark_stats_dirty(self, exam_ids):
+        """登记成绩有变化的考试，提交前在同一事务中刷新其 exam_stats 与聚合"""
+        self._dirty_ids()['exam'].update(int(exam_id) for exam_id in exam_ids)
+
+    def _mark_aggregates_dirty(self, student_ids=(), class_ids=()):
+        """登记成绩批量变化的学生（及其所在班级）与班级，提交前重新计算聚合"""
+        dirty = self._dirty_ids()
+        student_ids = [int(i) for i in student_ids]
+        dirty['student'].update(student_ids)
+        dirty['anomaly'].update(student_ids)
+        dirty['class'].update(int(i) for i in class_ids if i is not None)
+
+    def _mark_exam_reordered(self, exam_id):
+        """考试上传时间改变（考试先后顺序变化）：登记其学生重新扫描异常"""
+        rows = self.execute_query(
+            'SELECT student_id FROM scores WHERE exam_id = ?', [int(exam_id)])
+        self._dirty_ids()['anomaly'].update(
+            int(i) for i in rows['student_id'])
+
+    def _refresh_derived(self, cursor):
+        """提交前重新计算被标记的 exam_stats 与运行聚合"""
+        dirty = self._dirty_ids()
+        if dirty['exam'] or dirty['exam_stats']:
+            refresh_exam_stats(cursor, dirty['exam'] | dirty['exam_stats'])
+        if dirty['exam']:
+            aggregates.rebuild_aggregates(cursor, 'exam', dirty['exam'])
+        if dirty['student']:
+            aggregates.rebuild_aggregates(cursor, 'student', dirty['student'])
+            dirty['class'].update(_class_ids_of(cursor, dirty['student']))
+        if dirty['class']:
+            aggregates.rebuild_aggregates(cursor, 'class', dirty['class'])
+        if dirty['anomaly']:
+            refresh_anomaly_flags(cursor, dirty['anomaly'])
+
+    def _apply_single_score_change(self, cursor, student_id, exam_id,
+                                   old_score, new_score):
+        """单条成绩修改：Welford 增量更新聚合，exam_stats（四分位数与分布）
+        在提交前于同一事务中重新计算"""
+        aggregates.apply_score_change(
+            cursor, student_id, exam_id, old_score, new_score)
+        dirty = self._dirty_ids()
+        dirty['anomaly'].add(int(student_id))
+        dirty['exam_stats'].add(int(exam_id))
+
+    def _transaction_depths(self):
+        depths = getattr(_transaction_state, 'depths', None)
+        if depths is None:
+            depths = {}
+            _transaction_state.depths = depths
+        return depths
+
+    def in_transaction(self):
+        """当前线程是否处于 transaction() 块中"""
+        return self._transaction_depths().get(self.db_path, 0) > 0
+
+    @contextmanager
+    def transaction(self):
+        """事务块
+
+        块内的 execute_update/execute_many 不再单独提交，退出最外层块时
+        统一提交，出现异常则整体回滚
+        """
+        depths = self._transaction_depths()
+        conn = self.get_connection()
+        depth = depths.get(self.db_path, 0)
+        depths[self.db_path] = depth + 1
         try:
-            cursor.execute('SELECT class_id FROM students LIMIT 1')
-        except sqlite3.OperationalError:
-            cursor.execute('ALTER TABLE students ADD COLUMN class_id INTEGER')
-
-        # 创建成绩表
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS scores (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                student_id INTEGER,
-                exam_id INTEGER,
-                score REAL NOT NULL,
-                record_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (student_id) REFERENCES students (id),
-                FOREIGN KEY (exam_id) REFERENCES exams (id),
-                UNIQUE(student_id, exam_id)
+            yield conn
+        except Exception:
+            depths[self.db_path] = depth
+            if depth == 0:
+                conn.rollback()
+                self._pending_callbacks().clear()
+                self._clear_dirty()
+            raise
+        depths[self.db_path] = depth
+        if depth == 0:
+            self._commit(conn)
+
+    def _commit(self, conn):
+        """提交事务；有数据写入时同时刷新考试统计、递增数据版本号并执行提交回调"""
+        new_version = None
+        if conn.in_transaction:
+            self._refresh_derived(conn.cursor())
+            conn.execute(
+                "UPDATE app_meta SET value = value + 1 "
+                "WHERE key = 'data_version'"
             )
-        ''')
-
+            new_version = conn.execute(
+                "SELECT value FROM app_meta WHERE key = 'data_version'"
+            ).fetchone()[0]
         conn.commit()
-        conn.close()
-
-    def get_connection(self):
-        """获取数据库连接"""
-        return sqlite3.connect(self.db_path)
+        self._clear_dirty()
+
+        pending = self._pending_callbacks()
+        callbacks = list(pending)
+        pending.clear()
+        if new_version is None:
+            return
+        for callback in callbacks:
+            try:
+                callback(new_version - 1, new_version)
+            except Exception as e:
+                print(f"执行提交回调失败: {e}")
+                self.score_matrix.invalidate()
+
+    def get_data_version(self):
+        """获取数据版本号（每次写入提交后递增，跨进程可见）"""
+        conn = self.get_connection()
+        try:
+            row = conn.execute(
+                "SELECT value FROM app_meta WHERE key = 'data_version'"
+            ).fetchone()
+            return row[0] if row else 0
+        finally:
+            self.close_connection(conn)
 
-    def close_connection(self, conn):
-        """关闭数据库连接"""
-        if conn:
-            conn.close()
+    def get_pool_stats(self):
+        """获取连接池命中/未命中统计"""
+        return connection_pool.stats()
 
     def execute_query(self, query, params=None):
         """执行查询语句"""
@@ -123,11 +625,24 @@ class DatabaseManager:
                 cursor.execute(query, params)
             else:
                 cursor.execute(query)
-            conn.commit()
+            if not self.in_transaction():
+                self._commit(conn)
             return cursor.lastrowid
         finally:
             self.close_connection(conn)
 
+    def execute_many(self, query, seq_of_params):
+        """批量执行更新语句，返回影响行数"""
+        conn = self.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.executemany(query, seq_of_params)
+            if not self.in_transaction():
+                self._commit(conn)
+            return cursor.rowcount
+        finally:
+            self.close_connection(conn)
+
     def get_all_exams(self):
         """获取所有考试"""
         query = '''
@@ -184,7 +699,12 @@ class DatabaseManager:
                 'DELETE FROM classes WHERE id = ?',
                 (class_id,)
             )
-            conn.commit()
+            cursor.execute(
+                "DELETE FROM score_aggregates WHERE scope = 'class' "
+                "AND scope_id = ?",
+                (class_id,)
+            )
+            self._commit(conn)
             return True
         except Exception as e:
             print(f"删除班级失败: {e}")
@@ -192,6 +712,41 @@ class DatabaseManager:
         finally:
             self.close_connection(conn)
 
+    def bulk_create_classes(self, class_names):
+        """批量创建班级（已存在的忽略）"""
+        query = 'INSERT OR IGNORE INTO classes (class_name) VALUES (?)'
+        return self.execute_many(query, [(name,) for name in class_names])
+
+    def get_class_id_map(self, class_names):
+        """批量查询班级名称对应的班级ID，返回 {班级名称: 班级ID}"""
+        class_names = list(dict.fromkeys(class_names))
+        if not class_names:
+            return {}
+        placeholders = ','.join(['?' for _ in class_names])
+        rows = self.execute_query(
+            f'SELECT id, class_name FROM classes WHERE class_name IN ({placeholders})',
+            class_names
+        )
+        return dict(zip(rows['class_name'], rows['id'].astype(int)))
+
+    def assign_student_classes(self, assignments):
+        """批量设置学生班级，assignments 为 (班级ID, 学生ID) 序列"""
+        query = 'UPDATE students SET class_id = ? WHERE id = ?'
+        assignments = list(assignments)
+        if not assignments:
+            return 0
+        with self.transaction() as conn:
+            # 原班级与新班级的聚合在提交前重新计算
+            self._mark_aggregates_dirty(class_ids=_class_ids_of(
+                conn.cursor(), [student_id for _, student_id in assignments]))
+            self._mark_aggregates_dirty(
+                class_ids=[class_id for class_id, _ in assignments])
+            result = self.execute_many(query, assignments)
+            # 成绩矩阵中缓存了学生班级，提交后整体重建
+            self._after_commit(
+                lambda old, new: self.score_matrix.invalidate())
+        return result
+
     def get_class_student_counts(self):
         """各班学生数量统计"""
         query = '''
@@ -242,16 +797,34 @@ class DatabaseManager:
             'UPDATE students SET student_id = ?, name = ?, class_id = ? '
             'WHERE id = ?'
         )
-        return self.execute_update(
-            query,
-            (student_id_value, name, class_id, student_pk_id)
-        )
+        with self.transaction() as conn:
+            cursor = conn.cursor()
+            row = cursor.execute(
+                'SELECT class_id FROM students WHERE id = ?',
+                (int(student_pk_id),)
+            ).fetchone()
+            result = self.execute_update(
+                query,
+                (student_id_value, name, class_id, student_pk_id)
+            )
+            if row is not None:
+                # 换班时把该学生的聚合从原班级移到新班级
+                aggregates.move_student(
+                    cursor, student_pk_id, row[0], class_id)
+        return result
 
     def delete_student(self, student_pk_id):
         """删除学生（同时清理其成绩）"""
         conn = self.get_connection()
         try:
             cursor = conn.cursor()
+            self._mark_stats_dirty(row[0] for row in cursor.execute(
+                'SELECT DISTINCT exam_id FROM scores WHERE student_id = ?',
+                (student_pk_id,)
+            ).fetchall())
+            self._mark_aggregates_dirty(
+                student_ids=[student_pk_id],
+                class_ids=_class_ids_of(cursor, [student_pk_id]))
             cursor.execute(
                 'DELETE FROM scores WHERE student_id = ?',
                 (student_pk_id,)
@@ -260,7 +833,7 @@ class DatabaseManager:
                 'DELETE FROM students WHERE id = ?',
                 (student_pk_id,)
             )
-            conn.commit()
+            self._commit(conn)
             return True
         except Exception as e:
             print(f"删除学生失败: {e}")
@@ -273,6 +846,11 @@ class DatabaseManager:
         query = 'SELECT * FROM exams WHERE exam_name = ?'
         return self.execute_query(query, [exam_name])
 
+    def get_exam_by_content_hash(self, content_hash):
+        """根据导入文件的内容哈希获取考试信息"""
+        query = 'SELECT * FROM exams WHERE content_hash = ?'
+        return self.execute_query(query, [content_hash])
+
     def get_exam_scores(self, exam_name):
         """获取指定考试的所有学生成绩"""
         query = '''
@@ -323,10 +901,13 @@ class DatabaseManager:
             'INSERT INTO exams (exam_name, file_path, student_count) '
             'VALUES (?, ?, ?)'
         )
-        return self.execute_update(
-            query,
-            (exam_name, file_path, student_count)
-        )
+        with self.transaction():
+            exam_id = self.execute_update(
+                query,
+                (exam_name, file_path, student_count)
+            )
+            self._mark_stats_dirty([exam_id])
+        return exam_id
 
     def rename_exam(self, exam_id, new_name):
         """重命名考试"""
@@ -334,13 +915,21 @@ class DatabaseManager:
             'UPDATE exams SET exam_name = ?, '
             'upload_time = CURRENT_TIMESTAMP WHERE id = ?'
         )
-        return self.execute_update(query, (new_name, exam_id))
+        with self.transaction():
+            self._mark_exam_reordered(exam_id)
+            result = self.execute_update(query, (new_name, exam_id))
+        return result
 
     def delete_exam_by_id(self, exam_id):
         """按ID删除考试（含成绩）"""
         conn = self.get_connection()
         try:
             cursor = conn.cursor()
+            self._mark_aggregates_dirty(student_ids=[
+                row[0] for row in cursor.execute(
+                    'SELECT student_id FROM scores WHERE exam_id = ?',
+                    (exam_id,)
+                ).fetchall()])
             cursor.execute(
                 'DELETE FROM scores WHERE exam_id = ?',
                 (exam_id,)
@@ -349,7 +938,8 @@ class DatabaseManager:
                 'DELETE FROM exams WHERE id = ?',
                 (exam_id,)
             )
-            conn.commit()
+            self._mark_stats_dirty([exam_id])
+            self._commit(conn)
             return True, "删除成功"
         except Exception as e:
             return False, f"删除考试时出现错误：{str(e)}"
@@ -398,48 +988,83 @@ class DatabaseManager:
             INSERT OR REPLACE INTO scores (student_id, exam_id, score)
             VALUES (?, ?, ?)
         '''
-        return self.execute_update(
-            query,
-            (int(student_pk_id), int(exam_id), float(score))
-        )
+        row = (int(student_pk_id), int(exam_id), float(score))
+        with self.transaction() as conn:
+            cursor = conn.cursor()
+            old_score = _existing_score(cursor, row[0], row[1])
+            result = self.execute_update(query, row)
+            self._apply_single_score_change(
+                cursor, row[0], row[1], old_score, row[2])
+            self._after_commit(
+                lambda old, new: self.score_matrix.apply_changes(
+                    old, new, upserts=[row])
+            )
+        return result
 
     def delete_score(self, score_id=None, student_pk_id=None, exam_id=None):
         """删除成绩（支持按score_id或学生+考试对删除）"""
-        if score_id is not None:
-            query = 'DELETE FROM scores WHERE id = ?'
-            return self.execute_update(query, (score_id,))
-        if student_pk_id is not None and exam_id is not None:
-            query = 'DELETE FROM scores WHERE student_id = ? AND exam_id = ?'
-            return self.execute_update(query, (student_pk_id, exam_id))
-        raise ValueError('必须提供 score_id 或 (student_pk_id, exam_id)')
-
-    def update_exam_info(self, exam_id, file_path, student_count):
-        """更新考试信息"""
+        if score_id is None and (student_pk_id is None or exam_id is None):
+            raise ValueError('必须提供 score_id 或 (student_pk_id, exam_id)')
+
+        with self.transaction() as conn:
+            cursor = conn.cursor()
+            if score_id is not None:
+                removed = cursor.execute(
+                    'SELECT student_id, exam_id, score FROM scores WHERE id = ?',
+                    (score_id,)
+                ).fetchall()
+                query = 'DELETE FROM scores WHERE id = ?'
+                result = self.execute_update(query, (score_id,))
+            else:
+                removed = cursor.execute(
+                    'SELECT student_id, exam_id, score FROM scores '
+                    'WHERE student_id = ? AND exam_id = ?',
+                    (student_pk_id, exam_id)
+                ).fetchall()
+                query = 'DELETE FROM scores WHERE student_id = ? AND exam_id = ?'
+                result = self.execute_update(query, (student_pk_id, exam_id))
+            deletes = [(int(student), int(exam)) for student, exam, _ in removed]
+            for student, exam, old_score in removed:
+                self._apply_single_score_change(
+                    cursor, student, exam, old_score, None)
+            self._after_commit(
+                lambda old, new: self.score_matrix.apply_changes(
+                    old, new, deletes=deletes)
+            )
+        return result
+
+    def update_exam_info(self, exam_id, file_path, student_count, content_hash=None):
+        """更新考试信息（content_hash 为 None 时保留原哈希）"""
         try:
             query = (
                 'UPDATE exams SET file_path = ?, student_count = ?, '
+                'content_hash = COALESCE(?, content_hash), '
                 'upload_time = CURRENT_TIMESTAMP WHERE id = ?'
             )
-            result = self.execute_update(
-                query,
-                (file_path, student_count, exam_id)
-            )
+            with self.transaction():
+                self._mark_exam_reordered(exam_id)
+                result = self.execute_update(
+                    query,
+                    (file_path, student_count, content_hash, int(exam_id))
+                )
             return result is not None
         except Exception as e:
             print(f"更新考试信息失败: {e}")
             return False
 
-    def insert_new_exam(self, exam_name, file_path, student_count):
+    def insert_new_exam(self, exam_name, file_path, student_count, content_hash=None):
         """插入新的考试信息"""
         try:
             query = '''
-                INSERT INTO exams (exam_name, file_path, student_count)
-                VALUES (?, ?, ?)
+                INSERT INTO exams (exam_name, file_path, student_count, content_hash)
+                VALUES (?, ?, ?, ?)
             '''
-            exam_id = self.execute_update(
-                query,
-                (exam_name, file_path, student_count)
-            )
+            with self.transaction():
+                exam_id = self.execute_update(
+                    query,
+                    (exam_name, file_path, student_count, content_hash)
+                )
+                self._mark_stats_dirty([exam_id])
 
             if exam_id:
                 print(f"考试 '{exam_name}' 插入成功，ID: {exam_id}")
@@ -465,10 +1090,12 @@ class DatabaseManager:
                     'UPDATE exams SET file_path = ?, student_count = ?, '
                     'upload_time = CURRENT_TIMESTAMP WHERE id = ?'
                 )
-                self.execute_update(
-                    query,
-                    (file_path, student_count, exam_id)
-                )
+                with self.transaction():
+                    self._mark_exam_reordered(exam_id)
+                    self.execute_update(
+                        query,
+                        (file_path, student_count, exam_id)
+                    )
                 print(f"考试 '{exam_name}' 更新成功，ID: {exam_id}")
                 return exam_id
 
@@ -477,10 +1104,12 @@ class DatabaseManager:
                 INSERT INTO exams (exam_name, file_path, student_count)
                 VALUES (?, ?, ?)
             '''
-            exam_id = self.execute_update(
-                query,
-                (exam_name, file_path, student_count)
-            )
+            with self.transaction():
+                exam_id = self.execute_update(
+                    query,
+                    (exam_name, file_path, student_count)
+                )
+                self._mark_stats_dirty([exam_id])
 
             if exam_id:
                 print(f"考试 '{exam_name}' 插入成功，ID: {exam_id}")
@@ -532,6 +1161,272 @@ class DatabaseManager:
             return df.iloc[0]['id']
         return None
 
+    def get_student_id_map(self, student_ids):
+        """批量根据学号获取学生ID，返回 {学号: ID}"""
+        student_ids = list(dict.fromkeys(student_ids))
+        id_map = {}
+        for start in range(0, len(student_ids), SQL_CHUNK_SIZE):
+            chunk = student_ids[start:start + SQL_CHUNK_SIZE]
+            placeholders = ','.join(['?' for _ in chunk])
+            df = self.execute_query(
+                'SELECT student_id, id FROM students '
+                f'WHERE student_id IN ({placeholders})',
+                chunk
+            )
+            id_map.update(zip(df['student_id'], df['id'].astype(int).tolist()))
+        return id_map
+
+    def bulk_insert_students(self, students):
+        """批量插入学生信息，students 为 (学号, 姓名) 序列"""
+        query = (
+            'INSERT OR IGNORE INTO students (student_id, name) '
+            'VALUES (?, ?)'
+        )
+        return self.execute_many(query, students)
+
+    def bulk_upsert_scores(self, scores):
+        """批量新增或更新成绩，scores 为 (学生ID, 考试ID, 成绩) 序列"""
+        query = '''
+            INSERT OR REPLACE INTO scores (student_id, exam_id, score)
+            VALUES (?, ?, ?)
+        '''
+        scores = list(scores)
+        with self.transaction():
+            result = self.execute_many(query, scores)
+            self._mark_stats_dirty({row[1] for row in scores})
+            self._mark_aggregates_dirty(student_ids={row[0] for row in scores})
+            self._after_commit(
+                lambda old, new: self.score_matrix.apply_changes(
+                    old, new, upserts=scores)
+            )
+        return result
+
+    def _execute_state_update(self, query, params):
+        """写入任务状态：直接提交，不递增数据版本号（任务状态不属于成绩数据）"""
+        conn = self.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            conn.commit()
+            return cursor.lastrowid
+        finally:
+            self.close_connection(conn)
+
+    def create_import_job(self, options, total_files):
+        """创建导入任务，返回任务ID"""
+        query = '''
+            INSERT INTO import_jobs (options, total_files)
+            VALUES (?, ?)
+        '''
+        return self._execute_state_update(query, (options, total_files))
+
+    def update_import_job(self, job_id, **fields):
+        """更新导入任务状态（列名限于 IMPORT_JOB_COLUMNS）"""
+        columns = [col for col in fields if col in IMPORT_JOB_COLUMNS]
+        if not columns:
+            return None
+        assignments = ', '.join(f'{col} = ?' for col in columns)
+        query = (
+            f'UPDATE import_jobs SET {assignments}, '
+            'updated_at = CURRENT_TIMESTAMP WHERE id = ?'
+        )
+        params = [fields[col] for col in columns] + [int(job_id)]
+        return self._execute_state_update(query, params)
+
+    def get_import_job(self, job_id):
+        """获取导入任务"""
+        query = 'SELECT * FROM import_jobs WHERE id = ?'
+        return self.execute_query(query, [int(job_id)])
+
+    def get_import_jobs(self, statuses=None, limit=20):
+        """获取导入任务列表（最新的在前），可按状态筛选"""
+        query = 'SELECT * FROM import_jobs'
+        params = []
+        if statuses:
+            placeholders = ','.join(['?' for _ in statuses])
+            query += f' WHERE status IN ({placeholders})'
+            params.extend(statuses)
+        query += ' ORDER BY id DESC LIMIT ?'
+        params.append(int(limit))
+        return self.execute_query(query, params)
+
+    def get_exam_stats(self, exam_names=None):
+        """获取考试统计（每场考试一行，按上传时间倒序），可按考试名称筛选
+
+        还没有成绩的考试 score_count 为 0，其余统计为空。
+        """
+        query = '''
+            SELECT
+                e.id AS exam_id,
+                e.exam_name,
+                COALESCE(st.score_count, 0) AS score_count,
+                st.mean, st.std, st.min, st.q1, st.median, st.q3, st.max,
+                st.histogram, st.bands
+            FROM exams e
+            LEFT JOIN exam_stats st ON st.exam_id = e.id
+        '''
+        params = None
+        if exam_names is not None:
+            if not exam_names:
+                return pd.DataFrame()
+            placeholders = ','.join(['?' for _ in exam_names])
+            query += f' WHERE e.exam_name IN ({placeholders})'
+            params = list(exam_names)
+        query += ' ORDER BY e.upload_time DESC'
+        return self.execute_query(query, params)
+
+    def get_score_aggregates(self, scope):
+        """获取运行聚合：scope 为 'exam'、'class' 或 'student'
+
+        返回 scope_id、score_count、mean、std（样本标准差）列。
+        """
+        if scope not in aggregates.SCOPES:
+            raise ValueError(f'未知的聚合范围: {scope}')
+        df = self.execute_query(
+            'SELECT scope_id, score_count, mean, m2 FROM score_aggregates '
+            'WHERE scope = ? ORDER BY scope_id',
+            [scope]
+        )
+        df['std'] = [
+            aggregates.sample_std(state)
+            for state in zip(df['score_count'], df['mean'], df['m2'])
+        ]
+        return df.drop(columns='m2')
+
+    def get_exam_rankings(self, exam_names):
+        """按考试计算每个学生的名次与百分位（窗口函数，一条语句）
+
+        名次为按成绩从高到低的密集排名；百分位为 PERCENT_RANK × 100，即
+        成绩低于该生的人数 /（参考人数 - 1）× 100，只有一人参考时为 0。
+        无法解析为数字的成绩不参与排名。同时返回考试的平均分与样本方差
+        （来自运行聚合），供计算标准分。列为 student_id（学号）、
+        exam_name、score、rank、percentile、mean、variance。
+        """
+        exam_names = list(dict.fromkeys(exam_names))
+        frames = []
+        for start in range(0, len(exam_names), SQL_CHUNK_SIZE):
+            chunk = exam_names[start:start + SQL_CHUNK_SIZE]
+            placeholders = ','.join(['?' for _ in chunk])
+            query = f'''
+                SELECT
+                    s.student_id,
+                    e.exam_name,
+                    sc.score,
+                    DENSE_RANK() OVER by_score_desc AS rank,
+                    ROUND(PERCENT_RANK() OVER by_score * 100, 1) AS percentile,
+                    ag.mean,
+                    CASE WHEN ag.score_count > 1
+                        THEN ag.m2 / (ag.score_count - 1) ELSE 0 END AS variance
+                FROM scores sc
+                JOIN students s ON s.id = sc.student_id
+                JOIN exams e ON e.id = sc.exam_id
+                LEFT JOIN score_aggregates ag
+                    ON ag.scope = 'exam' AND ag.scope_id = sc.exam_id
+                WHERE e.exam_name IN ({placeholders})
+                  AND typeof(sc.score) IN ('integer', 'real')
+                WINDOW
+                    by_score_desc AS (PARTITION BY sc.exam_id ORDER BY sc.score DESC),
+                    by_score AS (PARTITION BY sc.exam_id ORDER BY sc.score)
+            '''
+            frames.append(self.execute_query(query, chunk))
+        if not frames:
+            return pd.DataFrame(columns=[
+                'student_id', 'exam_name', 'score', 'rank', 'percentile',
+                'mean', 'variance'])
+        return pd.concat(frames, ignore_index=True)
+
+    def get_anomaly_flags(self, latest_only=False):
+        """获取异常标记（含学号、姓名、班级、考试名称），按严重程度降序
+
+        latest_only=True 时只返回每个学生最近一场有成绩的考试上的标记。
+        """
+        query = '''
+            SELECT
+                f.student_id AS student_pk_id,
+                s.student_id,
+                s.name,
+                c.class_name,
+                e.exam_name,
+                e.upload_time,
+                f.kind,
+                f.score,
+                f.previous_score,
+                f.expected,
+                f.z_score,
+                f.band_from,
+                f.band_to,
+                f.severity
+            FROM anomaly_flags f
+            JOIN students s ON s.id = f.student_id
+            JOIN exams e ON e.id = f.exam_id
+            LEFT JOIN classes c ON c.id = s.class_id
+        '''
+        if latest_only:
+            query += '''
+            WHERE f.exam_id = (
+                SELECT sc.exam_id FROM scores sc
+                JOIN exams le ON le.id = sc.exam_id
+                WHERE sc.student_id = f.student_id
+                ORDER BY le.upload_time DESC, le.exam_name DESC
+                LIMIT 1
+            )
+            '''
+        query += ' ORDER BY f.severity DESC, e.upload_time DESC'
+        return self.execute_query(query)
+
+    def rescan_anomalies(self):
+        """全量重新扫描异常（成绩未变化，不递增数据版本号），返回标记数"""
+        conn = self.get_connection()
+        try:
+            written = refresh_anomaly_flags(conn.cursor())
+            conn.commit()
+            return written
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self.close_connection(conn)
+
+    def get_exam_score_rows(self, exam_id):
+        """获取某场考试已存的成绩（学生ID、成绩）"""
+        query = 'SELECT student_id, score FROM scores WHERE exam_id = ?'
+        return self.execute_query(query, [int(exam_id)])
+
+    def apply_score_changes(self, upserts=(), deletes=()):
+        """按差异写入成绩
+
+        upserts 为 (学生ID, 考试ID, 成绩) 序列，已存在的成绩只在分数不同时
+        更新（保留成绩ID）；deletes 为 (学生ID, 考试ID) 序列。返回
+        (写入行数, 删除行数)。
+        """
+        upsert_query = '''
+            INSERT INTO scores (student_id, exam_id, score)
+            VALUES (?, ?, ?)
+            ON CONFLICT(student_id, exam_id) DO UPDATE SET
+                score = excluded.score,
+                record_time = CURRENT_TIMESTAMP
+            WHERE scores.score IS NOT excluded.score
+        '''
+        delete_query = 'DELETE FROM scores WHERE student_id = ? AND exam_id = ?'
+        upserts = list(upserts)
+        deletes = list(deletes)
+        written = removed = 0
+        with self.transaction():
+            if upserts:
+                written = self.execute_many(upsert_query, upserts)
+            if deletes:
+                removed = self.execute_many(delete_query, deletes)
+            self._mark_stats_dirty(
+                {row[1] for row in upserts} | {row[1] for row in deletes})
+            self._mark_aggregates_dirty(
+                student_ids={row[0] for row in upserts}
+                | {row[0] for row in deletes})
+            self._after_commit(
+                lambda old, new: self.score_matrix.apply_changes(
+                    old, new, upserts=upserts, deletes=deletes)
+            )
+        return written, removed
+
     def insert_score(self, student_id, exam_id, score):
         """插入成绩信息"""
         try:
@@ -568,7 +1463,13 @@ class DatabaseManager:
                 INSERT OR REPLACE INTO scores (student_id, exam_id, score)
                 VALUES (?, ?, ?)
             '''
-            return self.execute_update(query, (student_id, exam_id, score))
+            with self.transaction() as conn:
+                cursor = conn.cursor()
+                old_score = _existing_score(cursor, student_id, exam_id)
+                result = self.execute_update(query, (student_id, exam_id, score))
+                self._apply_single_score_change(
+                    cursor, student_id, exam_id, old_score, score)
+            return result
         except Exception as e:
             print(f"插入成绩失败: {e}")
             return None
@@ -590,6 +1491,11 @@ class DatabaseManager:
                 return False, f"考试 '{exam_name}' 不存在"
 
             exam_id = exam_result[0]
+            self._mark_aggregates_dirty(student_ids=[
+                row[0] for row in cursor.execute(
+                    'SELECT student_id FROM scores WHERE exam_id = ?',
+                    (exam_id,)
+                ).fetchall()])
 
             # 删除相关的成绩记录
             cursor.execute(
@@ -606,7 +1512,8 @@ class DatabaseManager:
             # 注意：不再自动删除学生记录，保持学生信息的完整性
             # 学生可能只是暂时没有成绩，不应该被删除
 
-            conn.commit()
+            self._mark_stats_dirty([exam_id])
+            self._commit(conn)
             return True, f"考试 '{exam_name}' 已成功删除"
         except Exception as e:
             return False, f"删除考试时出现错误：{str(e)}"
@@ -621,6 +1528,9 @@ class DatabaseManager:
 
             # 清空所有表
             cursor.execute("DELETE FROM scores")
+            cursor.execute("DELETE FROM exam_stats")
+            cursor.execute("DELETE FROM score_aggregates")
+            cursor.execute("DELETE FROM anomaly_flags")
             cursor.execute("DELETE FROM exams")
             cursor.execute("DELETE FROM students")
 
@@ -630,7 +1540,7 @@ class DatabaseManager:
                 "'exams', 'students')"
             )
 
-            conn.commit()
+            self._commit(conn)
             return True, "所有数据已清空"
         except Exception as e:
             return False, f"清空数据时出现错误：{str(e)}"
@@ -644,6 +1554,13 @@ class DatabaseManager:
             cursor = conn.cursor()
 
             # 清理没有对应考试的分数记录
+            missing_exam = cursor.execute("""
+                SELECT DISTINCT student_id, exam_id FROM scores
+                WHERE exam_id NOT IN (SELECT id FROM exams)
+            """).fetchall()
+            self._mark_stats_dirty(exam_id for _, exam_id in missing_exam)
+            self._mark_aggregates_dirty(
+                student_ids=[student_id for student_id, _ in missing_exam])
             cursor.execute("""
                 DELETE FROM scores
                 WHERE exam_id NOT IN (SELECT id FROM exams)
@@ -651,6 +1568,13 @@ class DatabaseManager:
             orphaned_scores = cursor.rowcount
 
             # 清理没有对应学生的分数记录
+            orphans = cursor.execute("""
+                SELECT DISTINCT student_id, exam_id FROM scores
+                WHERE student_id NOT IN (SELECT id FROM students)
+            """).fetchall()
+            self._mark_stats_dirty(exam_id for _, exam_id in orphans)
+            self._mark_aggregates_dirty(
+                student_ids=[student_id for student_id, _ in orphans])
             cursor.execute("""
                 DELETE FROM scores
                 WHERE student_id NOT IN (SELECT id FROM students)
@@ -664,7 +1588,7 @@ class DatabaseManager:
             """)
             orphaned_students_cleanup = cursor.rowcount
 
-            conn.commit()
+            self._commit(conn)
             return True, (
                 f"清理完成：孤立分数记录 {orphaned_scores} 条，"
                 f"缺失学生关联分数记录 {orphaned_students} 条，"
@@ -0,0 +1,123 @@
+"""
+考试统计模块
+计算每场考试的汇总统计（人数、平均分、标准差、最值、四分位数、10分一段的
+直方图与等级分布），存入 exam_stats 表，随成绩写入在同一事务中刷新
+"""
+
+import json
+import numpy as np
+import pandas as pd
+from webapp.grading import grade_band_table
+
+# 直方图每段的分数宽度
+HISTOGRAM_BIN_WIDTH = 10
+
+# exam_stats 中的统计列（histogram、bands 为 JSON 文本）
+STATS_COLUMNS = (
+    'score_count', 'mean', 'std', 'min', 'q1', 'median', 'q3', 'max',
+    'histogram', 'bands'
+)
+
+# 每次查询的考试数（避免超过 SQLite 参数上限）
+REFRESH_CHUNK_SIZE = 500
+
+
+def compute_exam_stats(scores):
+    """计算一场考试的统计值，无法解析为数字的成绩不参与统计
+
+    histogram 为 {段起始分: 人数}（只含有人的分段），bands 为按 GRADE_CONFIG
+    从低到高的 {分数段标签: 人数}，二者均为 JSON 文本。
+    """
+    values = pd.to_numeric(
+        pd.Series(scores, dtype=object), errors='coerce'
+    ).dropna().to_numpy(dtype=float)
+    band_table = grade_band_table()
+
+    if len(values) == 0:
+        stats = dict.fromkeys(STATS_COLUMNS)
+        stats.update(
+            score_count=0,
+            histogram='{}',
+            bands=json.dumps(dict.fromkeys(band_table.labels, 0),
+                             ensure_ascii=False)
+        )
+        return stats
+
+    q1, median, q3 = np.percentile(values, [25, 50, 75])
+    starts, counts = np.unique(
+        np.floor(values / HISTOGRAM_BIN_WIDTH).astype(int) * HISTOGRAM_BIN_WIDTH,
+        return_counts=True
+    )
+    index = band_table.index_of(values)
+    band_counts = np.bincount(index[index >= 0], minlength=len(band_table))
+
+    return {
+        'score_count': int(len(values)),
+        'mean': float(values.mean()),
+        'std': float(values.std(ddof=1)) if len(values) > 1 else 0.0,
+        'min': float(values.min()),
+        'q1': float(q1),
+        'median': float(median),
+        'q3': float(q3),
+        'max': float(values.max()),
+        'histogram': json.dumps(
+            {str(start): int(count) for start, count in zip(starts, counts)}),
+        'bands': json.dumps(
+            {label: int(count)
+             for label, count in zip(band_table.labels, band_counts)},
+            ensure_ascii=False
+        ),
+    }
+
+
+def refresh_exam_stats(cursor, exam_ids):
+    """重新计算指定考试的统计并写入 exam_stats（在调用方的事务中执行）
+
+    已删除的考试同时删除其统计行。
+    """
+    exam_ids = sorted({int(exam_id) for exam_id in exam_ids})
+    for start in range(0, len(exam_ids), REFRESH_CHUNK_SIZE):
+        chunk = exam_ids[start:start + REFRESH_CHUNK_SIZE]
+        placeholders = ','.join('?' for _ in chunk)
+        existing = {
+            row[0] for row in cursor.execute(
+                f'SELECT id FROM exams WHERE id IN ({placeholders})', chunk)
+        }
+        scores = {}
+        for exam_id, score in cursor.execute(
+                f'SELECT exam_id, score FROM scores '
+                f'WHERE exam_id IN ({placeholders})', chunk):
+            scores.setdefault(exam_id, []).append(score)
+
+        rows = []
+        for exam_id in chunk:
+            if exam_id not in existing:
+                continue
+            stats = compute_exam_stats(scores.get(exam_id, []))
+            rows.append([exam_id] + [stats[col] for col in STATS_COLUMNS])
+
+        removed = [exam_id for exam_id in chunk if exam_id not in existing]
+        if removed:
+            cursor.executemany(
+                'DELETE FROM exam_stats WHERE exam_id = ?',
+                [(exam_id,) for exam_id in removed]
+            )
+        if rows:
+            columns = ', '.join(STATS_COLUMNS)
+            values = ', '.join('?' for _ in STATS_COLUMNS)
+            cursor.executemany(
+                f'INSERT OR REPLACE INTO exam_stats (exam_id, {columns}, updated_at) '
+                f'VALUES (?, {values}, CURRENT_TIMESTAMP)',
+                rows
+            )
+
+
+def parse_stats_json(stats_df):
+    """将 get_exam_stats 结果中的 histogram、bands 列解析为字典"""
+    stats_df = stats_df.copy()
+    for col in ('histogram', 'bands'):
+        stats_df[col] = [
+            json.loads(value) if isinstance(value, str) else {}
+            for value in stats_df[col]
+        ]
+    return stats_df
@@ -0,0 +1,174 @@
+"""
+Excel读取模块
+以只读模式逐行读取大型成绩工作簿，只保留导入需要的列并按块产出；
+将多工作表、多科目宽表工作簿整理为长表
+"""
+
+import os
+import pandas as pd
+from openpyxl import load_workbook
+
+# 导入时需要读取的列
+IMPORT_COLUMNS = ['学号', '姓名', '成绩', '班级', '满分']
+
+# 超过该大小的 xlsx 文件使用流式读取
+STREAMING_THRESHOLD = 5 * 1024 * 1024  # 5MB
+
+# 每块的行数
+CHUNK_ROWS = 5000
+
+
+def get_file_size(uploaded_file):
+    """获取上传文件（或文件对象）的字节数"""
+    size = getattr(uploaded_file, 'size', None)
+    if size is not None:
+        return size
+    try:
+        position = uploaded_file.tell()
+        uploaded_file.seek(0, os.SEEK_END)
+        size = uploaded_file.tell()
+        uploaded_file.seek(position)
+        return size
+    except (AttributeError, OSError):
+        return 0
+
+
+def should_stream(uploaded_file):
+    """大于阈值的 xlsx 文件使用流式读取（xls 格式不支持只读模式）"""
+    name = getattr(uploaded_file, 'name', '')
+    return (
+        name.lower().endswith('.xlsx')
+        and get_file_size(uploaded_file) > STREAMING_THRESHOLD
+    )
+
+
+class ExcelChunkReader:
+    """第一个工作表的只读分块读取器
+
+    打开后即可通过 columns 检查表头，迭代时按 chunk_size 行产出
+    DataFrame（只含 IMPORT_COLUMNS 中存在的列，index 为数据行序号，
+    与 pd.read_excel 的行号一致），全空行被跳过。
+    """
+
+    def __init__(self, source, columns=IMPORT_COLUMNS, chunk_size=CHUNK_ROWS):
+        if hasattr(source, 'seek'):
+            source.seek(0)
+        self.chunk_size = chunk_size
+        self._workbook = load_workbook(source, read_only=True, data_only=True)
+        self._rows = self._workbook.worksheets[0].iter_rows(values_only=True)
+
+        header = next(self._rows, None) or ()
+        header = [str(value) if value is not None else '' for value in header]
+        self.columns = [col for col in columns if col in header]
+        self._positions = [header.index(col) for col in self.columns]
+        self.rows_read = 0
+
+    def __iter__(self):
+        try:
+            buffer = []
+            for row in self._rows:
+                values = tuple(
+                    row[i] if i < len(row) else None for i in self._positions
+                )
+                self.rows_read += 1
+                if all(value is None for value in values):
+                    continue
+                buffer.append((self.rows_read - 1, values))
+                if len(buffer) >= self.chunk_size:
+                    yield self._frame(buffer)
+                    buffer = []
+            if buffer:
+                yield self._frame(buffer)
+        finally:
+            self.close()
+
+    def _frame(self, buffer):
+        index = [position for position, _ in buffer]
+        # 保持原始对象类型，避免整数学号因缺失值被转换为浮点数
+        return pd.DataFrame(
+            [values for _, values in buffer],
+            columns=self.columns,
+            index=index,
+            dtype=object
+        )
+
+    def close(self):
+        self._workbook.close()
+
+
+# 宽表中不属于科目成绩的列
+NON_SUBJECT_COLUMNS = {
+    '学号', '姓名', '班级', '备注', '序号', '性别',
+    '总分', '平均分', '排名', '名次', '班级排名', '年级排名', '成绩', '满分'
+}
+
+
+def subject_columns(df):
+    """宽表中的科目成绩列：除已知非成绩列外、含有数值的列"""
+    subjects = []
+    for col in df.columns:
+        if str(col) in NON_SUBJECT_COLUMNS:
+            continue
+        if pd.to_numeric(df[col], errors='coerce').notna().any():
+            subjects.append(col)
+    return subjects
+
+
+def workbook_long_rows(sheets, id_columns=('学号', '姓名')):
+    """将工作簿中各工作表整理为长表
+
+    sheets 为 {工作表名: DataFrame}。含“成绩”列的工作表直接使用（科目为空），
+    否则将科目列整体融合为 科目/成绩 两列，缺考（空白）不产生记录。没有
+    班级列且有多个工作表时以工作表名作为班级。返回列为 学号/姓名/满分（存在
+    者）、班级、工作表、行号（Excel 中的行号）、科目、成绩 的 DataFrame，
+    index 为工作簿内的全局行号；没有可用工作表时返回 None。
+    """
+    usable = {
+        name: df.dropna(how='all') for name, df in sheets.items()
+        if any(col in df.columns for col in id_columns)
+    }
+    skipped = [name for name in sheets if name not in usable]
+    if skipped:
+        print(f"跳过没有学号/姓名列的工作表：{', '.join(map(str, skipped))}")
+    class_from_sheet = len(usable) > 1
+
+    frames = []
+    offset = 0
+    for sheet_name, df in usable.items():
+        # 全局行号：自动生成学号时各工作表的行不会重复
+        excel_rows = df.index + 2
+        df = df.set_axis(range(offset, offset + len(df)), axis=0)
+        offset += len(df)
+
+        base = df[[col for col in id_columns if col in df.columns]].copy()
+        if '班级' in df.columns:
+            base['班级'] = df['班级']
+        else:
+            base['班级'] = str(sheet_name) if class_from_sheet else None
+        if '满分' in df.columns:
+            base['满分'] = df['满分']
+        base['工作表'] = str(sheet_name)
+        base['行号'] = excel_rows
+
+        if '成绩' in df.columns:
+            frames.append(base.assign(科目='', 成绩=df['成绩']))
+            continue
+
+        subjects = subject_columns(df)
+        if not subjects:
+            print(f"工作表 {sheet_name} 中没有成绩列，已跳过")
+            continue
+        wide = pd.concat([base, df[subjects]], axis=1)
+        long = wide.melt(
+            id_vars=list(base.columns),
+            value_vars=subjects,
+            var_name='科目',
+            value_name='成绩',
+            ignore_index=False
+        )
+        long['科目'] = long['科目'].astype(str)
+        frames.append(long[long['成绩'].notna()])
+
+    if not frames:
+        return None
+    return pd.concat(frames)
@@ -0,0 +1,184 @@
+"""
+导出模块
+将成绩分析结果导出为Excel，颜色通过条件格式规则而非逐格填充实现
+"""
+
+import io
+import json
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.formatting.rule import FormulaRule
+from openpyxl.styles import Font, PatternFill
+from openpyxl.utils import get_column_letter
+from webapp.config import DEFAULT_COLOR_SETTINGS
+
+# 超过该行数时使用 write-only 模式流式写出
+WRITE_ONLY_THRESHOLD = 5000
+
+# 导出结果缓存的最大条目数
+EXPORT_CACHE_SIZE = 8
+
+HEADER_FILL = PatternFill(
+    start_color="366092", end_color="366092", fill_type="solid")
+HEADER_FONT = Font(color="FFFFFF", bold=True)
+
+
+def prepare_export_frame(student_scores):
+    """整理导出列：学号、姓名在前，列名改为中文"""
+    column_order = ['student_id', 'name'] + [
+        col for col in student_scores.columns
+        if col not in ['student_id', 'name']
+    ]
+    return student_scores[column_order].rename(columns={
+        'student_id': '学号',
+        'name': '姓名'
+    })
+
+
+def _solid_fill(color):
+    color = color.lstrip('#').upper()
+    return PatternFill(start_color=color, end_color=color, fill_type="solid")
+
+
+def _band_rules(color_settings, score_cell):
+    """由颜色设置生成条件格式规则（自定义区间优先，默认颜色兜底）"""
+    rules = []
+    for config in color_settings.values():
+        formula = (
+            f'AND(ISNUMBER({score_cell}),'
+            f'{score_cell}>={config["min_score"]},'
+            f'{score_cell}<={config["max_score"]})'
+        )
+        rules.append(FormulaRule(
+            formula=[formula], fill=_solid_fill(config['color']),
+            stopIfTrue=True
+        ))
+
+    # 不在任何自定义区间内的分数按默认分数段着色
+    defaults = sorted(
+        DEFAULT_COLOR_SETTINGS.values(),
+        key=lambda config: config['min_score'], reverse=True
+    )
+    for i, config in enumerate(defaults):
+        if i == len(defaults) - 1:
+            formula = f'ISNUMBER({score_cell})'
+        else:
+            formula = (
+                f'AND(ISNUMBER({score_cell}),'
+                f'{score_cell}>={config["min_score"]})'
+            )
+        rules.append(FormulaRule(
+            formula=[formula], fill=_solid_fill(config['color']),
+            stopIfTrue=True
+        ))
+    return rules
+
+
+def _cell_value(value):
+    if value is None or value is pd.NA or (
+            isinstance(value, float) and np.isnan(value)):
+        return None
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def build_score_workbook(export_df, color_settings, score_column='平均分',
+                         sheet_name='成绩分析', write_only=None):
+    """生成带条件格式的成绩工作簿，返回 xlsx 字节
+
+    write_only 为 None 时按行数自动选择：大表使用 write-only 模式逐行写出。
+    """
+    if write_only is None:
+        write_only = len(export_df) > WRITE_ONLY_THRESHOLD
+
+    workbook = Workbook(write_only=write_only)
+    if write_only:
+        worksheet = workbook.create_sheet(sheet_name)
+    else:
+        worksheet = workbook.active
+        worksheet.title = sheet_name
+
+    # 标题行
+    if write_only:
+        header = []
+        for column in export_df.columns:
+            cell = WriteOnlyCell(worksheet, value=str(column))
+            cell.fill = HEADER_FILL
+            cell.font = HEADER_FONT
+            header.append(cell)
+        worksheet.append(header)
+    else:
+        worksheet.append([str(column) for column in export_df.columns])
+        for cell in worksheet[1]:
+            cell.fill = HEADER_FILL
+            cell.font = HEADER_FONT
+
+    # 数据行
+    for row in export_df.itertuples(index=False, name=None):
+        worksheet.append([_cell_value(value) for value in row])
+
+    # 整行按分数列着色：一组条件格式规则覆盖整个数据区域
+    if score_column in export_df.columns and len(export_df) > 0:
+        score_letter = get_column_letter(
+            export_df.columns.get_loc(score_column) + 1)
+        last_letter = get_column_letter(len(export_df.columns))
+        cell_range = f"A2:{last_letter}{len(export_df) + 1}"
+        for rule in _band_rules(color_settings, f"${score_letter}2"):
+            worksheet.conditional_formatting.add(cell_range, rule)
+
+    output = io.BytesIO()
+    workbook.save(output)
+    return output.getvalue()
+
+
+class ExportCache:
+    """导出结果缓存，按 (所选考试, 数据版本号, 颜色设置) 复用已生成的文件"""
+
+    def __init__(self, max_size=EXPORT_CACHE_SIZE):
+        self.max_size = max_size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_build(self, key, builder):
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                return self._items[key]
+        data = builder()
+        with self._lock:
+            self._items[key] = data
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+        return data
+
+
+export_cache = ExportCache()
+
+
+def export_student_scores(analyzer, selected_exams, color_settings,
+                          data_version=None, class_names=None):
+    """导出所选考试（及班级）的成绩分析结果（xlsx 字节），结果按数据版本缓存"""
+    if data_version is None:
+        data_version = analyzer.get_data_version()
+    key = (
+        tuple(selected_exams),
+        None if class_names is None else tuple(class_names),
+        data_version,
+        json.dumps(color_settings, ensure_ascii=False)
+    )
+
+    def build():
+        student_scores = analyzer.get_student_scores(
+            list(selected_exams), class_names=class_names)
+        if student_scores.empty:
+            student_scores = pd.DataFrame(columns=['student_id', 'name'])
+        return build_score_workbook(
+            prepare_export_frame(student_scores), color_settings)
+
+    return export_cache.get_or_build(key, build)
@@ -0,0 +1,170 @@
+"""
+分数段模块
+将等级配置 / 颜色设置编译为有序的分数段表，用 np.searchsorted 批量映射分数
+"""
+
+import json
+import os
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+from webapp.config import (
+    GRADE_CONFIG,
+    DEFAULT_COLOR_SETTINGS,
+    COLOR_SETTINGS_FILE,
+    INVALID_SCORE_COLOR
+)
+
+
+class BandTable:
+    """编译后的分数段表（按最低分升序）"""
+
+    def __init__(self, bands):
+        bands = list(bands)
+        # 按配置顺序排列的分数段序号（strict 匹配时先配置的区间优先）
+        order = sorted(range(len(bands)), key=lambda i: bands[i]['min'])
+        self.priority = np.argsort(order, kind='stable')
+        bands = [bands[i] for i in order]
+        self.names = np.array([band['name'] for band in bands], dtype=object)
+        self.mins = np.array([band['min'] for band in bands], dtype=float)
+        self.maxs = np.array([band['max'] for band in bands], dtype=float)
+        self.colors = np.array([band['color'] for band in bands], dtype=object)
+        self.labels = np.array(self._range_labels(), dtype=object)
+
+    def __len__(self):
+        return len(self.names)
+
+    def _range_labels(self):
+        labels = []
+        for i, name in enumerate(self.names):
+            if i == len(self.names) - 1:
+                labels.append(f"{name}(≥{self.mins[i]:g})")
+            elif i == 0:
+                labels.append(f"{name}(<{self.mins[i + 1]:g})")
+            else:
+                labels.append(f"{name}({self.mins[i]:g}-{self.maxs[i]:g})")
+        return labels
+
+    def index_of(self, scores, strict=False):
+        """返回每个分数所在分数段的序号（0为最低段），无法匹配为 -1
+
+        strict=False 时只看最低分（低于最低段的归入最低段，与等级判定一致）；
+        strict=True 时分数必须在 [最低分, 最高分] 内，区间重叠时取配置中
+        最先出现的区间（与逐条判断、导出的条件格式一致）。
+        """
+        scores = pd.to_numeric(
+            pd.Series(np.atleast_1d(scores)), errors='coerce'
+        ).to_numpy(dtype=float)
+        if strict:
+            index = np.full(len(scores), -1)
+            for i in self.priority:
+                hit = (index < 0) & (scores >= self.mins[i]) & (
+                    scores <= self.maxs[i])
+                index[hit] = i
+            return index
+        index = np.clip(np.searchsorted(self.mins, scores, side='right') - 1,
+                        0, None)
+        return np.where(~np.isnan(scores), index, -1)
+
+    def levels(self, scores, unknown='未知'):
+        """批量获取等级名称"""
+        index = self.index_of(scores)
+        return np.where(index >= 0, self.names[index], unknown)
+
+    def range_labels(self, scores, unknown='未知'):
+        """批量获取分数段标签，如 "良好(80-89)" """
+        index = self.index_of(scores)
+        return np.where(index >= 0, self.labels[index], unknown)
+
+    def colors_for(self, scores, fallback=None, default=INVALID_SCORE_COLOR):
+        """批量获取背景颜色
+
+        分数不在任何区间内时使用 fallback 分数段表的颜色，
+        无法解析的分数使用 default。
+        """
+        index = self.index_of(scores, strict=True)
+        colors = np.full(len(index), default, dtype=object)
+        matched = index >= 0
+        colors[matched] = self.colors[index[matched]]
+        if fallback is not None:
+            unmatched = index < 0
+            fallback_index = fallback.index_of(scores)
+            use_fallback = unmatched & (fallback_index >= 0)
+            colors[use_fallback] = fallback.colors[fallback_index[use_fallback]]
+        return colors
+
+
+def _settings_key(settings):
+    # 保留配置顺序：区间重叠时先配置的区间优先
+    return json.dumps(settings, ensure_ascii=False)
+
+
+@lru_cache(maxsize=16)
+def _compile_color_settings(key):
+    settings = json.loads(key)
+    return BandTable([
+        {
+            'name': level,
+            'min': float(config['min_score']),
+            'max': float(config['max_score']),
+            'color': config['color']
+        }
+        for level, config in settings.items()
+    ])
+
+
+def color_band_table(color_settings):
+    """编译颜色设置（配置不变时复用已编译的表）"""
+    return _compile_color_settings(_settings_key(color_settings))
+
+
+@lru_cache(maxsize=1)
+def grade_band_table():
+    """由 GRADE_CONFIG 编译的等级分数段表"""
+    return BandTable([
+        {
+            'name': config['name'],
+            'min': float(config['min']),
+            'max': float(config['max']),
+            'color': config['color']
+        }
+        for config in GRADE_CONFIG.values()
+    ])
+
+
+@lru_cache(maxsize=1)
+def default_color_band_table():
+    """默认颜色分数段表（分数不在自定义区间内时的兜底颜色）"""
+    return color_band_table(DEFAULT_COLOR_SETTINGS)
+
+
+@lru_cache(maxsize=4)
+def _load_color_settings_file(config_file, mtime):
+    with open(config_file, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def load_color_settings():
+    """从文件加载颜色设置（文件未修改时不重复读取）"""
+    try:
+        config_file = COLOR_SETTINGS_FILE
+        if os.path.exists(config_file):
+            content = _load_color_settings_file(
+                config_file, os.path.getmtime(config_file))
+            return json.loads(content)
+    except Exception:
+        pass
+
+    # 返回默认配置
+    return json.loads(json.dumps(DEFAULT_COLOR_SETTINGS))
+
+
+def get_score_colors(scores, color_settings):
+    """批量根据分数获取对应的背景颜色"""
+    return color_band_table(color_settings).colors_for(
+        scores, fallback=default_color_band_table())
+
+
+def get_score_color(score, color_settings):
+    """根据分数获取对应的背景颜色"""
+    return get_score_colors([score], color_settings)[0]
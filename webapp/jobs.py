@@ -0,0 +1,318 @@
+"""
+后台任务模块
+在后台线程中执行批量导入，实时发布进度，任务状态记录在数据库中
+"""
+
+import json
+import os
+import queue
+import re
+import shutil
+import threading
+import time
+from webapp.batch_import import DiskFile, import_excel_files
+
+# 任务状态
+JOB_STATUS = {
+    'QUEUED': 'queued',
+    'RUNNING': 'running',
+    'COMPLETED': 'completed',
+    'CANCELLED': 'cancelled',
+    'FAILED': 'failed',
+}
+
+# 未结束的任务状态
+ACTIVE_STATUSES = (JOB_STATUS['QUEUED'], JOB_STATUS['RUNNING'])
+
+STAGE_LABELS = {
+    'parse': '解析文件',
+    'students': '处理学生信息',
+    'scores': '写入成绩',
+}
+
+# 上传文件暂存目录（与数据库同目录），任务中断后可据此恢复
+SPOOL_DIR_NAME = 'import_spool'
+MANIFEST_FILE = 'manifest.json'
+
+
+class ImportJob:
+    """一个导入任务的实时状态（由后台线程更新，页面读取快照）"""
+
+    def __init__(self, job_id, files, options, results=None):
+        self.id = job_id
+        self.files = files
+        self.options = options
+        self.results = results or [None] * len(files)
+        self.cancel_event = threading.Event()
+        self.status = JOB_STATUS['QUEUED']
+        self.stage = None
+        self.current_file = None
+        self.rows_done = 0
+        self.rows_per_sec = 0.0
+        self.error = None
+        self._finished_rows = 0
+        self._started = None
+        self._lock = threading.Lock()
+
+    @property
+    def done_files(self):
+        return sum(result is not None for result in self.results)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'id': self.id,
+                'status': self.status,
+                'stage': self.stage,
+                'current_file': self.current_file,
+                'total_files': len(self.files),
+                'done_files': self.done_files,
+                'rows_done': self.rows_done,
+                'rows_per_sec': self.rows_per_sec,
+                'results': list(self.results),
+                'error': self.error,
+            }
+
+
+def _safe_file_name(name):
+    return re.sub(r'[\\/:*?"<>|]', '_', os.path.basename(name))
+
+
+class ImportJobManager:
+    """导入任务管理器
+
+    任务按提交顺序由单个后台线程执行（数据库只有一个写入者），页面通过
+    get() 轮询进度。上传文件先写入暂存目录，进程重启后未结束的任务会从
+    未完成的文件继续执行。
+    """
+
+    def __init__(self, analyzer, spool_dir=None):
+        self.analyzer = analyzer
+        self.db = analyzer.db
+        self.spool_dir = spool_dir or os.path.join(
+            os.path.dirname(os.path.abspath(self.db.db_path)), SPOOL_DIR_NAME)
+        self._jobs = {}
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self.resume_pending()
+
+    def submit(self, uploaded_files, require_student_id=True,
+               auto_generate_id=False, delta=False, remove_missing=False,
+               workbook=False):
+        """提交导入任务，返回任务ID"""
+        options = {
+            'require_student_id': require_student_id,
+            'auto_generate_id': auto_generate_id,
+            'delta': delta,
+            'remove_missing': remove_missing,
+            'workbook': workbook,
+        }
+        job_id = self.db.create_import_job(
+            json.dumps(options), len(uploaded_files))
+
+        # 暂存上传文件
+        job_dir = self._job_dir(job_id)
+        os.makedirs(job_dir, exist_ok=True)
+        files = []
+        for index, uploaded_file in enumerate(uploaded_files):
+            path = os.path.join(
+                job_dir, f"{index:03d}_{_safe_file_name(uploaded_file.name)}")
+            data = (uploaded_file.getvalue()
+                    if hasattr(uploaded_file, 'getvalue')
+                    else uploaded_file.read())
+            with open(path, 'wb') as f:
+                f.write(data)
+            files.append(DiskFile(path, uploaded_file.name))
+        with open(os.path.join(job_dir, MANIFEST_FILE), 'w',
+                  encoding='utf-8') as f:
+            json.dump(
+                [{'path': os.path.basename(file.path), 'name': file.name}
+                 for file in files],
+                f, ensure_ascii=False
+            )
+
+        self._enqueue(ImportJob(job_id, files, options))
+        return job_id
+
+    def cancel(self, job_id):
+        """请求取消任务（当前文件回滚，已完成的文件保留）"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            return False
+        job.cancel_event.set()
+        return True
+
+    def get(self, job_id):
+        """获取任务状态快照，不在内存中的任务从数据库读取"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            return job.snapshot()
+
+        row = self.db.get_import_job(job_id)
+        if row.empty:
+            return None
+        row = row.iloc[0]
+        return {
+            'id': int(row['id']),
+            'status': row['status'],
+            'stage': row['stage'],
+            'current_file': row['current_file'],
+            'total_files': int(row['total_files']),
+            'done_files': int(row['done_files']),
+            'rows_done': int(row['rows_done']),
+            'rows_per_sec': float(row['rows_per_sec']),
+            'results': [
+                tuple(result) if result is not None else None
+                for result in json.loads(row['results'] or '[]')
+            ],
+            'error': row['error'],
+        }
+
+    def active_job_id(self):
+        """返回正在排队或执行的最早任务ID，没有时返回 None"""
+        with self._lock:
+            active = [
+                job.id for job in self._jobs.values()
+                if job.status in ACTIVE_STATUSES
+            ]
+        return min(active) if active else None
+
+    def resume_pending(self):
+        """恢复数据库中未结束的任务（进程重启后调用）"""
+        try:
+            jobs = self.db.get_import_jobs(statuses=ACTIVE_STATUSES)
+        except Exception as e:
+            print(f"读取未完成的导入任务失败: {e}")
+            return
+
+        for _, row in jobs.sort_values('id').iterrows():
+            job_id = int(row['id'])
+            with self._lock:
+                if job_id in self._jobs:
+                    continue
+            job_dir = self._job_dir(job_id)
+            try:
+                with open(os.path.join(job_dir, MANIFEST_FILE),
+                          encoding='utf-8') as f:
+                    manifest = json.load(f)
+            except (OSError, ValueError):
+                self.db.update_import_job(
+                    job_id, status=JOB_STATUS['FAILED'],
+                    error="暂存文件丢失，无法恢复")
+                continue
+
+            files = [
+                DiskFile(os.path.join(job_dir, item['path']), item['name'])
+                for item in manifest
+            ]
+            results = [
+                tuple(result) if result is not None else None
+                for result in json.loads(row['results'] or '[]')
+            ]
+            results += [None] * (len(files) - len(results))
+            print(f"恢复导入任务 {job_id}：已完成 {len(files) - results.count(None)}/{len(files)} 个文件")
+            self._enqueue(ImportJob(
+                job_id, files, json.loads(row['options'] or '{}'), results))
+
+    def _job_dir(self, job_id):
+        return os.path.join(self.spool_dir, str(int(job_id)))
+
+    def _enqueue(self, job):
+        with self._lock:
+            self._jobs[job.id] = job
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._work, name='import-jobs', daemon=True)
+                self._worker.start()
+        self._queue.put(job)
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            try:
+                self._run(job)
+            except Exception as e:
+                print(f"导入任务 {job.id} 执行失败: {e}")
+                with job._lock:
+                    job.status = JOB_STATUS['FAILED']
+                    job.error = str(e)
+                self._save(job)
+            finally:
+                self._queue.task_done()
+
+    def _run(self, job):
+        if job.cancel_event.is_set():
+            with job._lock:
+                job.status = JOB_STATUS['CANCELLED']
+            self._save(job)
+            return
+
+        with job._lock:
+            job.status = JOB_STATUS['RUNNING']
+            job._started = time.time()
+        self._save(job)
+
+        # 只处理尚未完成的文件（恢复的任务跳过已完成部分）
+        remaining = [
+            index for index, result in enumerate(job.results) if result is None
+        ]
+        files = [job.files[index] for index in remaining]
+
+        def progress(position, stage, rows):
+            with job._lock:
+                if stage == 'parse':
+                    job._finished_rows = job.rows_done
+                job.stage = stage
+                job.current_file = files[position].name
+                job.rows_done = job._finished_rows + rows
+                elapsed = time.time() - job._started
+                if elapsed > 0:
+                    job.rows_per_sec = job.rows_done / elapsed
+
+        def on_result(position, result):
+            with job._lock:
+                job.results[remaining[position]] = result
+            # 文件事务已提交，此时写入任务状态
+            self._save(job)
+
+        import_excel_files(
+            self.analyzer,
+            files,
+            require_student_id=job.options.get('require_student_id', True),
+            auto_generate_id=job.options.get('auto_generate_id', False),
+            on_result=on_result,
+            progress=progress,
+            cancel_event=job.cancel_event,
+            delta=job.options.get('delta', False),
+            remove_missing=job.options.get('remove_missing', False),
+            workbook=job.options.get('workbook', False)
+        )
+
+        with job._lock:
+            job.stage = None
+            job.current_file = None
+            job.status = (JOB_STATUS['CANCELLED'] if job.cancel_event.is_set()
+                          else JOB_STATUS['COMPLETED'])
+        self._save(job)
+        shutil.rmtree(self._job_dir(job.id), ignore_errors=True)
+
+    def _save(self, job):
+        """将任务状态写入数据库（只在文件事务之外调用）"""
+        state = job.snapshot()
+        try:
+            self.db.update_import_job(
+                job.id,
+                status=state['status'],
+                stage=state['stage'],
+                done_files=state['done_files'],
+                current_file=state['current_file'],
+                rows_done=state['rows_done'],
+                rows_per_sec=state['rows_per_sec'],
+                results=json.dumps(state['results'], ensure_ascii=False),
+                error=state['error']
+            )
+        except Exception as e:
+            print(f"保存导入任务状态失败: {e}")
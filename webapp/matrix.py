@@ -0,0 +1,226 @@
+"""
+成绩矩阵模块
+维护 学生×考试 的宽表成绩矩阵（物化视图），避免每次分析都重新透视
+"""
+
+import threading
+import numpy as np
+import pandas as pd
+
+
+class ScoreMatrix:
+    """学生×考试成绩矩阵
+
+    矩阵与数据库的数据版本号绑定：写入成绩时通过提交回调增量更新，
+    其他写入（改名、删除考试、修改学生等）使版本号失配，下次读取时整体重建。
+    """
+
+    def __init__(self, db_manager):
+        self.db = db_manager
+        self._lock = threading.RLock()
+        self._version = None
+        # 成绩数组：行对应 _students，列对应 _exams，缺考为 NaN
+        self._values = np.empty((0, 0), dtype=float)
+        # 学生信息：index 为学生主键
+        self._students = pd.DataFrame(
+            columns=['student_id', 'name', 'class_id'])
+        # 考试信息：index 为考试主键
+        self._exams = pd.DataFrame(columns=['exam_name', 'upload_time'])
+
+    @property
+    def version(self):
+        """矩阵对应的数据版本号（None 表示需要重建）"""
+        return self._version
+
+    def invalidate(self):
+        """标记矩阵失效，下次读取时重建"""
+        with self._lock:
+            self._version = None
+
+    def refresh(self):
+        """数据版本变化时重建矩阵"""
+        version = self.db.get_data_version()
+        with self._lock:
+            if self._version != version:
+                self.rebuild()
+
+    def rebuild(self):
+        """从数据库整体重建矩阵（只做一次透视）"""
+        with self._lock:
+            conn = self.db.get_connection()
+            own_snapshot = not conn.in_transaction
+            try:
+                # 在同一个读快照中读取版本号与数据
+                if own_snapshot:
+                    conn.execute('BEGIN')
+                version = conn.execute(
+                    "SELECT value FROM app_meta WHERE key = 'data_version'"
+                ).fetchone()[0]
+                students = pd.read_sql_query(
+                    'SELECT id, student_id, name, class_id FROM students',
+                    conn, index_col='id'
+                )
+                exams = pd.read_sql_query(
+                    'SELECT id, exam_name, upload_time FROM exams',
+                    conn, index_col='id'
+                )
+                scores = pd.read_sql_query(
+                    'SELECT student_id, exam_id, score FROM scores',
+                    conn
+                )
+            finally:
+                if own_snapshot:
+                    conn.rollback()
+                self.db.close_connection(conn)
+
+            values = np.full((len(students), len(exams)), np.nan)
+            if not scores.empty:
+                rows = students.index.get_indexer(scores['student_id'])
+                cols = exams.index.get_indexer(scores['exam_id'])
+                # 孤立成绩（学生或考试已不存在）不进入矩阵
+                valid = (rows >= 0) & (cols >= 0)
+                values[rows[valid], cols[valid]] = pd.to_numeric(
+                    scores['score'], errors='coerce').to_numpy()[valid]
+
+            self._students = students
+            self._exams = exams
+            self._values = values
+            self._version = version
+
+    def apply_changes(self, old_version, new_version, upserts=(), deletes=()):
+        """在成绩写入提交后增量更新矩阵
+
+        upserts 为 (学生主键, 考试主键, 成绩) 序列，deletes 为
+        (学生主键, 考试主键) 序列。同一事务的多个回调共享版本号，矩阵已处于
+        new_version 时重复写入相同的值不影响结果；矩阵版本与两者都不一致时
+        说明期间有其他写入，此时只标记失效。
+        """
+        with self._lock:
+            if self._version is None or \
+                    self._version not in (old_version, new_version):
+                self._version = None
+                return
+
+            upserts = pd.DataFrame(
+                list(upserts), columns=['student_id', 'exam_id', 'score'])
+            deletes = pd.DataFrame(
+                list(deletes), columns=['student_id', 'exam_id'])
+            touched_exams = pd.concat(
+                [upserts['exam_id'], deletes['exam_id']]).unique().tolist()
+            new_students = [
+                pk for pk in upserts['student_id'].unique().tolist()
+                if pk not in self._students.index
+            ]
+
+            try:
+                self._load_rows(new_students, touched_exams)
+            except Exception as e:
+                print(f"增量更新成绩矩阵失败，将在下次读取时重建: {e}")
+                self._version = None
+                return
+
+            if not upserts.empty:
+                rows = self._students.index.get_indexer(upserts['student_id'])
+                cols = self._exams.index.get_indexer(upserts['exam_id'])
+                if (rows < 0).any() or (cols < 0).any():
+                    self._version = None
+                    return
+                self._values[rows, cols] = pd.to_numeric(
+                    upserts['score'], errors='coerce').to_numpy()
+            if not deletes.empty:
+                rows = self._students.index.get_indexer(deletes['student_id'])
+                cols = self._exams.index.get_indexer(deletes['exam_id'])
+                valid = (rows >= 0) & (cols >= 0)
+                self._values[rows[valid], cols[valid]] = np.nan
+
+            self._version = new_version
+
+    def _load_rows(self, student_pks, exam_pks):
+        """补充新学生行，并刷新本次涉及的考试信息（可能新增列）"""
+        if student_pks:
+            placeholders = ','.join(['?' for _ in student_pks])
+            students = self.db.execute_query(
+                'SELECT id, student_id, name, class_id FROM students '
+                f'WHERE id IN ({placeholders})',
+                [int(pk) for pk in student_pks]
+            ).set_index('id')
+            self._students = pd.concat([self._students, students])
+            self._values = np.vstack([
+                self._values,
+                np.full((len(students), self._values.shape[1]), np.nan)
+            ])
+
+        if exam_pks:
+            placeholders = ','.join(['?' for _ in exam_pks])
+            exams = self.db.execute_query(
+                'SELECT id, exam_name, upload_time FROM exams '
+                f'WHERE id IN ({placeholders})',
+                [int(pk) for pk in exam_pks]
+            ).set_index('id')
+            known = exams.index.isin(self._exams.index)
+            # 已有考试原位更新信息（名称、上传时间可能在同一事务中被修改）
+            self._exams.loc[exams.index[known]] = exams[known]
+            if (~known).any():
+                self._exams = pd.concat([self._exams, exams[~known]])
+                self._values = np.hstack([
+                    self._values,
+                    np.full((self._values.shape[0], int((~known).sum())),
+                            np.nan)
+                ])
+
+    def frame(self, exam_ids=None):
+        """以 DataFrame 返回矩阵（行为学生主键，列为考试主键）"""
+        self.refresh()
+        with self._lock:
+            matrix = pd.DataFrame(
+                self._values,
+                index=self._students.index.copy(),
+                columns=self._exams.index.copy()
+            )
+        if exam_ids is not None:
+            matrix = matrix[list(exam_ids)]
+        return matrix
+
+    def snapshot(self):
+        """返回 (数据版本号, 成绩数组副本, 学生信息, 考试信息)，三者互相对应"""
+        self.refresh()
+        with self._lock:
+            return (self._version, self._values.copy(),
+                    self._students.copy(), self._exams.copy())
+
+    def select(self, exam_names, class_ids=None):
+        """按考试名称切片，返回与逐行透视相同格式的宽表
+
+        列为 student_id、name 以及按名称排序的考试列，只保留在所选考试中
+        至少有一次成绩的学生，按学号、姓名排序。class_ids 不为 None 时只
+        保留这些班级的学生。
+        """
+        self.refresh()
+        with self._lock:
+            cols = np.flatnonzero(
+                self._exams['exam_name'].isin(list(exam_names)).to_numpy())
+            values = self._values[:, cols]
+            # 与透视结果一致：去掉无人有成绩的考试列和无成绩的学生行
+            present = ~np.isnan(values)
+            if class_ids is not None:
+                present &= self._students['class_id'].isin(
+                    list(class_ids)).to_numpy()[:, None]
+            keep_cols = present.any(axis=0)
+            cols = cols[keep_cols]
+            values = values[:, keep_cols]
+            rows = np.flatnonzero(present[:, keep_cols].any(axis=1))
+            if len(rows) == 0:
+                return pd.DataFrame()
+
+            names = self._exams['exam_name'].to_numpy()[cols]
+            students = self._students.iloc[rows][['student_id', 'name']]
+            order = np.argsort(names, kind='stable')
+            scores = pd.DataFrame(
+                values[rows][:, order], columns=names[order].tolist())
+
+        result = pd.concat(
+            [students.reset_index(drop=True), scores], axis=1)
+        result = result.sort_values(
+            ['student_id', 'name'], kind='mergesort', ignore_index=True)
+        result.columns.name = 'exam_name'
+        return result
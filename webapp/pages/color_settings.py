@@ -6,6 +6,14 @@
 import streamlit as st
 import json
 import os
+# 颜色设置的读取与分数映射由 grading 模块提供，这里保留原有导入路径
+from webapp.grading import load_color_settings, get_score_color  # noqa: F401
+from webapp.config import DEFAULT_COLOR_SETTINGS
+
+
+def _default_color_settings():
+    """默认颜色配置的副本（页面修改不影响 config 中的默认值）"""
+    return json.loads(json.dumps(DEFAULT_COLOR_SETTINGS))
 
 
 def show_color_settings_page():
@@ -13,26 +21,9 @@ def show_color_settings_page():
     st.header("🎨 颜色设置")
     st.markdown("自定义不同分数区间的背景颜色，用于成绩详情表格的显示")
 
-    # 默认颜色配置
-    default_colors = {
-        "优秀": {"min_score": 90, "max_score": 150, "color": "#90EE90", "description": "90分及以上"},
-        "良好": {"min_score": 80, "max_score": 89, "color": "#87CEEB", "description": "80-89分"},
-        "中等": {"min_score": 70, "max_score": 79, "color": "#F0E68C", "description": "70-79分"},
-        "及格": {"min_score": 60, "max_score": 69, "color": "#FFB6C1", "description": "60-69分"},
-        "不及格": {"min_score": 0, "max_score": 59, "color": "#FFA07A", "description": "60分以下"}
-    }
-
     # 从session_state或文件加载颜色配置
     if 'color_settings' not in st.session_state:
-        # 根据全局最高分生成默认配置
-        default_max_score = 150  # 默认最高分
-        st.session_state.color_settings = {
-            "优秀": {"min_score": 90, "max_score": default_max_score, "color": "#90EE90", "description": "90分及以上"},
-            "良好": {"min_score": 80, "max_score": 89, "color": "#87CEEB", "description": "80-89分"},
-            "中等": {"min_score": 70, "max_score": 79, "color": "#F0E68C", "description": "70-79分"},
-            "及格": {"min_score": 60, "max_score": 69, "color": "#FFB6C1", "description": "60-69分"},
-            "不及格": {"min_score": 0, "max_score": 59, "color": "#FFA07A", "description": "60分以下"}
-        }
+        st.session_state.color_settings = _default_color_settings()
 
     # 颜色选择器
     st.subheader("📊 分数区间颜色设置")
@@ -169,7 +160,7 @@ def show_color_settings_page():
 
     with col1:
         if st.button("🔄 重置为默认", type="secondary"):
-            st.session_state.color_settings = default_colors.copy()
+            st.session_state.color_settings = _default_color_settings()
             st.success("✅ 已重置为默认颜色设置")
             st.rerun()
 
@@ -232,49 +223,3 @@ def save_color_settings(colors):
     except Exception as e:
         st.error(f"保存配置文件失败：{str(e)}")
         return False
-
-
-def load_color_settings():
-    """从文件加载颜色设置"""
-    try:
-        config_file = os.path.join("config", "color_settings.json")
-        if os.path.exists(config_file):
-            with open(config_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-    except Exception:
-        pass
-
-    # 返回默认配置
-    return {
-        "优秀": {"min_score": 90, "max_score": 150, "color": "#90EE90", "description": "90分及以上"},
-        "良好": {"min_score": 80, "max_score": 89, "color": "#87CEEB", "description": "80-89分"},
-        "中等": {"min_score": 70, "max_score": 79, "color": "#F0E68C", "description": "70-79分"},
-        "及格": {"min_score": 60, "max_score": 69, "color": "#FFB6C1", "description": "60-69分"},
-        "不及格": {"min_score": 0, "max_score": 59, "color": "#FFA07A", "description": "60分以下"}
-    }
-
-
-def get_score_color(score, color_settings):
-    """根据分数获取对应的背景颜色"""
-    try:
-        score = float(score)
-        for level, config in color_settings.items():
-            if config['min_score'] <= score <= config['max_score']:
-                return config['color']
-
-        # 如果没有匹配到任何区间，返回默认颜色
-        # 根据分数范围返回合适的默认颜色
-        if score >= 90:
-            return "#90EE90"  # 浅绿色
-        elif score >= 80:
-            return "#87CEEB"  # 浅蓝色
-        elif score >= 70:
-            return "#F0E68C"  # 浅黄色
-        elif score >= 60:
-            return "#FFB6C1"  # 浅粉色
-        else:
-            return "#FFA07A"  # 浅橙色
-
-    except (ValueError, TypeError) as e:
-        print(f"处理分数 {score} 时出错: {e}")
-        return "#F0F0F0"  # 浅灰色作为错误情况的默认色
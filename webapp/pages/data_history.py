@@ -4,7 +4,8 @@
 """
 
 import streamlit as st
-from webapp.pages.color_settings import get_score_color, load_color_settings
+from webapp.pages.color_settings import load_color_settings
+from webapp.pages.styled_table import show_score_table
 
 
 def show_data_history_page(analyzer, exams_df):
@@ -201,70 +202,54 @@ def show_data_history_page(analyzer, exams_df):
                 # 获取考试详情
                 exam_detail = analyzer.get_exam_detail(selected_exam)
                 if exam_detail:
+                    stats = exam_detail['stats']
+                    scores_df = exam_detail['scores']
+
                     # 考试基本信息
                     st.markdown(f"**考试名称**: {selected_exam}")
-                    st.markdown(f"**学生数量**: {len(exam_detail)} 人")
-
-                    # 成绩统计
-                    scores = []
-                    for score in exam_detail:
-                        try:
-                            scores.append(float(score['score']))
-                        except Exception:
-                            pass
-
-                    if scores:
-                        avg_score = sum(scores) / len(scores)
-                        max_score = max(scores)
-                        min_score = min(scores)
+                    st.markdown(f"**学生数量**: {len(scores_df)} 人")
 
+                    # 成绩统计（来自 exam_stats，随成绩写入维护）
+                    if stats['score_count'] > 0:
                         col1, col2, col3, col4 = st.columns(4)
                         with col1:
-                            st.metric("平均分", f"{avg_score:.1f}")
+                            st.metric("平均分", f"{stats['mean']:.1f}")
                         with col2:
-                            st.metric("最高分", f"{max_score}")
+                            st.metric("最高分", f"{stats['max']:g}")
                         with col3:
-                            st.metric("最低分", f"{min_score}")
+                            st.metric("最低分", f"{stats['min']:g}")
                         with col4:
-                            st.metric("参与人数", f"{len(scores)}")
+                            st.metric("参与人数", f"{int(stats['score_count'])}")
 
-                        # 成绩分布与等级分布图已移除
+                        col1, col2, col3, col4 = st.columns(4)
+                        with col1:
+                            st.metric("标准差", f"{stats['std']:.1f}")
+                        with col2:
+                            st.metric("下四分位数", f"{stats['q1']:.1f}")
+                        with col3:
+                            st.metric("中位数", f"{stats['median']:.1f}")
+                        with col4:
+                            st.metric("上四分位数", f"{stats['q3']:.1f}")
 
-                        # 详细成绩列表
+                        # 详细成绩列表（已按成绩降序）
                         st.markdown("#### 📋 详细成绩列表")
-                        score_data = []
-                        for score in exam_detail:
-                            score_data.append({
-                                "学号": score['student_id'],
-                                "学生姓名": score['student_name'],
-                                "成绩": round(float(score['score']), 1)  # 保留1位小数
-                            })
-
-                        # 按成绩排序
-                        score_data.sort(key=lambda x: x['成绩'], reverse=True)
-
-                        # 显示成绩表格，应用颜色设置
                         import pandas as pd
-                        score_df = pd.DataFrame(score_data)
+                        score_df = pd.DataFrame({
+                            "学号": scores_df['student_id'],
+                            "学生姓名": scores_df['student_name'],
+                            # 保留1位小数
+                            "成绩": pd.to_numeric(
+                                scores_df['score'], errors='coerce').round(1)
+                        }).dropna(subset=['成绩']).reset_index(drop=True)
 
                         # 加载颜色设置
                         color_settings = load_color_settings()
 
-                        # 为每行添加背景颜色
-                        def highlight_row(row):
-                            score = row['成绩']
-                            bg_color = get_score_color(score, color_settings)
-                            return [
-                                f'background-color: {bg_color}' for _ in row
-                            ]
-
-                        # 应用样式并显示表格
-                        styled_df = score_df.style.apply(
-                            highlight_row, axis=1
-                        ).format({
-                            "成绩": "{:.1f}"
-                        })
-                        st.dataframe(styled_df, use_container_width=True)
+                        # 按成绩整表着色显示（大表自动分页）
+                        show_score_table(
+                            score_df, '成绩', color_settings,
+                            key='exam_detail_table'
+                        )
 
                         # 显示颜色说明
                         st.markdown("**颜色说明：**")
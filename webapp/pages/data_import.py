@@ -3,12 +3,18 @@
 处理Excel文件上传和数据导入功能
 """
 
+import time
 import streamlit as st
+from webapp.analyzer import read_score_file, read_workbook
 from webapp.config import UPLOAD_CONFIG
-import os
+from webapp.jobs import ACTIVE_STATUSES, JOB_STATUS, STAGE_LABELS
+from webapp.validation import rejection_report, report_csv_bytes
 
+# 导入任务进度的刷新间隔（秒）
+JOB_POLL_INTERVAL = 1
 
-def show_data_import_page(analyzer):
+
+def show_data_import_page(analyzer, job_manager):
     """显示数据导入页面"""
     st.header("📁 数据导入")
 
@@ -31,7 +37,9 @@ def show_data_import_page(analyzer):
 
         **注意事项：**
         - 学号必须唯一，避免同名学生数据混乱
-        - 成绩必须是数字，支持小数
+        - 成绩必须是数字，支持小数，且不超过满分（可用“满分”列指定，默认 150 分）
+        - 学号为空、成绩无法识别或超出范围、学号重复的行不会导入，
+          可先点击“校验文件”下载未通过校验的行
         - 文件第一行应该是字段标题
         - 支持.xlsx和.xls格式
         """)
@@ -68,6 +76,43 @@ def show_data_import_page(analyzer):
             help="如果没有学号列，自动生成学号（格式：ST001, ST002...）"
         )
 
+    col1, col2 = st.columns(2)
+    with col1:
+        delta = st.checkbox(
+            "增量更新已有考试",
+            value=False,
+            help="重新导入已有考试时按学号比对，只写入新增和修改的成绩"
+        )
+
+    with col2:
+        remove_missing = st.checkbox(
+            "删除文件中没有的成绩",
+            value=False,
+            disabled=not delta,
+            help="增量更新时，删除该考试中文件里已不存在的学生成绩"
+        )
+        remove_missing = delta and remove_missing
+
+    workbook = st.checkbox(
+        "多工作表 / 多科目工作簿",
+        value=False,
+        help="读取所有工作表（如每个班级一个工作表，以工作表名作为班级），"
+             "语文、数学、英语等科目列分别导入为“文件名_科目”考试"
+    )
+
+    # 后台导入任务：有未结束的任务时只显示进度（刷新页面后仍可找回）
+    job_id = st.session_state.get('import_job_id') or job_manager.active_job_id()
+    if job_id is not None:
+        st.session_state['import_job_id'] = job_id
+        job = job_manager.get(job_id)
+        if job is not None and job['status'] in ACTIVE_STATUSES:
+            _show_job_monitor(job_manager, job_id)
+            return
+        # 任务已结束：显示一次导入结果
+        st.session_state.pop('import_job_id', None)
+        if job is not None:
+            _show_job_results(job)
+
     # 检查是否已经处理过文件
     if 'files_processed' in st.session_state and st.session_state['files_processed']:
         st.success("✅ 文件已处理完成！如需重新导入，请刷新页面。")
@@ -107,91 +152,190 @@ def show_data_import_page(analyzer):
                 tuple(UPLOAD_CONFIG['ALLOWED_TYPES'])) else "📄")
             st.write(f"{file_icon} {i+1}. {file.name}")
 
-        # 自动导入所有Excel文件
+        # 导入所有Excel文件
         if excel_count > 0:
             st.subheader("🚀 自动导入")
-            # 检查是否正在导入
-            if 'importing' not in st.session_state:
-                st.session_state['importing'] = False
-
-            if not st.session_state['importing']:
-                if st.button("🚀 开始导入", type="primary"):
-                    st.session_state['importing'] = True
-                    st.rerun()
-            else:
-                st.info(f"检测到 {excel_count} 个Excel文件，正在自动导入...")
-
-                # 自动导入
-                with st.spinner("正在批量导入..."):
-                    success_count = 0
-                    skip_files = []
-                    error_messages = []
-
-                    # 只处理Excel文件
-                    excel_files = [
-                        f for f in uploaded_files
-                        if f.name.endswith(tuple(UPLOAD_CONFIG['ALLOWED_TYPES']))
-                    ]
-
-                    # 预检查：已存在考试跳过
-                    files_to_import = []
-                    for file in excel_files:
-                        exam_name = os.path.splitext(file.name)[0]
-                        try:
-                            existing_exam = analyzer.db.get_exam_by_name(exam_name)
-                            if existing_exam is not None and not existing_exam.empty:
-                                skip_files.append(file.name)
-                            else:
-                                files_to_import.append(file)
-                        except Exception:
-                            # 若检查失败，谨慎起见仍加入导入列表
-                            files_to_import.append(file)
-
-                    if skip_files:
-                        st.warning("以下考试已存在，已跳过导入：")
-                        for name in skip_files:
-                            st.warning(f"- {name}")
-
-                    # 执行导入（仅新考试）
-                    for file in files_to_import:
-                        success, message = analyzer.process_excel_file(
-                            file,
-                            require_student_id=require_student_id,
-                            auto_generate_id=auto_generate_id
-                        )
-                        if success:
-                            success_count += 1
-                        else:
-                            error_messages.append(f"{file.name}: {message}")
-
-                    total = len(excel_files)
-                    skipped = len(skip_files)
-                    imported = len(files_to_import)
-
-                    # 显示导入结果
-                    if imported == 0 and skipped > 0 and not error_messages:
-                        st.info(f"ℹ️ 所有 {total} 个文件对应的考试均已存在，全部跳过导入。")
-                        st.session_state['files_processed'] = True
-                        st.session_state['importing'] = False
-                    elif success_count == imported and not error_messages:
-                        st.success(f"✅ 导入完成：成功 {success_count} 个，跳过 {skipped} 个。")
-                        st.session_state['files_processed'] = True
-                        st.session_state['importing'] = False
-                    elif success_count > 0 or skipped > 0:
-                        st.warning(
-                            f"⚠️ 导入部分完成：成功 {success_count} 个，跳过 {skipped} 个，失败 {len(error_messages)} 个。")
-                        if error_messages:
-                            st.error("❌ 导入失败的文件：")
-                            for error in error_messages:
-                                st.error(error)
-                        st.session_state['files_processed'] = True
-                        st.session_state['importing'] = False
-                    else:
-                        st.error("❌ 所有Excel文件导入失败")
-                        for error in error_messages:
-                            st.error(error)
-                        st.session_state['importing'] = False
+            # 只处理Excel文件
+            excel_files = [
+                f for f in uploaded_files
+                if f.name.endswith(tuple(UPLOAD_CONFIG['ALLOWED_TYPES']))
+            ]
+
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                start = st.button("🚀 开始导入", type="primary")
+            with col2:
+                preview = st.button("🔍 预览差异", disabled=not delta)
+            with col3:
+                check = st.button("🧪 校验文件")
+
+            if start:
+                # 提交到后台任务，本次运行立即结束
+                st.session_state['import_job_id'] = job_manager.submit(
+                    excel_files,
+                    require_student_id=require_student_id,
+                    auto_generate_id=auto_generate_id,
+                    delta=delta,
+                    remove_missing=remove_missing,
+                    workbook=workbook
+                )
+                st.rerun()
+
+            if preview:
+                _show_delta_preview(
+                    analyzer, excel_files, require_student_id,
+                    auto_generate_id, remove_missing, workbook)
+
+            if check:
+                _show_validation_report(
+                    excel_files, require_student_id, workbook)
         else:
             st.warning("没有选择Excel文件，请选择包含学生成绩的Excel文件")
     else:
         st.info("请选择Excel文件进行导入")
+
+
+def _show_delta_preview(analyzer, excel_files, require_student_id,
+                        auto_generate_id, remove_missing, workbook=False):
+    """逐个文件试导入并回滚，显示将要写入的成绩差异"""
+    process = analyzer.process_workbook if workbook else analyzer.process_excel_file
+    with st.spinner("正在比对成绩差异..."):
+        for file in excel_files:
+            success, message = process(
+                file,
+                require_student_id=require_student_id,
+                auto_generate_id=auto_generate_id,
+                delta=True,
+                remove_missing=remove_missing,
+                dry_run=True
+            )
+            if success:
+                st.info(f"{file.name}: {message}")
+            else:
+                st.error(f"{file.name}: {message}")
+
+
+def _show_validation_report(excel_files, require_student_id, workbook=False):
+    """只解析与校验文件（不访问数据库），显示并提供下载未通过校验的行"""
+    parsed_files = []
+    with st.spinner("正在校验文件..."):
+        for file in excel_files:
+            if workbook:
+                success, parsed = read_workbook(
+                    file, file.name, require_student_id)
+            else:
+                success, parsed = read_score_file(
+                    file, file.name, require_student_id)
+                if success:
+                    # 流式读取时逐块读完才能得到完整的校验结果
+                    for _ in parsed['frames']:
+                        pass
+            if success:
+                parsed_files.append(parsed)
+            else:
+                st.error(f"{file.name}: {parsed}")
+
+    report = rejection_report(parsed_files)
+    if report.empty:
+        if parsed_files:
+            st.success("✅ 所有数据行均通过校验")
+        return
+
+    st.warning(f"⚠️ {len(report)} 行未通过校验，导入时将跳过这些行：")
+    st.dataframe(report, use_container_width=True, hide_index=True)
+    st.download_button(
+        "📥 下载校验报告",
+        data=report_csv_bytes(report),
+        file_name="校验报告.csv",
+        mime="text/csv"
+    )
+
+
+def _show_job_progress(job_manager, job_id):
+    """显示任务进度，任务结束后刷新整个页面"""
+    job = job_manager.get(job_id)
+    if job is None or job['status'] not in ACTIVE_STATUSES:
+        st.rerun()
+        return
+
+    total = max(job['total_files'], 1)
+    st.info(f"检测到 {job['total_files']} 个Excel文件，正在后台导入...")
+    stage = STAGE_LABELS.get(job['stage'], "等待开始")
+    current = f"：{job['current_file']}" if job['current_file'] else ""
+    st.progress(
+        job['done_files'] / total,
+        text=f"已完成 {job['done_files']}/{job['total_files']} 个文件，{stage}{current}"
+    )
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("已写入行数", f"{job['rows_done']:,}")
+    with col2:
+        st.metric("写入速度", f"{job['rows_per_sec']:,.0f} 行/秒")
+
+    if st.button("⏹️ 取消导入", key=f"cancel_job_{job_id}"):
+        job_manager.cancel(job_id)
+        st.warning("正在取消，当前文件将回滚...")
+
+
+def _show_job_monitor(job_manager, job_id):
+    """轮询显示任务进度（支持局部刷新时只刷新进度区域）"""
+    if hasattr(st, 'fragment'):
+        st.fragment(run_every=JOB_POLL_INTERVAL)(_show_job_progress)(
+            job_manager, job_id)
+    else:
+        _show_job_progress(job_manager, job_id)
+        time.sleep(JOB_POLL_INTERVAL)
+        st.rerun()
+
+
+def _show_job_results(job):
+    """显示已结束任务的导入结果"""
+    results = [result for result in job['results'] if result is not None]
+    skip_files = [
+        f"{name}（{message}）"
+        for name, status, message in results if status == 'skipped'
+    ]
+    success_count = sum(
+        1 for _, status, _ in results if status == 'success')
+    error_messages = [
+        f"{name}: {message}"
+        for name, status, message in results if status == 'error'
+    ]
+
+    if job['status'] == JOB_STATUS['FAILED']:
+        st.error(f"❌ 导入任务失败：{job['error']}")
+    elif job['status'] == JOB_STATUS['CANCELLED']:
+        st.warning(
+            f"⏹️ 导入已取消：已处理 {len(results)}/{job['total_files']} 个文件，"
+            f"未处理的文件未写入。")
+    if not results:
+        return
+
+    if skip_files:
+        st.warning("以下文件内容与已有考试相同，已跳过导入：")
+        for name in skip_files:
+            st.warning(f"- {name}")
+
+    total = job['total_files']
+    skipped = len(skip_files)
+    imported = len(results) - skipped
+
+    # 显示导入结果
+    if imported == 0 and skipped > 0 and not error_messages:
+        st.info(f"ℹ️ 所有 {total} 个文件的内容均已导入过，全部跳过导入。")
+        st.session_state['files_processed'] = True
+    elif success_count == imported and not error_messages:
+        st.success(f"✅ 导入完成：成功 {success_count} 个，跳过 {skipped} 个。")
+        st.session_state['files_processed'] = True
+    elif success_count > 0 or skipped > 0:
+        st.warning(
+            f"⚠️ 导入部分完成：成功 {success_count} 个，跳过 {skipped} 个，失败 {len(error_messages)} 个。")
+        if error_messages:
+            st.error("❌ 导入失败的文件：")
+            for error in error_messages:
+                st.error(error)
+        st.session_state['files_processed'] = True
+    else:
+        st.error("❌ 所有Excel文件导入失败")
+        for error in error_messages:
+            st.error(error)
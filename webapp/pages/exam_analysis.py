@@ -3,15 +3,24 @@
 处理考试成绩分析和可视化功能
 """
 
+import json
 import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime
-import io
-from webapp.pages.color_settings import get_score_color, load_color_settings
-import openpyxl
-from openpyxl.styles import Font, PatternFill
+from webapp.pages.color_settings import load_color_settings
+from webapp.grading import grade_band_table
+from webapp.exam_stats import HISTOGRAM_BIN_WIDTH, compute_exam_stats
+from webapp.pages.styled_table import show_score_table
+from webapp.exporter import export_student_scores
+from webapp.class_rollups import PASS_SCORE, EXCELLENT_SCORE
+from webapp.anomalies import ANOMALY_KINDS
+from webapp.config import ANOMALY_CONFIG
+from webapp.rank_transitions import TOTAL_DELTA_COLUMN, delta_column
+
+# 散点图超过该人数时不再逐点显示姓名（只在悬停时显示）
+SCATTER_LABEL_LIMIT = 60
 
 
 def show_exam_analysis_page(analyzer, exams_df):
@@ -48,10 +57,11 @@ def show_exam_analysis_page(analyzer, exams_df):
             latest_exam = exams_df.iloc[0]['exam_name']
             st.metric("最新考试", latest_exam)
 
-        # 考试列表
+        # 考试列表（统计值来自 exam_stats，每场考试一行）
+        exam_stats = analyzer.get_exam_stats()
         st.subheader("📋 考试列表")
         st.dataframe(
-            exams_df,
+            _exam_list_with_stats(exams_df, exam_stats),
             use_container_width=True,
             hide_index=True
         )
@@ -60,8 +70,19 @@ def show_exam_analysis_page(analyzer, exams_df):
         if selected_exams:
             st.header("📈 成绩分析")
 
+            # 班级筛选（未选择时显示全部学生）
+            class_options = analyzer.get_all_classes()['class_name'].tolist()
+            selected_classes = None
+            if class_options:
+                selected_classes = st.multiselect(
+                    "按班级筛选",
+                    options=class_options,
+                    help="不选择时显示全部学生"
+                ) or None
+
             # 获取学生成绩数据
-            student_scores = analyzer.get_student_scores(selected_exams)
+            student_scores = analyzer.get_student_scores(
+                selected_exams, class_names=selected_classes)
 
             if not student_scores.empty:
                 # 显示成绩表格
@@ -70,38 +91,21 @@ def show_exam_analysis_page(analyzer, exams_df):
                 # 操作提示
                 st.info("💡 **操作提示**：在下方表格中可以多选学生行（按住Ctrl/Cmd键多选），然后查看选中学生的成绩趋势对比图")
 
-                # 加载颜色设置
+                # 加载颜色设置与等级分数段表
                 color_settings = load_color_settings()
-
-                # 为每行添加背景颜色（根据平均分）
-                def highlight_row_by_average(row):
-                    try:
-                        avg_score = float(row['平均分'])
-                        bg_color = get_score_color(avg_score, color_settings)
-                        return [f'background-color: {bg_color}' for _ in row]
-                    except Exception:
-                        return ['background-color: #F0F0F0' for _ in row]
-
-                # 应用样式并显示表格
-                styled_scores = student_scores.style.apply(
-                    highlight_row_by_average, axis=1
-                ).format({
-                    col: "{:.1f}" for col in student_scores.columns
-                    if student_scores[col].dtype in ['float64', 'float32'] and col != 'student_id'
-                })
-
-                # 使用可选择的表格
-                event = st.dataframe(
-                    styled_scores,
-                    use_container_width=True,
-                    hide_index=True,
-                    on_select="rerun",
-                    selection_mode="multi-row"
+                band_table = grade_band_table()
+
+                # 按平均分整表着色（大表自动分页），返回选中的行
+                selected_indices = show_score_table(
+                    student_scores,
+                    '平均分',
+                    color_settings,
+                    key='student_scores_table',
+                    selectable=True
                 )
 
                 # 学生成绩折线图
-                if event and hasattr(event, 'selection') and len(event.selection.rows) > 0:
-                    selected_indices = event.selection.rows
+                if len(selected_indices) > 0:
                     selected_students = student_scores.iloc[selected_indices]
 
                     if len(selected_indices) == 1:
@@ -111,10 +115,7 @@ def show_exam_analysis_page(analyzer, exams_df):
                         st.subheader(f"📈 学生成绩趋势对比 ({len(selected_indices)}人)")
 
                     # 获取考试列
-                    exam_columns = [
-                        col for col in student_scores.columns
-                        if col not in ['student_id', 'name', '平均分', '趋势', '等级']
-                    ]
+                    exam_columns = analyzer.get_exam_columns(student_scores)
 
                     # 检查是否有足够的考试数据
                     valid_students = []
@@ -293,10 +294,7 @@ def show_exam_analysis_page(analyzer, exams_df):
                 st.subheader("📊 统计信息")
 
                 # 获取考试列
-                score_columns = [
-                    col for col in student_scores.columns
-                    if col not in ['student_id', 'name', '平均分', '趋势', '等级']
-                ]
+                score_columns = analyzer.get_exam_columns(student_scores)
 
                 col1, col2 = st.columns(2)
 
@@ -318,6 +316,12 @@ def show_exam_analysis_page(analyzer, exams_df):
                         '及格': '#FFD700',    # 金色
                         '不及格': '#DC143C'   # 深红色
                     }
+                    # 分数段标签沿用等级颜色
+                    band_chart_colors = {
+                        label: level_colors.get(name, '#808080')
+                        for name, label in zip(
+                            band_table.names, band_table.labels)
+                    }
 
                     colors = [level_colors.get(level, '#808080')
                               for level in level_counts.index]
@@ -344,30 +348,13 @@ def show_exam_analysis_page(analyzer, exams_df):
                         # 显示该考试的分数分段分布
                         exam_scores = student_scores[selected_exams[0]].dropna(
                         )
-                        score_ranges = []
-                        for score in exam_scores:
-                            if score >= 90:
-                                score_ranges.append('优秀(≥90)')
-                            elif score >= 80:
-                                score_ranges.append('良好(80-89)')
-                            elif score >= 70:
-                                score_ranges.append('中等(70-79)')
-                            elif score >= 60:
-                                score_ranges.append('及格(60-69)')
-                            else:
-                                score_ranges.append('不及格(<60)')
-
-                        range_counts = pd.Series(score_ranges).value_counts()
+                        range_counts = pd.Series(
+                            band_table.range_labels(exam_scores)
+                        ).value_counts()
                         title = f"分数段分布（{selected_exams[0]}）"
 
                         # 使用分数段颜色
-                        range_colors = {
-                            '优秀(≥90)': '#2E8B57',
-                            '良好(80-89)': '#4169E1',
-                            '中等(70-79)': '#FF8C00',
-                            '及格(60-69)': '#FFD700',
-                            '不及格(<60)': '#DC143C'
-                        }
+                        range_colors = band_chart_colors
 
                         colors = [range_colors.get(r, '#808080')
                                   for r in range_counts.index]
@@ -441,10 +428,7 @@ def show_exam_analysis_page(analyzer, exams_df):
                 # 成绩对比图
                 st.subheader("📊 成绩对比")
                 # 过滤出考试名称列（排除其他统计列）
-                score_columns = [
-                    col for col in student_scores.columns
-                    if col not in ['student_id', 'name', '平均分', '趋势', '等级']
-                ]
+                score_columns = analyzer.get_exam_columns(student_scores)
 
                 if len(score_columns) > 1:
                     # 图表类型选择
@@ -479,20 +463,32 @@ def show_exam_analysis_page(analyzer, exams_df):
                     elif chart_type == "直方图":
                         st.markdown("**📊 直方图说明**：显示成绩分布的频率，更直观地看出成绩集中区间")
 
+                        # 10 分一段直方图（未筛选班级时使用预先统计的结果）
                         fig_comparison = go.Figure()
                         colors = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728']
+                        histograms = _distribution_by_exam(
+                            exam_stats, student_scores, score_columns,
+                            selected_classes, 'histogram')
                         for i, exam in enumerate(score_columns):
-                            valid_scores = student_scores[exam].dropna()
-                            if not valid_scores.empty:
-                                fig_comparison.add_trace(go.Histogram(
-                                    x=valid_scores,
+                            histogram = histograms.get(exam)
+                            if histogram:
+                                starts = [float(start) for start in histogram]
+                                fig_comparison.add_trace(go.Bar(
+                                    x=[start + HISTOGRAM_BIN_WIDTH / 2
+                                       for start in starts],
+                                    y=list(histogram.values()),
+                                    width=HISTOGRAM_BIN_WIDTH,
+                                    customdata=[
+                                        f"{start:g}-{start + HISTOGRAM_BIN_WIDTH:g}"
+                                        for start in starts],
+                                    hovertemplate="%{customdata}分：%{y}人",
                                     name=exam,
                                     opacity=0.7,
-                                    nbinsx=15,
                                     marker_color=colors[i % len(colors)]
                                 ))
                         fig_comparison.update_layout(
-                            title="各次考试成绩分布对比（直方图）",
+                            title="各次考试成绩分布对比（直方图）"
+                            + _class_scope_label(selected_classes),
                             xaxis_title="成绩",
                             yaxis_title="人数",
                             barmode='overlay'
@@ -527,14 +523,21 @@ def show_exam_analysis_page(analyzer, exams_df):
                         valid_data = student_scores[[
                             exam1, exam2, 'name']].dropna()
 
+                        # 人数较多时逐点标注姓名会相互遮挡且拖慢渲染，改为悬停显示
+                        show_labels = len(valid_data) <= SCATTER_LABEL_LIMIT
                         fig_comparison = go.Figure()
                         fig_comparison.add_trace(go.Scatter(
                             x=valid_data[exam1],
                             y=valid_data[exam2],
-                            mode='markers+text',
+                            mode='markers+text' if show_labels else 'markers',
                             text=valid_data['name'],
                             textposition="top center",
-                            marker=dict(size=8, opacity=0.7),
+                            hovertemplate=(
+                                "%{text}<br>" + f"{exam1}: " + "%{x}<br>"
+                                + f"{exam2}: " + "%{y}<extra></extra>"
+                            ),
+                            marker=dict(size=8 if show_labels else 5,
+                                        opacity=0.7),
                             name="学生成绩"
                         ))
 
@@ -561,40 +564,24 @@ def show_exam_analysis_page(analyzer, exams_df):
                     elif chart_type == "分数段对比":
                         st.markdown("**📊 分数段对比说明**：按优秀、良好、中等、及格、不及格分段统计人数")
 
-                        # 定义分数段
-                        def get_score_range(score):
-                            if score >= 90:
-                                return "优秀(90-100)"
-                            elif score >= 80:
-                                return "良好(80-89)"
-                            elif score >= 70:
-                                return "中等(70-79)"
-                            elif score >= 60:
-                                return "及格(60-69)"
-                            else:
-                                return "不及格(<60)"
-
-                        # 统计各考试的分数段分布
-                        range_data = []
-                        for exam in score_columns:
-                            valid_scores = student_scores[exam].dropna()
-                            for score in valid_scores:
-                                range_data.append({
-                                    'exam': exam,
-                                    'range': get_score_range(score),
-                                    'score': score
-                                })
-
-                        range_df = pd.DataFrame(range_data)
-                        range_counts = range_df.groupby(
-                            ['exam', 'range']).size().reset_index(name='count')
+                        # 各考试的分数段人数（分数段从低到高）
+                        bands = _distribution_by_exam(
+                            exam_stats, student_scores, score_columns,
+                            selected_classes, 'bands')
+                        range_counts = pd.DataFrame([
+                            {'exam': exam, 'range': label, 'count': count}
+                            for exam in score_columns
+                            for label, count in bands.get(exam, {}).items()
+                            if count
+                        ], columns=['exam', 'range', 'count'])
 
                         fig_comparison = px.bar(
                             range_counts,
                             x='range',
                             y='count',
                             color='exam',
-                            title="各次考试分数段分布对比",
+                            title="各次考试分数段分布对比"
+                            + _class_scope_label(selected_classes),
                             labels={'count': '人数', 'range': '分数段'},
                             barmode='group'
                         )
@@ -609,79 +596,28 @@ def show_exam_analysis_page(analyzer, exams_df):
                         st.plotly_chart(
                             fig_comparison, use_container_width=True)
 
+                # 班级对比
+                if class_options:
+                    _show_class_comparison(
+                        analyzer, selected_exams, selected_classes)
+
+                # 名次变化
+                if len(score_columns) > 1:
+                    _show_rank_movement(
+                        analyzer, exams_df, score_columns, selected_classes)
+
                 # 导出功能
                 st.subheader("💾 导出结果")
                 if st.button("📥 导出到Excel"):
-                    # 准备导出数据
-                    export_data = student_scores.copy()
-                    # 重新排列列顺序，将学号放在最前面
-                    column_order = ['student_id', 'name'] + [
-                        col for col in export_data.columns if col not in ['student_id', 'name']]
-                    export_data = export_data[column_order]
-                    # 重命名列名为中文
-                    export_data = export_data.rename(columns={
-                        'student_id': '学号',
-                        'name': '姓名'
-                    })
-
-                    # 创建下载链接
-                    output = io.BytesIO()
-
-                    # 使用openpyxl引擎，支持样式设置
-                    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                        # 先导出数据
-                        export_data.to_excel(
-                            writer, sheet_name='成绩分析', index=False
-                        )
-
-                        # 获取工作表对象
-                        worksheet = writer.sheets['成绩分析']
-
-                        # 为每行添加背景颜色
-                        for row_idx, (_, row) in enumerate(
-                            export_data.iterrows(), start=2
-                        ):  # Excel行从2开始（第1行是标题）
-                            try:
-                                avg_score = float(row['平均分'])
-                                bg_color = get_score_color(
-                                    avg_score, color_settings)
-
-                                # 将十六进制颜色转换为RGB
-                                if bg_color.startswith('#'):
-                                    r = int(bg_color[1:3], 16)
-                                    g = int(bg_color[3:5], 16)
-                                    b = int(bg_color[5:7], 16)
-
-                                    # 为整行设置背景颜色
-                                    for col_idx in range(1, len(export_data.columns) + 1):
-                                        cell = worksheet.cell(
-                                            row=row_idx, column=col_idx)
-                                        cell.fill = openpyxl.styles.PatternFill(
-                                            start_color=f"{r:02X}{g:02X}{b:02X}",
-                                            end_color=f"{r:02X}{g:02X}{b:02X}",
-                                            fill_type="solid"
-                                        )
-                            except Exception:
-                                # 如果出错，使用默认颜色
-                                pass
-
-                        # 设置标题行样式
-                        header_fill = PatternFill(
-                            start_color="366092",
-                            end_color="366092",
-                            fill_type="solid"
-                        )
-                        header_font = Font(color="FFFFFF", bold=True)
-
-                        for col_idx in range(1, len(export_data.columns) + 1):
-                            cell = worksheet.cell(row=1, column=col_idx)
-                            cell.fill = header_fill
-                            cell.font = header_font
+                    # 生成带条件格式的工作簿（相同考试/班级/数据/颜色设置直接复用）
+                    excel_data = export_student_scores(
+                        analyzer, selected_exams, color_settings,
+                        class_names=selected_classes
+                    )
 
-                    output.seek(0)
                     st.download_button(
                         label="📥 下载Excel文件",
-                        data=output.getvalue(),
+                        data=excel_data,
                         file_name=(
                             f"学生成绩分析_"
                             f"{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
@@ -697,5 +633,346 @@ def show_exam_analysis_page(analyzer, exams_df):
                 st.warning("没有找到选中考试的成绩数据")
         else:
             st.info("请在考试选择中选择要分析的考试")
+
+        # 需要关注的学生与成绩轨迹（基于全部考试，不受上方考试选择影响）
+        _show_attention_list(analyzer)
+        _show_trajectories(analyzer)
     else:
         st.info("请先导入Excel文件")
+
+
+def _show_class_comparison(analyzer, selected_exams, selected_classes):
+    """班级对比：各班各场考试的平均分、中位数、及格率、优秀率与班级排名"""
+    st.subheader("🏫 班级对比")
+    rollups = analyzer.get_class_rollups(selected_exams, selected_classes)
+    if rollups.empty:
+        st.info("所选班级在所选考试中没有成绩（学生未分班时不参与班级对比）")
+        return
+
+    st.caption(
+        f"及格线 {PASS_SCORE} 分，优秀线 {EXCELLENT_SCORE} 分；"
+        "班级排名按平均分在全部班级中排列"
+    )
+    metric = st.radio(
+        "对比指标",
+        ['平均分', '中位数', '及格率', '优秀率'],
+        horizontal=True,
+        key='class_comparison_metric'
+    )
+    fig_classes = px.bar(
+        rollups,
+        x='class_name',
+        y=metric,
+        color='exam_name',
+        barmode='group',
+        title=f"各班{metric}对比",
+        labels={
+            'class_name': '班级',
+            'exam_name': '考试',
+            metric: f"{metric}（%）" if metric.endswith('率') else metric
+        },
+        hover_data=['人数', '班级排名']
+    )
+    st.plotly_chart(fig_classes, use_container_width=True)
+
+    # 班级 × 考试 排名表
+    rank_table = rollups.pivot(
+        index='class_name', columns='exam_name', values='班级排名'
+    ).reindex(columns=[
+        exam for exam in selected_exams if exam in set(rollups['exam_name'])
+    ])
+    st.markdown("**班级排名**")
+    st.dataframe(rank_table.rename_axis(index='班级', columns=None),
+                 use_container_width=True)
+
+    st.dataframe(
+        rollups.drop(columns='class_id').rename(columns={
+            'class_name': '班级',
+            'exam_name': '考试'
+        }),
+        use_container_width=True,
+        hide_index=True
+    )
+
+
+def _show_rank_movement(analyzer, exams_df, exam_names, selected_classes):
+    """名次变化：两场考试（或按时间顺序的考试链）之间的名次升降与等级转移"""
+    st.subheader("🔀 名次变化")
+    # 所选考试按时间顺序排列（exams_df 为最新在前）
+    chronological = [
+        name for name in exams_df.sort_values(
+            ['upload_time', 'exam_name'])['exam_name']
+        if name in set(exam_names)
+    ]
+    if len(chronological) < 2:
+        return
+
+    scope = "两场考试"
+    if len(chronological) > 2:
+        scope = st.radio(
+            "比较范围", ["两场考试", "全部所选考试（按时间顺序）"],
+            horizontal=True, key='rank_movement_scope')
+    if scope == "两场考试":
+        col1, col2 = st.columns(2)
+        with col1:
+            from_exam = st.selectbox(
+                "起始考试", chronological,
+                index=len(chronological) - 2, key='rank_movement_from')
+        with col2:
+            to_exam = st.selectbox(
+                "对比考试", chronological,
+                index=len(chronological) - 1, key='rank_movement_to')
+        if from_exam == to_exam:
+            st.info("请选择两场不同的考试")
+            return
+        chain = [from_exam, to_exam]
+    else:
+        chain = chronological
+
+    result = analyzer.get_rank_transitions(chain, selected_classes)
+    students = result['students']
+    steps = list(zip(result['exams'], result['exams'][1:]))
+    if students.empty or not steps:
+        st.info("所选考试中没有可比较的成绩")
+        return
+
+    delta = (TOTAL_DELTA_COLUMN if len(result['exams']) > 2
+             else delta_column(*steps[0]))
+    moved = students[students[delta].notna()]
+    st.caption(
+        f"名次为全年级密集排名（同分并列），{delta}为前后两次名次之差，"
+        "正数为进步；只统计两次都有成绩的学生"
+    )
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("可比较学生数", len(moved))
+    with col2:
+        st.metric("名次上升", int((moved[delta] > 0).sum()))
+    with col3:
+        st.metric("名次下降", int((moved[delta] < 0).sum()))
+
+    # 等级转移热力图（矩阵只有 等级数×等级数 格，与人数无关）
+    step = 0
+    if len(steps) > 1:
+        labels = [f"{before} → {after}" for before, after in steps]
+        step = labels.index(st.selectbox(
+            "等级转移", labels, index=len(labels) - 1,
+            key='rank_movement_step'))
+    before, after = steps[step]
+    matrix = result['matrices'][step]
+    fig_transition = go.Figure(go.Heatmap(
+        z=matrix.to_numpy(),
+        x=matrix.columns.tolist(),
+        y=matrix.index.tolist(),
+        text=matrix.to_numpy(),
+        texttemplate="%{text}",
+        colorscale='Blues',
+        hovertemplate=(
+            f"{before}: " + "%{y}<br>" + f"{after}: " + "%{x}<br>"
+            "人数: %{z}<extra></extra>"
+        )
+    ))
+    fig_transition.update_layout(
+        title=f"等级转移（{before} → {after}）",
+        xaxis_title=f"{after} 等级",
+        yaxis_title=f"{before} 等级",
+        yaxis=dict(autorange='reversed')
+    )
+    st.plotly_chart(fig_transition, use_container_width=True)
+
+    # 进步 / 退步最多的学生
+    top_n = int(st.number_input(
+        "显示人数", min_value=5, max_value=100, value=10, step=5,
+        key='rank_movement_top_n'))
+    rename = {'student_id': '学号', 'name': '姓名', 'class_name': '班级'}
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown("**⬆️ 名次上升最多**")
+        st.dataframe(
+            moved[moved[delta] > 0].nlargest(top_n, delta).rename(
+                columns=rename),
+            use_container_width=True, hide_index=True)
+    with col2:
+        st.markdown("**⬇️ 名次下降最多**")
+        st.dataframe(
+            moved[moved[delta] < 0].nsmallest(top_n, delta).rename(
+                columns=rename),
+            use_container_width=True, hide_index=True)
+
+    with st.expander("全部学生的名次变化"):
+        st.dataframe(
+            students.sort_values(
+                delta, ascending=False, na_position='last', kind='mergesort'
+            ).rename(columns=rename),
+            use_container_width=True, hide_index=True)
+
+
+def _show_attention_list(analyzer):
+    """需要关注：成绩骤降与等级下滑的学生（导入成绩后自动更新）"""
+    st.header("⚠️ 需要关注")
+    st.caption(
+        f"成绩骤降：低于本人历史平均分 {ANOMALY_CONFIG['K_SIGMA']:g} 个标准差"
+        f"以上且低于上一次（至少 {ANOMALY_CONFIG['MIN_HISTORY']} 次历史成绩）；"
+        f"等级下滑：比上一次考试下降 {ANOMALY_CONFIG['BAND_DROP']} 个等级及以上"
+    )
+
+    col1, col2, col3 = st.columns([1, 1, 2])
+    with col1:
+        latest_only = st.checkbox(
+            "只看最近一场考试", value=True, key='attention_latest_only')
+    with col2:
+        kind_labels = st.multiselect(
+            "类型", options=list(ANOMALY_KINDS.values()),
+            default=list(ANOMALY_KINDS.values()), key='attention_kinds')
+    with col3:
+        class_options = analyzer.get_all_classes()['class_name'].tolist()
+        selected_classes = st.multiselect(
+            "班级", options=class_options, key='attention_classes',
+            help="不选择时显示全部学生"
+        ) or None
+
+    if st.button("🔄 重新扫描", key='attention_rescan',
+                 help="修改异常检测配置后重新扫描全部成绩"):
+        count = analyzer.rescan_anomalies()
+        st.success(f"✅ 扫描完成，共 {count} 条标记")
+
+    kinds = [kind for kind, label in ANOMALY_KINDS.items()
+             if label in kind_labels]
+    flags = analyzer.get_attention_list(latest_only, selected_classes, kinds)
+    if flags.empty:
+        st.success("没有需要关注的学生")
+    else:
+        st.metric("需要关注的学生", flags['student_pk_id'].nunique())
+        st.dataframe(
+            flags.assign(kind=flags['kind'].map(ANOMALY_KINDS))[[
+                'student_id', 'name', 'class_name', 'exam_name', 'kind',
+                'score', 'previous_score', 'expected', 'z_score',
+                'band_from', 'band_to', 'severity'
+            ]].round({
+                'score': 1, 'previous_score': 1, 'expected': 1,
+                'z_score': 2, 'severity': 2
+            }).rename(columns={
+                'student_id': '学号',
+                'name': '姓名',
+                'class_name': '班级',
+                'exam_name': '考试',
+                'kind': '类型',
+                'score': '成绩',
+                'previous_score': '上次成绩',
+                'expected': '历史平均',
+                'z_score': '偏离(σ)',
+                'band_from': '原等级',
+                'band_to': '现等级',
+                'severity': '严重程度'
+            }),
+            use_container_width=True,
+            hide_index=True
+        )
+
+
+# 成绩轨迹表的排序方式：(排序列, 是否升序)
+TRAJECTORY_SORTS = {
+    '退步最快': ('斜率', True),
+    '进步最快': ('斜率', False),
+    '预测最低': ('预测下次', True),
+    '波动最大': ('波动', False),
+}
+
+
+def _show_trajectories(analyzer):
+    """成绩轨迹：每位学生的线性趋势、波动与下次考试预测，可排序筛选"""
+    st.header("📉 成绩轨迹与预测")
+    st.caption(
+        "按全部考试的时间顺序对每位学生的成绩做线性拟合：斜率为平均每场考试"
+        "的变化分数，波动为偏离趋势线的标准差，预测区间为 95%（至少3次成绩）"
+    )
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        sort_by = st.selectbox(
+            "排序方式", list(TRAJECTORY_SORTS), key='trajectory_sort')
+    with col2:
+        min_exams = st.number_input(
+            "最少考试次数", min_value=2, value=3, step=1,
+            key='trajectory_min_exams')
+    with col3:
+        class_options = analyzer.get_all_classes()['class_name'].tolist()
+        selected_classes = st.multiselect(
+            "班级", options=class_options, key='trajectory_classes',
+            help="不选择时显示全部学生"
+        ) or None
+
+    trajectories = analyzer.get_student_trajectories(
+        selected_classes, int(min_exams))
+    if trajectories.empty:
+        st.info(f"没有至少 {int(min_exams)} 次成绩的学生")
+        return
+
+    column, ascending = TRAJECTORY_SORTS[sort_by]
+    trajectories = trajectories.sort_values(
+        column, ascending=ascending, na_position='last', kind='mergesort')
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("学生数", len(trajectories))
+    with col2:
+        st.metric("上升趋势", int((trajectories['斜率'] > 0).sum()))
+    with col3:
+        st.metric("下降趋势", int((trajectories['斜率'] < 0).sum()))
+
+    st.dataframe(
+        trajectories.round({
+            '最近成绩': 1, '斜率': 2, '截距': 1, 'R²': 2, '波动': 1,
+            '预测下次': 1, '预测下限': 1, '预测上限': 1
+        }).rename(columns={
+            'student_id': '学号',
+            'name': '姓名',
+            'class_name': '班级'
+        }),
+        use_container_width=True,
+        hide_index=True
+    )
+
+
+def _stats_by_exam(exam_stats, column):
+    """{考试名称: 统计列的值}"""
+    if exam_stats.empty:
+        return {}
+    return dict(zip(exam_stats['exam_name'], exam_stats[column]))
+
+
+def _distribution_by_exam(exam_stats, student_scores, exam_names,
+                          selected_classes, column):
+    """{考试名称: 直方图或分数段人数}
+
+    未筛选班级时直接使用 exam_stats 中全年级的预先统计；筛选班级后按
+    当前学生的成绩重新分段（与 exam_stats 的分段方式一致）。
+    """
+    if selected_classes is None:
+        return _stats_by_exam(exam_stats, column)
+    return {
+        exam: json.loads(compute_exam_stats(student_scores[exam])[column])
+        for exam in exam_names
+    }
+
+
+def _class_scope_label(selected_classes):
+    if selected_classes is None:
+        return ""
+    return f"（{'、'.join(selected_classes)}）"
+
+
+def _exam_list_with_stats(exams_df, exam_stats):
+    """考试列表附加平均分、标准差、最值与中位数"""
+    if exam_stats.empty:
+        return exams_df
+    summary = exam_stats[
+        ['exam_name', 'mean', 'std', 'min', 'median', 'max']
+    ].rename(columns={
+        'mean': '平均分',
+        'std': '标准差',
+        'min': '最低分',
+        'median': '中位数',
+        'max': '最高分'
+    })
+    return exams_df.merge(summary, on='exam_name', how='left').round(1)
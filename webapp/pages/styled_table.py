@@ -0,0 +1,122 @@
+"""
+着色表格模块
+按分数一次性计算整表背景色，大表自动切换为服务端分页
+"""
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from webapp.config import TABLE_CONFIG
+from webapp.grading import get_score_colors
+
+
+def build_row_styles(df, score_column, color_settings):
+    """根据分数列一次性生成整表的样式矩阵（每行同一背景色）"""
+    colors = get_score_colors(df[score_column], color_settings)
+    css = np.char.add('background-color: ', colors.astype(str))
+    return pd.DataFrame(
+        np.repeat(css[:, None], len(df.columns), axis=1),
+        index=df.index,
+        columns=df.columns
+    )
+
+
+def _page_size_options():
+    options = {TABLE_CONFIG['PAGE_SIZE'], 50, 100, 200, 500}
+    return sorted(size for size in options if size <= TABLE_CONFIG['MAX_ROWS'])
+
+
+def show_score_table(df, score_column, color_settings, key,
+                     selectable=False, float_format="{:.1f}",
+                     id_column='student_id'):
+    """显示按分数着色的表格
+
+    行数超过 TABLE_CONFIG['MAX_ROWS'] 时按页显示，只对当前页生成样式。
+    selectable=True 时返回选中行在 df 中的位置列表，否则返回空列表。
+    选择按 id_column 的值记录，翻页后之前页的选择仍然保留。
+    """
+    total = len(df)
+    offset = 0
+    page_df = df
+    page = 1
+    page_size = total
+
+    if total > TABLE_CONFIG['MAX_ROWS']:
+        col1, col2, col3 = st.columns([1, 1, 2])
+        with col1:
+            page_size = st.selectbox(
+                "每页行数",
+                _page_size_options(),
+                key=f"{key}_page_size"
+            )
+        page_count = (total + page_size - 1) // page_size
+        with col2:
+            page = st.number_input(
+                "页码",
+                min_value=1,
+                max_value=page_count,
+                value=1,
+                step=1,
+                key=f"{key}_page"
+            )
+        with col3:
+            st.caption(f"共 {total} 行，{page_count} 页")
+        offset = (int(page) - 1) * page_size
+        page_df = df.iloc[offset:offset + page_size]
+
+    styles = build_row_styles(page_df, score_column, color_settings)
+    float_columns = [
+        col for col in page_df.columns
+        if pd.api.types.is_float_dtype(page_df[col]) and col != 'student_id'
+    ]
+    styled = page_df.style.apply(lambda _: styles, axis=None).format(
+        {col: float_format for col in float_columns}, na_rep=''
+    )
+
+    if not selectable:
+        st.dataframe(styled, use_container_width=True, hide_index=True)
+        return []
+
+    # 表格组件以 key 区分，选中的行号只对当前页有效：每页使用独立的 key，
+    # 跨页的选择以 id_column 的值保存
+    widget_key = f"{key}_p{int(page)}_{page_size}"
+    ids_key = f"{key}_selected_ids"
+    seen_key = f"{key}_seen_rows"
+    fresh = widget_key not in st.session_state
+    event = st.dataframe(
+        styled,
+        use_container_width=True,
+        hide_index=True,
+        on_select="rerun",
+        selection_mode="multi-row",
+        key=widget_key
+    )
+    rows = []
+    if event and hasattr(event, 'selection'):
+        rows = list(event.selection.rows)
+
+    # 只把本页选择的变化（新勾选、取消勾选）合并到已选学生中
+    seen_widget, seen_rows = st.session_state.get(seen_key, (None, []))
+    previous = [] if fresh or seen_widget != widget_key else seen_rows
+    page_ids = page_df[id_column].tolist()
+    selected_ids = list(st.session_state.get(ids_key, []))
+    removed = {page_ids[row] for row in set(previous) - set(rows)}
+    selected_ids = [sid for sid in selected_ids if sid not in removed]
+    for row in rows:
+        if row not in previous and page_ids[row] not in selected_ids:
+            selected_ids.append(page_ids[row])
+    st.session_state[ids_key] = selected_ids
+    st.session_state[seen_key] = (widget_key, rows)
+
+    if total > TABLE_CONFIG['MAX_ROWS'] and selected_ids:
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            st.caption(f"已选择 {len(selected_ids)} 名学生（含其他页）")
+        with col2:
+            if st.button("清除选择", key=f"{key}_clear_selection"):
+                st.session_state[ids_key] = []
+                st.session_state.pop(seen_key, None)
+                st.session_state.pop(widget_key, None)
+                st.rerun()
+
+    return np.flatnonzero(df[id_column].isin(selected_ids).to_numpy()).tolist()
@@ -0,0 +1,212 @@
+"""
+解析缓存模块
+按文件内容哈希在磁盘上缓存解析后的成绩数据，重复导入同一文件时无需再次解析Excel
+"""
+
+import hashlib
+import os
+import pickle
+import tempfile
+
+# 缓存目录（与数据库同目录）
+PARSE_CACHE_DIR = os.path.join(os.path.dirname(__file__), "parse_cache")
+
+# 缓存总大小上限，超出时按最近使用时间淘汰
+PARSE_CACHE_MAX_BYTES = 200 * 1024 * 1024  # 200MB
+
+# 计算哈希时每次读取的字节数
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def file_content_hash(source):
+    """计算文件内容的 SHA-256（bytes、上传文件或文件对象），不改变读取位置"""
+    digest = hashlib.sha256()
+    if isinstance(source, (bytes, bytearray)):
+        digest.update(source)
+        return digest.hexdigest()
+    if hasattr(source, 'getvalue'):
+        digest.update(source.getvalue())
+        return digest.hexdigest()
+
+    position = source.tell()
+    source.seek(0)
+    try:
+        for block in iter(lambda: source.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    finally:
+        source.seek(position)
+    return digest.hexdigest()
+
+
+class ParseCache:
+    """以内容哈希为键的磁盘缓存（每个条目一个 pickle 文件）
+
+    写入先落到临时文件再原子替换，多个解析进程可同时使用；读取命中时
+    更新文件时间，淘汰时先删除最久未使用的条目。流式读取的数据块通过
+    chunk_writer 逐块写入，命中时也逐块读出，内存占用与文件大小无关。
+    """
+
+    def __init__(self, directory=PARSE_CACHE_DIR,
+                 max_bytes=PARSE_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def _path(self, content_hash):
+        return os.path.join(self.directory, f"{content_hash}.pkl")
+
+    def get(self, content_hash):
+        """读取缓存条目，不存在或损坏时返回 None
+
+        分块条目的 frames 为逐块读取的迭代器（文件在此时已打开，之后被
+        淘汰也不影响读取）。
+        """
+        path = self._path(content_hash)
+        try:
+            f = open(path, 'rb')
+            try:
+                entry = pickle.load(f)
+            except Exception:
+                f.close()
+                raise
+            os.utime(path)
+            if isinstance(entry, dict) and entry.get('chunked'):
+                return dict(entry, frames=self._read_chunks(f, content_hash))
+            f.close()
+            return entry
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"读取解析缓存失败，将重新解析: {e}")
+            self.discard(content_hash)
+            return None
+
+    def put(self, content_hash, entry):
+        """写入缓存条目并按总大小淘汰旧条目"""
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(
+                dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, self._path(content_hash))
+            self._evict()
+        except Exception as e:
+            print(f"写入解析缓存失败: {e}")
+
+    def chunk_writer(self, content_hash, header):
+        """创建分块条目的写入器，header 为除 frames 以外的条目内容"""
+        return ChunkWriter(self, content_hash, header)
+
+    def _read_chunks(self, f, content_hash):
+        """从已读过条目头的分块条目文件中逐块读出数据块"""
+        try:
+            while True:
+                try:
+                    yield pickle.load(f)
+                except EOFError:
+                    return
+                except Exception:
+                    # 条目已损坏：删除后由本次导入报错，下次重新解析
+                    self.discard(content_hash)
+                    raise
+        finally:
+            f.close()
+
+    def discard(self, content_hash):
+        try:
+            os.remove(self._path(content_hash))
+        except OSError:
+            pass
+
+    def clear(self):
+        """清空缓存"""
+        for name in self._entries():
+            self.discard(os.path.splitext(name)[0])
+
+    def _entries(self):
+        try:
+            return [
+                name for name in os.listdir(self.directory)
+                if name.endswith('.pkl')
+            ]
+        except FileNotFoundError:
+            return []
+
+    def _evict(self):
+        entries = []
+        for name in self._entries():
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self.discard(os.path.splitext(name)[0])
+            total -= size
+
+
+class ChunkWriter:
+    """分块缓存条目的写入器
+
+    条目头与各数据块依次写入临时文件，commit 后才替换为正式条目；中途
+    放弃或写入失败时删除临时文件，不影响导入本身。
+    """
+
+    def __init__(self, cache, content_hash, header):
+        self.cache = cache
+        self.content_hash = content_hash
+        self._file = None
+        self._temp_path = None
+        try:
+            os.makedirs(cache.directory, exist_ok=True)
+            fd, self._temp_path = tempfile.mkstemp(
+                dir=cache.directory, suffix='.tmp')
+            self._file = os.fdopen(fd, 'wb')
+            self._dump(dict(header, chunked=True))
+        except Exception as e:
+            self._fail(e)
+
+    def _dump(self, obj):
+        pickle.dump(obj, self._file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def _fail(self, error):
+        print(f"写入解析缓存失败: {error}")
+        self.abort()
+
+    def append(self, chunk):
+        if self._file is None:
+            return
+        try:
+            self._dump(chunk)
+        except Exception as e:
+            self._fail(e)
+
+    def commit(self):
+        if self._file is None:
+            return
+        try:
+            self._file.close()
+            self._file = None
+            os.replace(self._temp_path, self.cache._path(self.content_hash))
+            self._temp_path = None
+            self.cache._evict()
+        except Exception as e:
+            self._fail(e)
+
+    def abort(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._temp_path is not None:
+            try:
+                os.remove(self._temp_path)
+            except OSError:
+                pass
+            self._temp_path = None
+
+
+parse_cache = ParseCache()
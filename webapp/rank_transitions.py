@@ -0,0 +1,175 @@
+"""
+名次变化模块
+对按顺序排列的一组考试（两场或一条考试链）计算每个学生相邻两场之间的
+名次变化，并统计等级之间的转移矩阵（如 优秀→良好）。名次取自考试排名
+缓存（与成绩表中的名次列一致），结果按考试组合缓存，数据版本号变化后
+重新计算
+"""
+
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from webapp.grading import grade_band_table
+from webapp.rankings import RANK_SUFFIX
+
+# 缓存的考试组合数上限（超出后淘汰最久未使用的组合）
+TRANSITION_CACHE_SIZE = 32
+
+# 每场考试的等级列后缀
+BAND_SUFFIX = '_等级'
+
+# 名次变化列名：相邻两场为“名次变化(甲→乙)”，整条考试链为“累计名次变化”
+TOTAL_DELTA_COLUMN = '累计名次变化'
+
+
+def transition_matrix(from_bands, to_bands, n_bands):
+    """统计等级转移人数：第 i 行第 j 列为从第 i 段到第 j 段的人数
+
+    from_bands、to_bands 为分数段序号（0为最低段），任一为 -1 的学生不计入。
+    """
+    from_bands = np.asarray(from_bands, dtype=int)
+    to_bands = np.asarray(to_bands, dtype=int)
+    valid = (from_bands >= 0) & (to_bands >= 0)
+    codes = from_bands[valid] * n_bands + to_bands[valid]
+    return np.bincount(codes, minlength=n_bands * n_bands).reshape(
+        n_bands, n_bands)
+
+
+def compute_rank_transitions(values, ranks, table=None):
+    """计算一条考试链的名次变化与等级转移
+
+    values 为 学生×考试 成绩数组，ranks 为对应的名次数组（列按考试顺序
+    排列，缺考为 NaN）。返回字典：bands（分数段序号，缺考为 -1）、deltas
+    （相邻两场的名次变化，正数为进步，任一场缺考为 NaN）、total（首尾
+    两场的名次变化）、matrices（相邻两场的转移人数数组列表，行列均按
+    分数段从低到高）。
+    """
+    table = grade_band_table() if table is None else table
+    values = np.asarray(values, dtype=float)
+    ranks = np.asarray(ranks, dtype=float)
+    if values.ndim == 1:
+        values = values.reshape(-1, 1)
+        ranks = ranks.reshape(-1, 1)
+    bands = table.index_of(values.ravel()).reshape(values.shape)
+
+    # 名次数字变小为进步，变化量取 前一场名次 - 后一场名次
+    deltas = ranks[:, :-1] - ranks[:, 1:]
+    if values.shape[1] >= 2:
+        total = ranks[:, 0] - ranks[:, -1]
+    else:
+        total = np.full(values.shape[0], np.nan)
+    matrices = [
+        transition_matrix(bands[:, i], bands[:, i + 1], len(table))
+        for i in range(values.shape[1] - 1)
+    ]
+    return {
+        'bands': bands,
+        'deltas': deltas,
+        'total': total,
+        'matrices': matrices,
+    }
+
+
+def delta_column(from_exam, to_exam):
+    """相邻两场考试的名次变化列名"""
+    return f"名次变化({from_exam}→{to_exam})"
+
+
+class RankTransitions:
+    """名次变化缓存
+
+    以考试组合（有序的考试名称元组）为键缓存计算结果；数据版本号变化时
+    清空缓存。
+    """
+
+    def __init__(self, db_manager):
+        self.db = db_manager
+        self._lock = threading.Lock()
+        self._version = None
+        self._results = OrderedDict()
+
+    def invalidate(self):
+        with self._lock:
+            self._version = None
+            self._results.clear()
+
+    def _compute(self, exam_names):
+        version, values, students, exams = self.db.score_matrix.snapshot()
+        positions = pd.Index(exams['exam_name']).get_indexer(exam_names)
+        exam_names = [
+            name for name, pos in zip(exam_names, positions) if pos >= 0]
+        values = values[:, positions[positions >= 0]]
+
+        # 名次与成绩表中的名次列同源；没有名次的成绩（如文本成绩）视为缺考
+        ranks = self.db.rankings.wide(exam_names).reindex(
+            index=students['student_id'].to_numpy(),
+            columns=[f"{name}{RANK_SUFFIX}" for name in exam_names]
+        ).to_numpy(dtype=float)
+        values = np.where(np.isnan(ranks), np.nan, values)
+
+        table = grade_band_table()
+        result = compute_rank_transitions(values, ranks, table)
+        classes = self.db.get_all_classes()
+        class_names = dict(zip(classes['id'], classes['class_name']))
+
+        # 只保留在考试链中至少有一次成绩的学生
+        present = ~np.isnan(values)
+        rows = np.flatnonzero(present.any(axis=1))
+        columns = {
+            'student_id': students['student_id'].to_numpy()[rows],
+            'name': students['name'].to_numpy()[rows],
+            'class_name': students['class_id'].map(
+                class_names).to_numpy()[rows],
+        }
+        for i, name in enumerate(exam_names):
+            columns[name] = values[rows, i]
+            columns[f"{name}{RANK_SUFFIX}"] = pd.array(
+                ranks[rows, i], dtype='Int64')
+            columns[f"{name}{BAND_SUFFIX}"] = np.where(
+                result['bands'][rows, i] >= 0,
+                table.names[result['bands'][rows, i]], None)
+        for i in range(len(exam_names) - 1):
+            columns[delta_column(exam_names[i], exam_names[i + 1])] = pd.array(
+                result['deltas'][rows, i], dtype='Int64')
+        if len(exam_names) > 2:
+            columns[TOTAL_DELTA_COLUMN] = pd.array(
+                result['total'][rows], dtype='Int64')
+
+        # 转移矩阵按等级从高到低排列（左上角为 优秀→优秀）
+        names = list(table.names[::-1])
+        matrices = [
+            pd.DataFrame(matrix[::-1, ::-1], index=names, columns=names)
+            for matrix in result['matrices']
+        ]
+        return version, {
+            'exams': exam_names,
+            'students': pd.DataFrame(columns),
+            'matrices': matrices,
+        }
+
+    def get(self, exam_names):
+        """获取考试链（按给定顺序）的名次变化
+
+        返回字典：exams（实际存在的考试名称）、students（每个学生各场成绩、
+        名次、等级与名次变化）、matrices（相邻两场的等级转移人数
+        DataFrame，行为前一场等级，列为后一场等级）。
+        """
+        key = tuple(dict.fromkeys(exam_names))
+        version = self.db.get_data_version()
+        with self._lock:
+            if self._version != version:
+                self._results.clear()
+                self._version = version
+            result = self._results.get(key)
+            if result is not None:
+                self._results.move_to_end(key)
+                return result
+
+        computed_version, result = self._compute(list(key))
+        with self._lock:
+            if self._version == computed_version:
+                self._results[key] = result
+                while len(self._results) > TRANSITION_CACHE_SIZE:
+                    self._results.popitem(last=False)
+        return result
@@ -0,0 +1,106 @@
+"""
+考试排名模块
+按考试计算名次（密集排名）、百分位与标准分（Z分），结果按考试缓存，
+数据版本号变化后重新计算
+"""
+
+import threading
+import numpy as np
+import pandas as pd
+
+# get_student_scores 中每场考试追加的排名列后缀：名次、百分位、标准分
+RANK_SUFFIX = '_名次'
+PERCENTILE_SUFFIX = '_百分位'
+Z_SCORE_SUFFIX = '_Z分'
+RANKING_SUFFIXES = (RANK_SUFFIX, PERCENTILE_SUFFIX, Z_SCORE_SUFFIX)
+
+RANKING_COLUMNS = ['student_id', 'exam_name', 'rank', 'percentile', 'z_score']
+
+
+def is_ranking_column(column, columns):
+    """column 是否为 columns 中某场考试的排名列（如“期中_名次”）"""
+    column = str(column)
+    return any(
+        column.endswith(suffix) and column[:-len(suffix)] in columns
+        for suffix in RANKING_SUFFIXES
+    )
+
+
+def z_scores(scores, means, variances):
+    """(成绩 - 平均分) / 样本标准差，只有一人或全部同分时为 0"""
+    stds = np.sqrt(np.asarray(variances, dtype=float))
+    deltas = np.asarray(scores, dtype=float) - np.asarray(means, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(stds > 0, deltas / stds, 0.0)
+
+
+class ExamRankings:
+    """考试排名缓存
+
+    每场考试的排名整体计算一次后缓存；数据版本号变化时清空缓存，
+    之后按需重新查询（只查询缺少的考试）。
+    """
+
+    def __init__(self, db_manager):
+        self.db = db_manager
+        self._lock = threading.Lock()
+        self._version = None
+        # 考试名称 -> 排名 DataFrame（RANKING_COLUMNS）
+        self._frames = {}
+
+    def invalidate(self):
+        with self._lock:
+            self._version = None
+            self._frames.clear()
+
+    def get(self, exam_names):
+        """获取所选考试的排名（长表，列为 RANKING_COLUMNS）"""
+        exam_names = list(dict.fromkeys(exam_names))
+        if not exam_names:
+            return pd.DataFrame(columns=RANKING_COLUMNS)
+
+        # 先读版本号再查询：期间有写入时缓存标记为旧版本，下次会重新查询
+        version = self.db.get_data_version()
+        with self._lock:
+            if self._version != version:
+                self._frames.clear()
+                self._version = version
+            missing = [name for name in exam_names if name not in self._frames]
+
+        if missing:
+            rankings = self.db.get_exam_rankings(missing)
+            rankings['z_score'] = z_scores(
+                rankings['score'], rankings['mean'], rankings['variance'])
+            rankings = rankings[RANKING_COLUMNS]
+            frames = dict(tuple(rankings.groupby('exam_name', sort=False)))
+            with self._lock:
+                if self._version == version:
+                    for name in missing:
+                        self._frames[name] = frames.get(
+                            name, rankings.iloc[0:0])
+        else:
+            frames = {}
+
+        with self._lock:
+            parts = [
+                self._frames.get(name, frames.get(name)) for name in exam_names
+            ]
+        parts = [part for part in parts if part is not None]
+        if not parts:
+            # 查询期间版本号变化且所选考试都没有数值成绩
+            return pd.DataFrame(columns=RANKING_COLUMNS)
+        return pd.concat(parts, ignore_index=True)
+
+    def wide(self, exam_names):
+        """按学号展开为宽表：每场考试三列（名次、百分位、Z分），index 为学号"""
+        rankings = self.get(exam_names)
+        wide = rankings.pivot(
+            index='student_id', columns='exam_name',
+            values=['rank', 'percentile', 'z_score'])
+        columns = {}
+        for name in exam_names:
+            for value, suffix in zip(
+                    ('rank', 'percentile', 'z_score'), RANKING_SUFFIXES):
+                if (value, name) in wide.columns:
+                    columns[f"{name}{suffix}"] = wide[(value, name)]
+        return pd.DataFrame(columns, index=wide.index)
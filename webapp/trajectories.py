@@ -0,0 +1,169 @@
+"""
+成绩轨迹模块
+对整个 学生×考试 成绩矩阵按考试时间顺序做一次批量最小二乘拟合，得到每个
+学生的斜率、截距、R²、残差波动，以及下一场考试的预测值与预测区间，
+结果按数据版本号缓存
+"""
+
+import threading
+import numpy as np
+import pandas as pd
+from webapp.config import DEFAULT_FULL_MARK
+
+# 预测区间的置信水平为 95%，自由度 1-30 的 t 分布双侧临界值
+T_CRITICAL_95 = np.array([
+    np.nan,
+    12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+    2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+    2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042,
+])
+
+# 自由度超过 30 时使用正态分布临界值
+Z_CRITICAL_95 = 1.96
+
+TRAJECTORY_COLUMNS = [
+    'student_id', 'name', 'class_name', '考试次数', '最近成绩',
+    '斜率', '截距', 'R²', '波动', '预测下次', '预测下限', '预测上限'
+]
+
+
+def t_critical(dof):
+    """批量获取 95% 双侧 t 临界值，自由度小于 1 时为 NaN"""
+    dof = np.asarray(dof)
+    clipped = np.clip(dof, 0, len(T_CRITICAL_95) - 1).astype(int)
+    return np.where(dof >= len(T_CRITICAL_95), Z_CRITICAL_95,
+                    T_CRITICAL_95[clipped])
+
+
+def fit_trajectories(values, positions=None, next_position=None):
+    """对每行（每个学生）的有效成绩做 成绩 = 截距 + 斜率 × 考试序号 的拟合
+
+    所有学生的 2×2 正规方程堆叠后用一次 np.linalg.solve 求解。positions
+    为各列的横坐标（默认为列序号），next_position 为预测的横坐标（默认为
+    最后一列之后一位）。返回各项为一维数组的字典：count、last、slope、
+    intercept、r2、volatility（残差标准差）、forecast、lower、upper。
+    有效成绩少于两次的行拟合结果为 NaN；波动与预测区间至少需要三次成绩。
+    """
+    values = np.asarray(values, dtype=float)
+    if values.ndim == 1:
+        values = values.reshape(1, -1)
+    n_rows, n_cols = values.shape
+    if positions is None:
+        positions = np.arange(n_cols, dtype=float)
+    positions = np.asarray(positions, dtype=float)
+    if next_position is None:
+        next_position = positions[-1] + 1 if n_cols else 0.0
+
+    mask = ~np.isnan(values)
+    x = np.where(mask, positions, 0.0)
+    y = np.where(mask, values, 0.0)
+    count = mask.sum(axis=1)
+    sum_x = x.sum(axis=1)
+    sum_xx = (x * x).sum(axis=1)
+    sum_y = y.sum(axis=1)
+    sum_xy = (x * y).sum(axis=1)
+
+    intercept = np.full(n_rows, np.nan)
+    slope = np.full(n_rows, np.nan)
+    fit = count >= 2
+    if fit.any():
+        normal = np.empty((int(fit.sum()), 2, 2))
+        normal[:, 0, 0] = count[fit]
+        normal[:, 0, 1] = normal[:, 1, 0] = sum_x[fit]
+        normal[:, 1, 1] = sum_xx[fit]
+        rhs = np.stack([sum_y[fit], sum_xy[fit]], axis=1)[..., None]
+        coef = np.linalg.solve(normal, rhs)[..., 0]
+        intercept[fit] = coef[:, 0]
+        slope[fit] = coef[:, 1]
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        fitted = intercept[:, None] + slope[:, None] * positions
+        sse = np.where(mask, (values - fitted) ** 2, 0.0).sum(axis=1)
+        y_mean = sum_y / count
+        sst = np.where(mask, (values - y_mean[:, None]) ** 2, 0.0).sum(axis=1)
+        r2 = np.where(fit & (sst > 0), 1 - sse / sst, np.nan)
+
+        dof = count - 2
+        volatility = np.where(dof > 0, np.sqrt(sse / dof), np.nan)
+        forecast = intercept + slope * next_position
+        x_mean = sum_x / count
+        s_xx = sum_xx - count * x_mean ** 2
+        margin = t_critical(dof) * volatility * np.sqrt(
+            1 + 1 / count + (next_position - x_mean) ** 2 / s_xx)
+
+    # 每行最后一次有效成绩
+    last = np.full(n_rows, np.nan)
+    if n_cols:
+        last_idx = n_cols - 1 - np.argmax(mask[:, ::-1], axis=1)
+        last = np.where(count > 0, values[np.arange(n_rows), last_idx], np.nan)
+
+    return {
+        'count': count,
+        'last': last,
+        'slope': slope,
+        'intercept': intercept,
+        'r2': r2,
+        'volatility': volatility,
+        'forecast': forecast,
+        'lower': forecast - margin,
+        'upper': forecast + margin,
+    }
+
+
+class StudentTrajectories:
+    """全体学生的成绩轨迹缓存（每个数据版本整体拟合一次）"""
+
+    def __init__(self, db_manager):
+        self.db = db_manager
+        self._lock = threading.Lock()
+        self._version = None
+        self._trajectories = None
+
+    def invalidate(self):
+        with self._lock:
+            self._version = None
+            self._trajectories = None
+
+    def _compute(self):
+        version, values, students, exams = self.db.score_matrix.snapshot()
+        # 按上传时间排列考试列，缺考的考试在横轴上留出空位
+        order = np.lexsort((
+            exams['exam_name'].astype(str).to_numpy(),
+            exams['upload_time'].astype(str).to_numpy()
+        ))
+        result = fit_trajectories(values[:, order])
+        classes = self.db.get_all_classes()
+        class_names = dict(zip(classes['id'], classes['class_name']))
+
+        trajectories = pd.DataFrame({
+            'student_id': students['student_id'].to_numpy(),
+            'name': students['name'].to_numpy(),
+            'class_name': students['class_id'].map(class_names).to_numpy(),
+            '考试次数': result['count'],
+            '最近成绩': result['last'],
+            '斜率': result['slope'],
+            '截距': result['intercept'],
+            'R²': result['r2'],
+            '波动': result['volatility'],
+            '预测下次': result['forecast'],
+            '预测下限': result['lower'],
+            '预测上限': result['upper'],
+        })
+        # 预测值限制在 0 与默认满分之间
+        forecast_columns = ['预测下次', '预测下限', '预测上限']
+        trajectories[forecast_columns] = trajectories[forecast_columns].clip(
+            0, DEFAULT_FULL_MARK)
+        trajectories = trajectories[trajectories['考试次数'] > 0]
+        return version, trajectories.reset_index(drop=True)
+
+    def get(self):
+        """获取全体学生的轨迹（TRAJECTORY_COLUMNS）"""
+        version = self.db.get_data_version()
+        with self._lock:
+            if self._version == version:
+                return self._trajectories
+        computed_version, trajectories = self._compute()
+        with self._lock:
+            self._version = computed_version
+            self._trajectories = trajectories
+        return trajectories
@@ -0,0 +1,107 @@
+"""
+成绩趋势模块
+对 学生×考试 成绩矩阵整体进行向量化的趋势计算
+"""
+
+import numpy as np
+
+# 前后两半平均分相差超过该分数才判定为总体上升/下降
+TREND_THRESHOLD = 2
+
+TREND_LABELS = {
+    'UP': '上升',
+    'DOWN': '下降',
+    'FLAT': '持平',
+    'OVERALL_UP': '总体上升',
+    'OVERALL_DOWN': '总体下降',
+    'FLUCTUATE': '波动',
+    'INSUFFICIENT': '数据不足',
+}
+
+
+def _masked(values):
+    values = np.asarray(values, dtype=float)
+    if values.ndim == 1:
+        values = values.reshape(1, -1)
+    mask = ~np.isnan(values)
+    return values, mask
+
+
+def classify_trends(values, threshold=TREND_THRESHOLD):
+    """计算每行（每个学生）的成绩趋势标签
+
+    每行按列顺序取有效成绩，只有两次成绩时比较先后，三次及以上时比较
+    前后两半的平均分。
+    """
+    values, mask = _masked(values)
+    n_rows, n_cols = values.shape
+    counts = mask.sum(axis=1)
+    if n_cols == 0:
+        return np.full(n_rows, TREND_LABELS['INSUFFICIENT'], dtype=object)
+
+    # 每个有效成绩在本行有效成绩中的序号
+    order = np.cumsum(mask, axis=1) - 1
+    half = counts // 2
+    first_part = mask & (order < half[:, None])
+    second_part = mask & ~first_part
+
+    # 逐列累加（顺序与逐行求平均一致）
+    first_sum = np.cumsum(np.where(first_part, values, 0.0), axis=1)[:, -1]
+    second_sum = np.cumsum(np.where(second_part, values, 0.0), axis=1)[:, -1]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        first_avg = first_sum / half
+        second_avg = second_sum / (counts - half)
+
+    # 只有两次成绩时直接比较第一次与最后一次
+    first_idx = np.argmax(mask, axis=1)
+    last_idx = n_cols - 1 - np.argmax(mask[:, ::-1], axis=1)
+    rows = np.arange(n_rows)
+    first_score = values[rows, first_idx]
+    last_score = values[rows, last_idx]
+
+    two = counts == 2
+    many = counts > 2
+    return np.select(
+        [
+            counts < 2,
+            two & (last_score > first_score),
+            two & (last_score < first_score),
+            two,
+            many & (second_avg > first_avg + threshold),
+            many & (second_avg < first_avg - threshold),
+        ],
+        [
+            TREND_LABELS['INSUFFICIENT'],
+            TREND_LABELS['UP'],
+            TREND_LABELS['DOWN'],
+            TREND_LABELS['FLAT'],
+            TREND_LABELS['OVERALL_UP'],
+            TREND_LABELS['OVERALL_DOWN'],
+        ],
+        default=TREND_LABELS['FLUCTUATE']
+    ).astype(object)
+
+
+def trend_slopes(values, positions=None):
+    """每行成绩对考试序号的最小二乘斜率（每场考试的平均变化分数）
+
+    positions 为各列的横坐标，默认为列序号；有效成绩不足两次的行为 NaN。
+    """
+    values, mask = _masked(values)
+    if positions is None:
+        positions = np.arange(values.shape[1], dtype=float)
+    x = np.broadcast_to(np.asarray(positions, dtype=float), values.shape)
+
+    n = mask.sum(axis=1)
+    y = np.where(mask, values, 0.0)
+    xm = np.where(mask, x, 0.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        x_mean = xm.sum(axis=1) / n
+        y_mean = y.sum(axis=1) / n
+        dx = np.where(mask, x - x_mean[:, None], 0.0)
+        dy = np.where(mask, values - y_mean[:, None], 0.0)
+        sxx = (dx * dx).sum(axis=1)
+        sxy = (dx * dy).sum(axis=1)
+        slopes = sxy / sxx
+    slopes[(n < 2) | (sxx == 0)] = np.nan
+    return slopes
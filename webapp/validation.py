@@ -0,0 +1,175 @@
+"""
+导入校验模块
+写入数据库前对整个数据块做向量化校验：规范学号、解析成绩、检查分数范围
+与重复学号，输出干净的数据与被拒绝行的报告
+"""
+
+import pandas as pd
+from webapp.config import DEFAULT_FULL_MARK
+
+# 拒绝原因
+REJECT_REASONS = {
+    'MISSING_ID': '学号为空',
+    'MISSING_NAME': '姓名为空',
+    'MISSING_SCORE': '成绩为空',
+    'INVALID_SCORE': '成绩不是数字',
+    'OUT_OF_RANGE': '成绩超出范围',
+    'DUPLICATE_ID': '学号重复',
+}
+
+# 拒绝报告的列
+REPORT_COLUMNS = ['文件', '考试', '工作表', '行号', '学号', '姓名', '成绩', '原因']
+
+
+def canonical_ids(values):
+    """将学号统一为字符串：去除首尾空白，Excel 数值学号 2024001.0 还原为 2024001
+
+    文本学号中的前导零保留，空值与空字符串返回缺失值。
+    """
+    ids = values.astype(str).str.strip()
+    ids = ids.str.replace(r'^(\d+)\.0+$', r'\1', regex=True)
+    return ids.mask(values.isna() | (ids == ''))
+
+
+def _row_numbers(df):
+    """Excel 中的行号（第一行为标题），工作簿长表自带 行号 列"""
+    if '行号' in df.columns:
+        return df['行号']
+    return pd.Series(df.index + 2, index=df.index)
+
+
+class ScoreValidator:
+    """一场考试的成绩校验器
+
+    validate() 可对同一考试的多个数据块（流式读取）依次调用，重复学号
+    跨数据块检测，同一学号以第一次出现的行为准。被拒绝的行累积在
+    rejects 中。
+    """
+
+    def __init__(self, require_student_id=True, full_mark=DEFAULT_FULL_MARK):
+        self.require_student_id = require_student_id
+        self.full_mark = full_mark
+        # 学号 -> 第一次出现的位置，如“第 5 行”或“一班 第 5 行”
+        self._seen_ids = {}
+        self._rejects = []
+
+    @property
+    def reject_count(self):
+        return sum(len(frame) for frame in self._rejects)
+
+    @property
+    def rejects(self):
+        """被拒绝的行：行号、学号、姓名、成绩（原值）、原因（以及工作表）"""
+        if not self._rejects:
+            return pd.DataFrame(columns=[
+                col for col in REPORT_COLUMNS if col not in ('文件', '考试')])
+        return pd.concat(self._rejects, ignore_index=True)
+
+    def validate(self, df):
+        """校验一个数据块，返回只含有效行的 DataFrame（index 不变）
+
+        返回的数据中 学号 为规范字符串、姓名 已去除空白、成绩 为数值。
+        """
+        df = df.copy()
+        reasons = pd.Series(None, index=df.index, dtype=object)
+
+        def reject(mask, reason):
+            # 每行只记录第一个原因
+            reasons[mask & reasons.isna()] = reason
+
+        by_id = self.require_student_id and '学号' in df.columns
+        if '学号' in df.columns:
+            df['学号'] = canonical_ids(df['学号'])
+        if '姓名' in df.columns:
+            names = df['姓名'].astype(str).str.strip()
+            df['姓名'] = names.mask(df['姓名'].isna() | (names == ''))
+
+        if by_id:
+            reject(df['学号'].isna(), REJECT_REASONS['MISSING_ID'])
+        elif '姓名' in df.columns:
+            reject(df['姓名'].isna(), REJECT_REASONS['MISSING_NAME'])
+
+        raw_scores = df['成绩']
+        scores = pd.to_numeric(raw_scores, errors='coerce')
+        reject(raw_scores.isna() | (raw_scores.astype(str).str.strip() == ''),
+               REJECT_REASONS['MISSING_SCORE'])
+        reject(scores.isna(), REJECT_REASONS['INVALID_SCORE'])
+
+        if '满分' in df.columns:
+            full_marks = pd.to_numeric(df['满分'], errors='coerce').fillna(
+                self.full_mark)
+        else:
+            full_marks = self.full_mark
+        reject((scores < 0) | (scores > full_marks),
+               REJECT_REASONS['OUT_OF_RANGE'])
+
+        row_numbers = _row_numbers(df)
+        if by_id:
+            # 其他原因被拒绝的行不参与重复检测
+            candidates = df['学号'][reasons.isna()]
+            locations = "第 " + row_numbers[reasons.isna()].astype(str) + " 行"
+            if '工作表' in df.columns:
+                locations = df['工作表'][reasons.isna()].astype(str) + " " + locations
+            duplicated = candidates.duplicated()
+            earlier = candidates.isin(list(self._seen_ids))
+            repeat = (duplicated | earlier).reindex(df.index, fill_value=False)
+            new_ids = candidates[~duplicated & ~earlier]
+            self._seen_ids.update(zip(new_ids, locations[new_ids.index]))
+            if repeat.any():
+                reasons[repeat] = (
+                    REJECT_REASONS['DUPLICATE_ID'] + "（与"
+                    + df['学号'][repeat].map(self._seen_ids) + "相同）"
+                )
+
+        rejected = reasons.notna()
+        if rejected.any():
+            report = pd.DataFrame({
+                '行号': row_numbers[rejected].astype(int),
+                '学号': df['学号'][rejected] if '学号' in df.columns else None,
+                '姓名': df['姓名'][rejected] if '姓名' in df.columns else None,
+                '成绩': raw_scores[rejected],
+                '原因': reasons[rejected],
+            })
+            if '工作表' in df.columns:
+                report.insert(0, '工作表', df['工作表'][rejected])
+            self._rejects.append(report)
+            print(f"校验：{int(rejected.sum())} 行未通过（{summarize_rejects(report)}）")
+
+        return df[~rejected].assign(成绩=scores[~rejected])
+
+
+def summarize_rejects(rejects):
+    """按原因汇总被拒绝的行，如“成绩为空 2 行，学号重复 1 行”"""
+    reasons = rejects['原因'].str.replace(r'（.*）$', '', regex=True)
+    return "，".join(
+        f"{reason} {count} 行" for reason, count in reasons.value_counts().items()
+    )
+
+
+def rejection_report(parsed_files):
+    """将多个文件解析结果中的拒绝记录合并为一张报告
+
+    parsed_files 为 read_score_file / read_workbook 成功返回的结果列表。
+    """
+    frames = []
+    for parsed in parsed_files:
+        for exam in parsed.get('exams', [parsed]):
+            validator = exam.get('validator')
+            if validator is None or not validator.reject_count:
+                continue
+            frame = validator.rejects
+            frame.insert(0, '考试', exam['exam_name'])
+            frame.insert(0, '文件', exam['file_name'])
+            frames.append(frame)
+    if not frames:
+        return pd.DataFrame(columns=REPORT_COLUMNS)
+    report = pd.concat(frames, ignore_index=True)
+    # 原始成绩可能混有数字与文字，统一按文字显示
+    report['成绩'] = report['成绩'].map(lambda v: '' if pd.isna(v) else str(v))
+    return report.reindex(columns=[
+        col for col in REPORT_COLUMNS if col in report.columns])
+
+
+def report_csv_bytes(report):
+    """报告转为 CSV（带 BOM，Excel 可直接打开）"""
+    return report.to_csv(index=False).encode('utf-8-sig')
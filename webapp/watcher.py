@@ -0,0 +1,243 @@
+"""
+目录监视模块
+持续监视共享目录，新增或修改的Excel文件写入完成后自动导入
+
+优先使用 watchdog（inotify / FSEvents / ReadDirectoryChangesW 事件），
+未安装时退回到轮询：只在目录修改时间变化时列出目录，其余时间只检查
+已知文件的大小与修改时间。
+"""
+
+import contextlib
+import os
+import threading
+import time
+
+from webapp.config import UPLOAD_CONFIG
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # watchdog 为可选依赖
+    FileSystemEventHandler = object
+    Observer = None
+
+# 文件大小与修改时间保持不变多久后视为写入完成（秒）
+DEBOUNCE_SECONDS = 2.0
+
+# 检查待导入文件（以及轮询模式下检查目录）的间隔（秒）
+POLL_INTERVAL = 1.0
+
+
+def is_excel_file(path):
+    """是否为可导入的Excel文件（忽略 Office 的 ~$ 临时文件）"""
+    extensions = tuple(f".{ext}" for ext in UPLOAD_CONFIG['ALLOWED_TYPES'])
+    name = os.path.basename(path)
+    return name.lower().endswith(extensions) and not name.startswith('~$')
+
+
+def _file_signature(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+class _EventHandler(FileSystemEventHandler):
+    """把 watchdog 事件转交给 FolderWatcher"""
+
+    def __init__(self, watcher):
+        self.watcher = watcher
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.watcher.touch(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.watcher.touch(event.src_path)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self.watcher.touch(event.dest_path)
+
+
+class FolderWatcher:
+    """监视目录并导入写入完成的Excel文件
+
+    文件事件只登记路径；文件的大小和修改时间在 debounce 秒内不再变化
+    时才导入（老师复制文件或 Excel 保存到一半时不会被读取）。导入走
+    import_excel_files，内容与已有考试相同的文件按内容哈希跳过，每个
+    文件一个事务，提交时更新数据版本号，打开的页面刷新后即可看到新数据。
+    quiet=True 时只在每次导入期间屏蔽导入过程的调试输出，监视本身的
+    提示（如读取目录失败）照常输出。
+    """
+
+    def __init__(self, analyzer, directory, recursive=False,
+                 debounce=DEBOUNCE_SECONDS, poll_interval=POLL_INTERVAL,
+                 use_polling=False, import_existing=True, on_result=None,
+                 quiet=False, **import_options):
+        self.analyzer = analyzer
+        self.directory = os.path.abspath(directory)
+        self.recursive = recursive
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.use_polling = use_polling or Observer is None
+        self.import_existing = import_existing
+        self.on_result = on_result
+        self.quiet = quiet
+        self.import_options = import_options
+        # 路径 -> (文件签名, 签名最近变化的时间)
+        self._pending = {}
+        # 已导入（或已跳过）文件的签名，相同签名不再处理
+        self._handled = {}
+        # 轮询模式：目录 -> 修改时间
+        self._dir_mtimes = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._observer = None
+
+    @property
+    def mode(self):
+        return "轮询" if self.use_polling else "文件系统事件"
+
+    def touch(self, path):
+        """登记一个可能新增或修改的文件（可在任意线程调用）"""
+        if not is_excel_file(path):
+            return
+        signature = _file_signature(path)
+        if signature is None:
+            return
+        with self._lock:
+            if self._handled.get(path) == signature:
+                return
+            previous = self._pending.get(path)
+            if previous is None or previous[0] != signature:
+                self._pending[path] = (signature, time.monotonic())
+
+    def start(self):
+        """开始监视（非阻塞）"""
+        if not os.path.isdir(self.directory):
+            raise FileNotFoundError(f"监视目录不存在：{self.directory}")
+        if self.import_existing:
+            self._scan_directories(initial=True)
+        elif self.use_polling:
+            self._scan_directories(initial=True, register=False)
+
+        if not self.use_polling:
+            self._observer = Observer()
+            self._observer.schedule(
+                _EventHandler(self), self.directory, recursive=self.recursive)
+            self._observer.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
+
+    def run_forever(self):
+        """阻塞运行，直到 stop() 被调用或收到 Ctrl+C"""
+        self.start()
+        try:
+            while not self._stop.wait(self.poll_interval):
+                self.poll()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def poll(self):
+        """检查一次：轮询模式下发现变化，然后导入已稳定的文件，返回导入结果"""
+        if self.use_polling:
+            self._scan_directories()
+        return self.import_ready()
+
+    def import_ready(self):
+        """导入签名已稳定 debounce 秒的文件"""
+        from webapp.batch_import import DiskFile, import_excel_files
+
+        now = time.monotonic()
+        ready = []
+        with self._lock:
+            for path, (signature, changed_at) in list(self._pending.items()):
+                current = _file_signature(path)
+                if current is None:
+                    # 文件已被删除或改名
+                    del self._pending[path]
+                elif current != signature:
+                    self._pending[path] = (current, now)
+                elif now - changed_at >= self.debounce:
+                    ready.append((path, signature))
+                    del self._pending[path]
+        if not ready:
+            return []
+
+        files = [DiskFile(path) for path, _ in ready]
+        with contextlib.ExitStack() as stack:
+            if self.quiet:
+                # 输出直接丢弃，长时间运行也不会积累
+                devnull = stack.enter_context(open(os.devnull, 'w'))
+                stack.enter_context(contextlib.redirect_stdout(devnull))
+            results = import_excel_files(
+                self.analyzer, files, on_result=self.on_result,
+                **self.import_options)
+        with self._lock:
+            for (path, signature), result in zip(ready, results):
+                if result is not None:
+                    self._handled[path] = signature
+        return results
+
+    def _scan_directories(self, initial=False, register=True):
+        """轮询模式：只重新列出修改时间变化的目录，并检查已知文件"""
+        for root in self._directories():
+            try:
+                mtime = os.stat(root).st_mtime_ns
+            except OSError:
+                self._dir_mtimes.pop(root, None)
+                continue
+            if not initial and self._dir_mtimes.get(root) == mtime:
+                continue
+            self._dir_mtimes[root] = mtime
+            try:
+                entries = list(os.scandir(root))
+            except OSError as e:
+                print(f"读取目录失败: {root}: {e}")
+                continue
+            for entry in entries:
+                if entry.is_file() and is_excel_file(entry.path):
+                    if register:
+                        self.touch(entry.path)
+                    else:
+                        with self._lock:
+                            self._handled[entry.path] = _file_signature(
+                                entry.path)
+
+        if self.use_polling and not initial:
+            # 覆盖写入不改变目录修改时间，已知文件逐个检查签名
+            with self._lock:
+                known = list(self._handled)
+            for path in known:
+                self.touch(path)
+
+    def _directories(self):
+        if not self.recursive:
+            return [self.directory]
+        if not self._dir_mtimes:
+            return [root for root, _, _ in os.walk(self.directory)]
+        # 新建的子目录会改变父目录的修改时间，在父目录重新列出时加入
+        directories = set(self._dir_mtimes)
+        for root in list(directories):
+            try:
+                mtime = os.stat(root).st_mtime_ns
+            except OSError:
+                continue
+            if self._dir_mtimes.get(root) != mtime:
+                try:
+                    directories.update(
+                        entry.path for entry in os.scandir(root)
+                        if entry.is_dir())
+                except OSError:
+                    pass
+        return sorted(directories)